@@ -1,11 +1,62 @@
+from functools import partial
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser
+from django.db import transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+
+from .cache import email_cache, invalidate_user_snapshots, user_snapshot_cache
+from .models import CustomUser, LoginEvent
+from .pagination import LargeTablePaginator
+from .user_io import USER_FIELDS, iter_lines
+
+# Columns of the admin CSV export; password hashes are left out.
+EXPORT_FIELDS = tuple(field for field in USER_FIELDS if field != 'password')
+
+
+def prefix_range(field, prefix):
+    """
+    Builds a case-insensitive prefix filter as a range on LOWER(field), e.g. 'ada' becomes
+    LOWER(field) >= 'ada' AND LOWER(field) < 'adb', which the LOWER() unique indexes can serve.
+    A LIKE 'ada%' on the same expression is not used with an index by SQLite, nor by PostgreSQL
+    unless the index uses the C collation or text_pattern_ops.
+    """
+    prefix = prefix.lower()
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field}__lower__gte': prefix, f'{field}__lower__lt': upper})
+
+
+@admin.action(description='Activate selected users')
+def activate_users(modeladmin, request, queryset):
+    modeladmin.set_active(request, queryset, True)
+
+
+@admin.action(description='Deactivate selected users')
+def deactivate_users(modeladmin, request, queryset):
+    modeladmin.set_active(request, queryset, False)
+
+
+@admin.action(description='Export selected users as CSV')
+def export_users(modeladmin, request, queryset):
+    """
+    Streams the selected users as CSV, reading them from the database in chunks.
+    """
+    rows = queryset.order_by('pk').values_list(*EXPORT_FIELDS).iterator(chunk_size=2000)
+    response = StreamingHttpResponse(iter_lines(rows, 'csv', EXPORT_FIELDS), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="users.csv"'
+    return response
+
 
 class CustomUserAdmin(UserAdmin):
     """
     CustomUserAdmin class for managing CustomUser instances in the Django admin interface.
 
+    The changelist is built for large user tables: searches use the LOWER(email)/LOWER(username)
+    indexes (a prefix by default, an exact match with a leading '='), counts are estimated
+    (see LargeTablePaginator), pages are fetched with a deferred join, the filters are backed by
+    (is_active, email) and (is_staff, email) indexes, and the bulk actions run as one UPDATE.
+
     Attributes:
         model (CustomUser): The model class that this admin class manages.
         list_display (tuple): A tuple of field names to display in the admin list view.
@@ -21,7 +72,6 @@ class CustomUserAdmin(UserAdmin):
     fieldsets = (
         (None, {'fields': ('email', 'username', 'password')}),
         ('Personal Info', {'fields': ('first_name', 'last_name', 'date_of_birth', 'bio', 'location')}),
-        ('OTP Info', {'fields': ('otp_field', 'otp_created_at')}),
         ('Permissions', {'fields': ('is_staff', 'is_active', 'is_superuser', 'groups', 'user_permissions')}),
     )
     add_fieldsets = (
@@ -31,6 +81,74 @@ class CustomUserAdmin(UserAdmin):
         ),
     )
     search_fields = ('email', 'username')
+    search_help_text = 'Email or username prefix; start with = for an exact match, e.g. =ada@example.com.'
     ordering = ('email',)
+    paginator = LargeTablePaginator
+    show_full_result_count = False
+    actions = (activate_users, deactivate_users, export_users)
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Filters on the email or username, compared case-insensitively through their LOWER() indexes.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.startswith('='):
+            term = term[1:].strip().lower()
+            if not term:
+                return queryset, False
+            return queryset.filter(Q(email__lower=term) | Q(username__lower=term)), False
+        return queryset.filter(prefix_range('email', term) | prefix_range('username', term)), False
+
+    # The number of users updated and dropped from the caches at a time by set_active().
+    set_active_batch_size = 1000
+
+    def set_active(self, request, queryset, active):
+        """
+        Sets is_active on the selected users whose state changes and drops their cached snapshots,
+        so a deactivated user's open sessions stop authenticating right away, and the emails of
+        deactivated users from the email cache.
+
+        The users are updated by batches of set_active_batch_size, walked by primary key, so the
+        selection is never loaded at once. Activating users with snapshots disabled has nothing to
+        drop, and is a single UPDATE.
+        """
+        changed = queryset.exclude(is_active=active)
+        if active and user_snapshot_cache() is None:
+            updated = changed.update(is_active=active)
+        else:
+            rows = changed.order_by('pk').values_list('pk', 'email')
+            updated = last_pk = 0
+            while batch := list(rows.filter(pk__gt=last_pk)[:self.set_active_batch_size]):
+                pks, emails = zip(*batch)
+                last_pk = pks[-1]
+                updated += CustomUser.objects.filter(pk__in=pks).update(is_active=active)
+                invalidate_user_snapshots(*pks)
+                if not active:
+                    email_cache.discard(*emails)
+                    transaction.on_commit(partial(email_cache.discard, *emails))
+        state = 'activated' if active else 'deactivated'
+        self.message_user(request, f'{updated} user(s) {state}.')
+
 
 admin.site.register(CustomUser, CustomUserAdmin)
+
+
+@admin.register(LoginEvent)
+class LoginEventAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the login event log, which only accounts.events writes to.
+    """
+    list_display = ('created_at', 'email', 'succeeded', 'ip_address', 'user')
+    list_filter = ('succeeded',)
+    list_select_related = ('user',)
+    ordering = ('-created_at',)
+    paginator = LargeTablePaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -1,6 +1,32 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from django.contrib.auth.signals import user_logged_in, user_login_failed
+
+        from .cache import drop_cached_user
+        from .db import configure_sqlite
+        from .events import flush_login_events, record_login, record_login_failure
+        from .timing import install_query_timer
+        from .validators import common_passwords
+
+        connection_created.connect(configure_sqlite, dispatch_uid='accounts.configure_sqlite')
+        connection_created.connect(install_query_timer, dispatch_uid='accounts.install_query_timer')
+        # last_login is written in coalesced batches with the login events rather than on every login.
+        user_logged_in.disconnect(dispatch_uid='update_last_login')
+        user_logged_in.connect(record_login, dispatch_uid='accounts.record_login')
+        user_login_failed.connect(record_login_failure, dispatch_uid='accounts.record_login_failure')
+        request_finished.connect(flush_login_events, dispatch_uid='accounts.flush_login_events')
+        # Also covers QuerySet.delete(), e.g. the admin's delete action, which never calls CustomUser.delete().
+        user_model = self.get_model('CustomUser')
+        post_save.connect(drop_cached_user, sender=user_model, dispatch_uid='accounts.drop_cached_user_save')
+        post_delete.connect(drop_cached_user, sender=user_model, dispatch_uid='accounts.drop_cached_user_delete')
+        # Load and decompress the common password list once at startup rather than on the first signup.
+        common_passwords()
@@ -0,0 +1,163 @@
+"""
+Profile pictures: uploads are stored once under a name derived from their content, and resized
+into AVATAR_SIZES thumbnails on a background process pool.
+
+Because a name only ever refers to one content, the web server or CDN can cache avatar files
+forever, and uploading the same picture twice reuses the stored files.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Square bounding boxes of the generated thumbnails, in pixels.
+AVATAR_SIZES = (64, 128, 256)
+
+# Accepted upload formats and the extension they are stored with.
+AVATAR_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+AVATAR_DIRECTORY = 'avatars'
+
+logger = logging.getLogger(__name__)
+
+
+def thumbnail_name(name, size):
+    """
+    Returns the storage name of the `size` thumbnail of an avatar, e.g. 'avatars/<hash>_128.jpg'.
+    """
+    return f'{os.path.splitext(name)[0]}_{size}.jpg'
+
+
+def render_thumbnails(source_path, targets, quality=85):
+    """
+    Decodes an image once and writes a JPEG thumbnail per (path, size) target.
+
+    Runs in a worker process and only needs Pillow. For JPEG sources, draft() makes the decoder
+    produce the image at 1/2, 1/4 or 1/8 scale directly from the DCT coefficients, and thumbnail()
+    with a reducing_gap shrinks by whole factors with reduce() before the final resampling, so a
+    large photo is never fully decoded and resized at full resolution. Thumbnails are written to a
+    temporary file and renamed, so a partially written file is never served.
+
+    Parameters:
+        source_path (str): The stored upload.
+        targets (list): (path, size) pairs.
+        quality (int): The JPEG quality of the thumbnails.
+    """
+    with Image.open(source_path) as image:
+        largest = max(size for path, size in targets)
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        for path, size in sorted(targets, key=lambda target: target[1], reverse=True):
+            image.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            temporary = f'{path}.tmp'
+            image.save(temporary, 'JPEG', quality=quality, optimize=True, progressive=True)
+            os.replace(temporary, path)
+
+
+@lru_cache(maxsize=None)
+def get_thumbnail_executor():
+    """
+    Returns the process pool thumbnails are rendered on, or None if ACCOUNTS_AVATAR_WORKERS is 0.
+    """
+    workers = getattr(settings, 'ACCOUNTS_AVATAR_WORKERS', 1)
+    if workers == 0:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def _log_failure(future):
+    """
+    Done-callback of the thumbnail jobs, whose result nobody waits for: logs why a job failed.
+    """
+    if not future.cancelled() and future.exception() is not None:
+        logger.error('Rendering avatar thumbnails failed', exc_info=future.exception())
+
+
+def queue_thumbnails(name):
+    """
+    Renders the missing thumbnails of a stored avatar in the background (inline without workers).
+
+    A pool whose worker died (e.g. killed by the OOM killer) raises BrokenProcessPool on every
+    submit, so it is shut down and replaced for the next upload, and this one is rendered inline.
+    """
+    targets = [
+        (default_storage.path(thumbnail_name(name, size)), size)
+        for size in AVATAR_SIZES
+        if not default_storage.exists(thumbnail_name(name, size))
+    ]
+    if not targets:
+        return
+    executor = get_thumbnail_executor()
+    if executor is not None:
+        try:
+            executor.submit(render_thumbnails, default_storage.path(name), targets).add_done_callback(_log_failure)
+            return
+        except BrokenProcessPool:
+            get_thumbnail_executor.cache_clear()
+            executor.shutdown(wait=False, cancel_futures=True)
+    render_thumbnails(default_storage.path(name), targets)
+
+
+def store_avatar(upload):
+    """
+    Validates an uploaded picture and stores it under a content-hashed name, then queues its thumbnails.
+
+    The upload is read in chunks to hash it (large uploads are streamed to a temporary file by
+    Django), and only the image header is parsed here; decoding happens on the thumbnail pool.
+
+    Parameters:
+        upload (UploadedFile): The uploaded file.
+
+    Returns:
+        str: The storage name of the avatar, to assign to CustomUser.avatar.
+
+    Raises:
+        ValidationError: If the file is too large, not an image, in an unsupported format or too many pixels.
+    """
+    max_size = getattr(settings, 'ACCOUNTS_AVATAR_MAX_SIZE', 5 * 1024 * 1024)
+    if upload.size > max_size:
+        raise ValidationError(
+            'The picture must be smaller than %(max_mb)d MB.', code='avatar_too_large',
+            params={'max_mb': max_size // (1024 * 1024)},
+        )
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            image_format, (width, height) = image.format, image.size
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValidationError('Upload a valid JPEG, PNG, WebP or GIF picture.', code='avatar_invalid')
+    if image_format not in AVATAR_FORMATS:
+        raise ValidationError('Upload a valid JPEG, PNG, WebP or GIF picture.', code='avatar_invalid')
+    if width * height > getattr(settings, 'ACCOUNTS_AVATAR_MAX_PIXELS', 40_000_000):
+        raise ValidationError('The picture has too many pixels.', code='avatar_too_many_pixels')
+
+    name = f'{AVATAR_DIRECTORY}/{digest.hexdigest()[:32]}.{AVATAR_FORMATS[image_format]}'
+    if not default_storage.exists(name):
+        upload.seek(0)
+        name = default_storage.save(name, upload)
+    queue_thumbnails(name)
+    return name
+
+
+def avatar_urls(name):
+    """
+    Returns {size: URL} for an avatar, using the original picture for thumbnails not rendered yet.
+    """
+    original = default_storage.url(name)
+    return {
+        size: default_storage.url(thumbnail)
+        if default_storage.exists(thumbnail := thumbnail_name(name, size)) else original
+        for size in AVATAR_SIZES
+    }
@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db import router
+
+from .cache import USER_SNAPSHOT_FIELDS, get_user_snapshot, set_user_snapshot, user_snapshot_attnames
+from .hashing import HashingPoolSaturated, hashing_service
+
+UserModel = get_user_model()
+
+
+class EmailBackend(ModelBackend):
+    """
+    Authenticates users by email and password, verifying the password on the hashing service
+    so that the hasher never runs in the request thread.
+
+    Passwords stored with an outdated hasher or cost are rehashed with the preferred hasher
+    of the active PASSWORD_HASHER_PROFILE after a successful login.
+
+    The user loaded for every authenticated request by AuthenticationMiddleware comes from a
+    cached snapshot of the user row (see accounts.cache), so those requests skip the users table.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        """
+        Returns the active user matching the email and password, or None.
+
+        Parameters:
+            request (HttpRequest): The current request (may be None).
+            username (str): The email; also accepted as the `email` keyword argument.
+            password (str): The raw password.
+
+        Returns:
+            CustomUser | None: The authenticated user.
+        """
+        email = username if username is not None else kwargs.get(UserModel.USERNAME_FIELD)
+        if email is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(email)
+        except UserModel.DoesNotExist:
+            # Run the hasher once anyway so that unknown emails take as long as wrong passwords.
+            hashing_service.make_password(password)
+            return None
+        is_correct, must_update = hashing_service.verify_password(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            self.upgrade_password(user, password)
+        return user
+
+    def upgrade_password(self, user, password):
+        """
+        Rehashes the user's password with the preferred hasher and saves only the password column.
+        The upgrade is skipped, and retried on a later login, when the hashing pool is saturated.
+        """
+        try:
+            user.password = hashing_service.make_password(password)
+        except HashingPoolSaturated:
+            return
+        user.save(update_fields=['password'])
+
+    def get_user(self, user_id):
+        """
+        Returns the active user with the given primary key, or None.
+
+        The user is rebuilt from its cached snapshot when there is one. Otherwise only the
+        USER_SNAPSHOT_FIELDS columns are loaded and the snapshot is cached for the next request;
+        it is invalidated by every save and delete (see accounts.cache.drop_cached_user()).
+        The row is read from the primary, since a lagging replica would cache a row older than
+        the last invalidation. A user rebuilt from its snapshot re-reads its row before it is
+        saved (see DirtyFieldsMixin.from_cache()).
+        """
+        values = get_user_snapshot(user_id)
+        if values is not None:
+            user = UserModel.from_cache(router.db_for_read(UserModel), user_snapshot_attnames(UserModel), values)
+        else:
+            try:
+                user = (
+                    UserModel._default_manager.db_manager(router.db_for_write(UserModel, read_only=True))
+                    .only(*USER_SNAPSHOT_FIELDS).get(pk=user_id)
+                )
+            except UserModel.DoesNotExist:
+                return None
+            set_user_snapshot(user)
+        return user if self.user_can_authenticate(user) else None
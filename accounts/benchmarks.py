@@ -0,0 +1,437 @@
+"""
+Benchmarks for the accounts app, run with `manage.py benchmark <name>`.
+
+Every benchmark runs against a throwaway test database and returns a list of result
+rows (dicts) that the command prints as a table.
+"""
+import asyncio
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import AsyncClient, Client, override_settings
+from django.urls import include, path
+
+from .metrics import LatencyRecorder
+
+BENCHMARKS = {}
+
+BENCH_EMAIL = 'bench@example.com'
+BENCH_PASSWORD = 'Bench-pass1!'
+
+
+def register(name):
+    """
+    Registers a benchmark function under the given name.
+    """
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def result_row(name, recorder, elapsed, **extra):
+    """
+    Builds a result row from a LatencyRecorder and the wall-clock time of the run.
+    """
+    snapshot = recorder.snapshot()
+    return {
+        'name': name,
+        **extra,
+        'count': snapshot['count'],
+        'per_sec': snapshot['count'] / elapsed if elapsed else 0.0,
+        'p50_ms': snapshot['p50_ms'],
+        'p95_ms': snapshot['p95_ms'],
+        'p99_ms': snapshot['p99_ms'],
+    }
+
+
+def run_threaded(func, count, concurrency):
+    """
+    Calls func(worker_index) `count` times spread over `concurrency` threads.
+
+    Returns:
+        tuple: The LatencyRecorder with every call's latency and the elapsed wall-clock seconds.
+    """
+    recorder = LatencyRecorder(size=count)
+
+    def worker(index):
+        for _ in range(index, count, concurrency):
+            with recorder.time():
+                func(index)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    return recorder, time.perf_counter() - start
+
+
+def run_async(func, count, concurrency):
+    """
+    Awaits func(worker_index) `count` times spread over `concurrency` tasks.
+
+    Returns:
+        tuple: The LatencyRecorder with every call's latency and the elapsed wall-clock seconds.
+    """
+    recorder = LatencyRecorder(size=count)
+
+    async def worker(index):
+        for _ in range(index, count, concurrency):
+            start = time.perf_counter()
+            await func(index)
+            recorder.record(time.perf_counter() - start)
+
+    async def main():
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(index) for index in range(concurrency)))
+        return time.perf_counter() - start
+
+    return recorder, asyncio.run(main())
+
+
+def get_bench_user():
+    """
+    Returns the benchmark user, creating it on first use.
+    """
+    from .models import CustomUser
+
+    user = CustomUser.objects.filter(email=BENCH_EMAIL).first()
+    if user is None:
+        user = CustomUser.objects.create_user(email=BENCH_EMAIL, password=BENCH_PASSWORD, username='bench')
+    return user
+
+
+def bench_urlconf(async_views=()):
+    """
+    Builds a URLconf module for the project with the given accounts views served asynchronously.
+    """
+    from .urls import account_urlpatterns
+    from .views import home_view
+
+    urlconf = types.ModuleType('accounts_bench_urls')
+    urlconf.urlpatterns = [
+        path('', include(account_urlpatterns(async_views))),
+        path('', home_view, name='home'),
+    ]
+    return urlconf
+
+
+@register('asgi')
+def asgi_benchmark(requests=200, concurrency=8, **options):
+    """
+    Compares requests/sec of the sync views under WSGI with the async views under ASGI.
+    """
+    user = get_bench_user()
+    scenarios = [
+        ('login', 'get', '/login/', None, False),
+        ('login', 'post', '/login/', {'email': BENCH_EMAIL}, False),
+        ('profile', 'get', '/profile/', None, True),
+    ]
+    rows = []
+    for url_name, method, url, data, logged_in in scenarios:
+        name = f'{method.upper()} {url}'
+        with override_settings(ROOT_URLCONF=bench_urlconf()):
+            clients = [Client() for _ in range(concurrency)]
+            for client in clients:
+                if logged_in:
+                    client.force_login(user)
+            recorder, elapsed = run_threaded(
+                lambda index: getattr(clients[index], method)(url, data), requests, concurrency,
+            )
+            rows.append(result_row(name, recorder, elapsed, server='wsgi', views='sync'))
+        with override_settings(ROOT_URLCONF=bench_urlconf({url_name})):
+            async_clients = [AsyncClient() for _ in range(concurrency)]
+            for async_client in async_clients:
+                if logged_in:
+                    async_client.cookies = clients[0].cookies
+            recorder, elapsed = run_async(
+                lambda index: getattr(async_clients[index], method)(url, data), requests, concurrency,
+            )
+            rows.append(result_row(name, recorder, elapsed, server='asgi', views='async'))
+    return rows
+
+
+@register('hashing')
+def hashing_benchmark(requests=200, concurrency=8, **options):
+    """
+    Compares password hashing throughput inline in the request threads with the hashing service's process pool.
+    """
+    from .hashing import HashingPoolSaturated, HashingService, hashing_service
+
+    rows = []
+    for name, service in (('inline', HashingService(max_workers=0, max_pending=concurrency)), ('pool', hashing_service)):
+        rejected = service.rejected
+
+        def hash_password(index):
+            try:
+                service.make_password(BENCH_PASSWORD)
+            except HashingPoolSaturated:
+                pass
+
+        recorder, elapsed = run_threaded(hash_password, requests, concurrency)
+        rows.append(result_row(
+            'make_password', recorder, elapsed,
+            mode=name, workers=service.max_workers, rejected=service.rejected - rejected,
+        ))
+    return rows
+
+
+@register('password_policy')
+def password_policy_benchmark(requests=200, concurrency=1, **options):
+    """
+    Compares accounts.validators.PasswordPolicy with Django's default chain of four password validators.
+    """
+    from django.contrib.auth.password_validation import get_password_validators
+    from .models import CustomUser
+    from .validators import PasswordPolicy
+
+    django_validators = get_password_validators([
+        {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
+        {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
+        {'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator'},
+        {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'},
+    ])
+    policy = PasswordPolicy()
+    user = CustomUser(username='bench', email=BENCH_EMAIL)
+    passwords = [BENCH_PASSWORD, 'password', '12345678', 'Sh0rt!', 'no-uppercase-here!', 'Bench@example.com']
+
+    def run_django(index, user):
+        for password in passwords:
+            for validator in django_validators:
+                try:
+                    validator.validate(password, user)
+                except Exception:
+                    pass
+
+    def run_policy(index, user):
+        for password in passwords:
+            policy.errors(password, user)
+
+    rows = []
+    for similarity, bench_user in (('no', None), ('yes', user)):
+        for name, func in (('django validators', run_django), ('PasswordPolicy', run_policy)):
+            recorder, elapsed = run_threaded(lambda index: func(index, bench_user), requests, concurrency)
+            rows.append(result_row(name, recorder, elapsed, passwords=len(passwords), similarity=similarity))
+    return rows
+
+
+@register('signup')
+def signup_benchmark(requests=200, concurrency=8, **options):
+    """
+    Measures signup throughput of the configured database profile (DATABASE_PROFILE).
+
+    Password hashing is replaced by a precomputed hash so the numbers reflect database
+    contention only; `benchmark hashing` measures the hasher. With SQLite, the run is repeated
+    with the default rollback journal and with WAL. The test database must then be a file, as WAL
+    and lock contention do not apply to in-memory databases:
+
+        python manage.py benchmark signup --sqlite-path /tmp/e_shop_bench.sqlite3
+    """
+    from itertools import count
+    from unittest import mock
+
+    from django.conf import settings
+    from django.contrib.auth.hashers import make_password
+    from django.core.management import CommandError
+    from django.db import connection, connections
+
+    from .hashing import hashing_service
+
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        raise CommandError('Pass --sqlite-path (or set SQLITE_TEST_PATH) to benchmark signups on SQLite.')
+    encoded = make_password(BENCH_PASSWORD)
+    counter = count()
+    if connection.vendor == 'sqlite':
+        journal_modes = ['delete', 'wal']
+    else:
+        journal_modes = [None]
+
+    def signup(index):
+        number = next(counter)
+        Client().post('/signup/', {
+            'username': f'bench{number}',
+            'email': f'bench{number}@example.com',
+            'password': BENCH_PASSWORD,
+            'confirm_password': BENCH_PASSWORD,
+        })
+
+    rows = []
+    for journal_mode in journal_modes:
+        pragmas = {**settings.SQLITE_PRAGMAS, 'journal_mode': journal_mode} if journal_mode else settings.SQLITE_PRAGMAS
+        connections.close_all()
+        with override_settings(SQLITE_PRAGMAS=pragmas), mock.patch.object(hashing_service, 'make_password', return_value=encoded):
+            recorder, elapsed = run_threaded(signup, requests, concurrency)
+        rows.append(result_row(
+            'POST /signup/', recorder, elapsed,
+            vendor=connection.vendor, journal_mode=journal_mode or '-', database=str(connection.settings_dict['NAME']),
+        ))
+    return rows
+
+
+@register('templates')
+def templates_benchmark(requests=200, concurrency=1, **options):
+    """
+    Measures the render time of each account page's template with the plain loaders, with the
+    cached loader, and with the cached loader plus the {% cache %} fragments.
+    """
+    from copy import deepcopy
+
+    from django.conf import settings
+    from django.contrib.auth.models import AnonymousUser
+    from django.template.loader import render_to_string
+    from django.test import RequestFactory
+
+    user = get_bench_user()
+    pages = [
+        ('home', 'home.html', {'message': 'Welcome to the home page!'}, False),
+        ('login', 'accounts/login.html', {}, False),
+        ('login_step_2', 'accounts/password.html', {'email': BENCH_EMAIL}, False),
+        ('signup', 'accounts/signup.html', {}, False),
+        ('profile', 'accounts/profile.html', {'user': user}, True),
+        ('profile_edit', 'accounts/edit_profile.html', {'user': user}, True),
+        ('change_password', 'accounts/change_password.html', {}, True),
+    ]
+    uncached = deepcopy(settings.TEMPLATES)
+    uncached[0]['OPTIONS']['loaders'] = settings.TEMPLATE_LOADERS
+    no_fragments = {**settings.CACHES, 'template_fragments': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    configurations = [
+        ('plain', 'off', {'TEMPLATES': uncached, 'CACHES': no_fragments}),
+        ('cached', 'off', {'CACHES': no_fragments}),
+        ('cached', 'on', {}),
+    ]
+
+    rows = []
+    for url_name, template_name, context, logged_in in pages:
+        request = RequestFactory().get('/')
+        request.user = user if logged_in else AnonymousUser()
+        for loader, fragments, overrides in configurations:
+            with override_settings(**overrides):
+                render_to_string(template_name, context, request)
+                recorder, elapsed = run_threaded(
+                    lambda index: render_to_string(template_name, context, request), requests, concurrency,
+                )
+            rows.append(result_row(url_name, recorder, elapsed, template=template_name, loader=loader, fragments=fragments))
+    return rows
+
+
+@register('micro')
+def micro_benchmark(requests=200, concurrency=1, **options):
+    """
+    Microbenchmarks of the building blocks of signup and login: password validation, OTP generation
+    and create_user, with the hashing service and with a precomputed hash.
+    `benchmark hashing` measures the hasher on its own.
+
+    Like pytest-benchmark, each case runs sequentially in one thread so the numbers measure the code,
+    not contention; --concurrency is ignored.
+    """
+    concurrency = 1
+    from itertools import count
+    from unittest import mock
+
+    from django.contrib.auth.hashers import make_password
+
+    from .hashing import HashingPoolSaturated, hashing_service
+    from .models import CustomUser
+    from .utils import otp_generation, validate_password
+
+    user = CustomUser(username='bench', email=BENCH_EMAIL)
+    encoded = make_password(BENCH_PASSWORD)
+    counter = count()
+
+    def create_user(index):
+        number = next(counter)
+        try:
+            CustomUser.objects.create_user(
+                email=f'micro{number}@example.com', username=f'micro{number}', password=BENCH_PASSWORD,
+            )
+        except HashingPoolSaturated:
+            pass
+
+    rows = []
+    for name, func in (
+        ('validate_password', lambda index: validate_password(BENCH_PASSWORD, user)),
+        ('otp_generation', lambda index: otp_generation()),
+    ):
+        recorder, elapsed = run_threaded(func, requests, concurrency)
+        rows.append(result_row(name, recorder, elapsed, hashing='-', rejected=0))
+    rejected = hashing_service.rejected
+    recorder, elapsed = run_threaded(create_user, requests, concurrency)
+    rows.append(result_row('create_user', recorder, elapsed, hashing='pool', rejected=hashing_service.rejected - rejected))
+    with mock.patch.object(hashing_service, 'make_password', return_value=encoded):
+        recorder, elapsed = run_threaded(create_user, requests, concurrency)
+    rows.append(result_row('create_user', recorder, elapsed, hashing='precomputed', rejected=0))
+    return rows
+
+
+@register('replay')
+def replay_benchmark(requests=200, concurrency=8, trace=None, base_url=None, **options):
+    """
+    Replays a JSONL request trace (see accounts.replay) through the test client, or over HTTP with
+    --base-url, and reports latency percentiles, throughput and status codes per URL name.
+    """
+    from pathlib import Path
+
+    from .replay import ClientDriver, HTTPDriver, read_trace, replay
+
+    entries = read_trace(trace or Path(__file__).resolve().parent / 'traces' / 'sample.jsonl')
+    if base_url:
+        drivers = [HTTPDriver(base_url, BENCH_EMAIL, BENCH_PASSWORD) for _ in range(concurrency)]
+    else:
+        user = get_bench_user()
+        drivers = [ClientDriver(user) for _ in range(concurrency)]
+    recorders, statuses, total, elapsed = replay(entries, drivers, requests)
+    rows = []
+    for name in sorted(recorders):
+        codes = ' '.join(f'{code}x{number}' for code, number in sorted(statuses[name].items()))
+        rows.append(result_row(name, recorders[name], elapsed, statuses=codes))
+    rows.append(result_row('(all)', total, elapsed, statuses=''))
+    return rows
+
+
+@register('password_reset')
+def password_reset_benchmark(requests=200, concurrency=1, **options):
+    """
+    Measures the password reset flow through the test client: requesting an OTP for an existing and
+    for an unknown email, verifying a wrong and the right OTP, and setting the new password.
+
+    OTP generation is pinned so the right code is known, and the new password's hash is precomputed
+    so the last step measures the view rather than the hasher (see `benchmark hashing`).
+    Each step writes, so an in-memory SQLite test database runs with a single worker;
+    pass --sqlite-path to measure concurrent resets.
+    """
+    from unittest import mock
+
+    from django.contrib.auth.hashers import make_password
+    from django.db import connection
+
+    from .hashing import hashing_service
+
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        concurrency = 1
+    get_bench_user()
+    encoded = make_password(BENCH_PASSWORD)
+    steps = ['request', 'request (unknown email)', 'verify (wrong otp)', 'verify', 'complete']
+    recorders = {step: LatencyRecorder(size=requests) for step in steps}
+
+    def timed_post(step, client, url, data):
+        start = time.perf_counter()
+        response = client.post(url, data)
+        recorders[step].record(time.perf_counter() - start)
+        return response
+
+    def reset(index):
+        client = Client()
+        timed_post('request (unknown email)', client, '/password-reset/otp/', {'email': f'nobody{index}@example.com'})
+        timed_post('request', client, '/password-reset/otp/', {'email': BENCH_EMAIL})
+        timed_post('verify (wrong otp)', client, '/password-reset/otp/', {'otp': '000000'})
+        timed_post('verify', client, '/password-reset/otp/', {'otp': '123456'})
+        timed_post('complete', client, '/password-reset/complete/', {
+            'new_password1': BENCH_PASSWORD, 'new_password2': BENCH_PASSWORD,
+        })
+
+    with mock.patch('accounts.otp.otp_generation', return_value=123456), \
+            mock.patch.object(hashing_service, 'make_password', return_value=encoded):
+        recorder, elapsed = run_threaded(reset, requests, concurrency)
+    rows = [result_row(step, recorders[step], elapsed) for step in steps]
+    rows.append(result_row('(reset flow)', recorder, elapsed))
+    return rows
@@ -0,0 +1,243 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.base_user import BaseUserManager
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
+
+
+def normalize_email(email):
+    """
+    Normalizes an email address for lookups and cache keys.
+
+    Surrounding whitespace is stripped and the domain part is lowercased,
+    matching what CustomUserManager stores when a user is created.
+
+    Parameters:
+        email (str): The raw email address, e.g. from request.POST.
+
+    Returns:
+        str: The normalized email address ('' if email is empty).
+    """
+    return BaseUserManager.normalize_email((email or '').strip())
+
+
+class EmailExistenceCache:
+    """
+    A bounded, thread-safe LRU of email addresses known to belong to an account.
+    Emails are compared case-insensitively, like the unique index on LOWER(email).
+
+    Only positive results are cached: a miss always falls through to the database,
+    so an account created by another process is never reported as missing.
+    Entries expire after `ttl` seconds, which bounds how long an email that was
+    changed or deleted in another process can still be reported as existing.
+
+    Attributes:
+        maxsize (int): The maximum number of emails kept in the cache.
+        ttl (float): The number of seconds an entry stays valid.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, email):
+        email = (email or '').lower()
+        with self._lock:
+            expires_at = self._entries.get(email)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[email]
+                return False
+            self._entries.move_to_end(email)
+            return True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, email):
+        """
+        Marks an email as belonging to an existing account.
+        """
+        if not email or self.maxsize <= 0:
+            return
+        email = email.lower()
+        with self._lock:
+            self._entries[email] = time.monotonic() + self.ttl
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, *emails):
+        """
+        Removes the given emails from the cache, ignoring unknown ones.
+        """
+        with self._lock:
+            for email in emails:
+                if email:
+                    self._entries.pop(email.lower(), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+email_cache = EmailExistenceCache(
+    maxsize=getattr(settings, 'ACCOUNTS_EMAIL_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'ACCOUNTS_EMAIL_CACHE_TTL', 300),
+)
+
+
+def email_exists(email):
+    """
+    Checks whether an account is registered with the given email.
+
+    Cached emails are answered from memory. Otherwise a single EXISTS query is
+    issued against the LOWER(email) index, so no user row or column (bio, location,
+    password, ...) is ever loaded.
+
+    Parameters:
+        email (str): The email address to look up.
+
+    Returns:
+        bool: True if an account with this email exists, False otherwise.
+    """
+    from .models import CustomUser
+
+    email = normalize_email(email)
+    if not email:
+        return False
+    if email in email_cache:
+        return True
+    exists = CustomUser.objects.filter(email__lower=email.lower()).exists()
+    if exists:
+        email_cache.add(email)
+    return exists
+
+
+async def aemail_exists(email):
+    """
+    Async version of email_exists() for ASGI views.
+    """
+    from .models import CustomUser
+
+    email = normalize_email(email)
+    if not email:
+        return False
+    if email in email_cache:
+        return True
+    exists = await CustomUser.objects.filter(email__lower=email.lower()).aexists()
+    if exists:
+        email_cache.add(email)
+    return exists
+
+
+# Snapshots of the user row used by accounts.backends.EmailBackend.get_user(), so that
+# authenticated requests do not query the users table. Bump USER_SNAPSHOT_VERSION whenever
+# USER_SNAPSHOT_FIELDS changes, so that snapshots of the old shape are ignored.
+USER_SNAPSHOT_VERSION = 3
+USER_SNAPSHOT_FIELDS = (
+    'id', 'password', 'last_login', 'is_superuser', 'username', 'first_name', 'last_name',
+    'email', 'is_staff', 'is_active', 'date_joined', 'date_of_birth', 'bio', 'location', 'avatar',
+    'version',
+)
+# An invalidated snapshot is replaced by this marker for USER_SNAPSHOT_INVALIDATION_TIMEOUT seconds,
+# so that a request that read the row before the write committed cannot cache it afterwards.
+USER_SNAPSHOT_INVALIDATED = 'invalidated'
+USER_SNAPSHOT_INVALIDATION_TIMEOUT = 30
+
+
+def user_snapshot_attnames(model):
+    """
+    Returns the attnames of USER_SNAPSHOT_FIELDS in the model's concrete field order, as Model.from_db() expects.
+    """
+    return [field.attname for field in model._meta.concrete_fields if field.name in USER_SNAPSHOT_FIELDS]
+
+
+def user_snapshot_cache():
+    """
+    Returns the cache holding user snapshots, or None when snapshots are disabled.
+
+    Every write drops the snapshot, which only reaches the other worker processes through a
+    shared cache, so snapshots are disabled when ACCOUNTS_USER_CACHE_ALIAS is unset or
+    points at a process-local LocMemCache.
+    """
+    alias = getattr(settings, 'ACCOUNTS_USER_CACHE_ALIAS', None)
+    if alias is None:
+        return None
+    cache = caches[alias]
+    if isinstance(cache, LocMemCache):
+        return None
+    return cache
+
+
+def user_snapshot_key(user_id):
+    return f'accounts:user:v{USER_SNAPSHOT_VERSION}:{user_id}'
+
+
+def get_user_snapshot(user_id):
+    """
+    Returns the cached column values of a user, ordered like user_snapshot_attnames(), or None.
+    """
+    cache = user_snapshot_cache()
+    if cache is None:
+        return None
+    values = cache.get(user_snapshot_key(user_id))
+    return None if values == USER_SNAPSHOT_INVALIDATED else values
+
+
+def set_user_snapshot(user):
+    """
+    Caches the USER_SNAPSHOT_FIELDS columns of a user for ACCOUNTS_USER_CACHE_TIMEOUT seconds.
+
+    The snapshot is only added, never replaces an entry, so it cannot overwrite the marker left by
+    an invalidation that happened after the row was read.
+    """
+    cache = user_snapshot_cache()
+    if cache is None:
+        return
+    values = [getattr(user, attname) for attname in user_snapshot_attnames(type(user))]
+    # File fields are cached as their name rather than as a FieldFile bound to this instance.
+    values = [value.name if isinstance(value, FieldFile) else value for value in values]
+    cache.add(
+        user_snapshot_key(user.pk), values, timeout=getattr(settings, 'ACCOUNTS_USER_CACHE_TIMEOUT', 300),
+    )
+
+
+def invalidate_user_snapshots(*user_ids, using=None):
+    """
+    Replaces the cached snapshots of the given users with the invalidation marker, right away and
+    again when the current transaction on `using` commits, so that no snapshot read before the
+    write is cached after it.
+
+    Saves and deletes, including QuerySet.delete(), are covered by drop_cached_user(); this must be
+    called by every write that sends no signal, such as QuerySet.update() or bulk_update().
+    """
+    cache = user_snapshot_cache()
+    if cache is None or not user_ids:
+        return
+    markers = {user_snapshot_key(user_id): USER_SNAPSHOT_INVALIDATED for user_id in user_ids}
+
+    def invalidate():
+        cache.set_many(markers, timeout=USER_SNAPSHOT_INVALIDATION_TIMEOUT)
+
+    invalidate()
+    transaction.on_commit(invalidate, using=using)
+
+
+def drop_cached_user(sender, instance, using, **kwargs):
+    """
+    post_save/post_delete receiver dropping a user's cached snapshot and emails (the previous one
+    too after an email change) right away and once the write commits.
+    """
+    emails = (getattr(instance, '_original_values', {}).get('email'), instance.email)
+    email_cache.discard(*emails)
+    transaction.on_commit(lambda: email_cache.discard(*emails), using=using)
+    invalidate_user_snapshots(instance.pk, using=using)
@@ -0,0 +1,111 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# The replica routing state of the current request, set by ReplicaPinningMiddleware:
+# {'pinned': whether reads must go to the primary, 'wrote': whether a write was routed}.
+replica_state = ContextVar('accounts_replica_state', default=None)
+
+
+# Pragmas stored in the database file rather than in the connection.
+PERSISTENT_SQLITE_PRAGMAS = {'journal_mode'}
+
+# The persistent pragma values applied by this process, by (database name, pragma).
+_applied_sqlite_pragmas = {}
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Applies the SQLITE_PRAGMAS setting to every new SQLite connection.
+
+    Connection-level pragmas are set on each connection. Persistent ones (journal_mode) are
+    set once per database file and process, and only if the file does not use that value yet,
+    instead of taking a write lock on every new connection.
+
+    Connected to the connection_created signal in AccountsConfig.ready(); connections to
+    other database vendors are left alone.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    database = str(connection.settings_dict['NAME'])
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            if name not in PERSISTENT_SQLITE_PRAGMAS:
+                cursor.execute(f'PRAGMA {name} = {value}')
+            elif _applied_sqlite_pragmas.get((database, name)) != value:
+                cursor.execute(f'PRAGMA {name}')
+                if str(cursor.fetchone()[0]).lower() != str(value).lower():
+                    cursor.execute(f'PRAGMA {name} = {value}')
+                _applied_sqlite_pragmas[database, name] = value
+
+
+def estimate_row_count(model, using='default'):
+    """
+    Returns the planner's estimate of the number of rows of a model's table, without counting them.
+
+    PostgreSQL keeps it in pg_class.reltuples and SQLite in sqlite_stat1, both refreshed by
+    ANALYZE (autovacuum does it on PostgreSQL).
+
+    Returns:
+        int: The estimated row count, or None if the database has no statistics for the table.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)', [connection.ops.quote_name(table)])
+            row = cursor.fetchone()
+            return int(row[0]) if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+    return None
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the DATABASE_REPLICAS aliases and every write to the primary ('default').
+
+    Reads stay on the primary when there are no replicas, inside a transaction on the primary, for
+    models of PRIMARY_ONLY_APPS, and for requests pinned by ReplicaPinningMiddleware. Routed writes are
+    noted in the request's replica_state so the middleware can pin the client's next requests;
+    db_for_write() calls with the read_only hint only read from the primary and do not pin.
+    Migrations only run on the primary; replicas get the schema through replication.
+    """
+
+    # Sessions are read on every request right after being written at login; a replica that lags
+    # behind would log the user out.
+    PRIMARY_ONLY_APPS = {'sessions'}
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        if not replicas or model._meta.app_label in self.PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        state = replica_state.get()
+        if state is not None and state['pinned']:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Code that only reads from the primary asks for it with the read_only hint, which does not pin.
+        state = replica_state.get()
+        if state is not None and not hints.get('read_only'):
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *getattr(settings, 'DATABASE_REPLICAS', ())}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,100 @@
+import hashlib
+import time
+from functools import partial, wraps
+from hmac import compare_digest
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag, urlencode
+
+
+def cache_anonymous_page(view=None, *, query_params=()):
+    """
+    Serves GET/HEAD requests of anonymous users from a rendered copy of the page, with an ETag,
+    Last-Modified and 'Cache-Control: public, max-age' so browsers, CDNs and reverse proxies can reuse it,
+    and answers matching conditional requests with '304 Not Modified'.
+
+    Authenticated users, other methods and requests carrying flash messages always reach the view and
+    get 'Cache-Control: private'. Responses that are not 200, that set cookies or that embed a CSRF token
+    (the CSRF cookie is only added afterwards by CsrfViewMiddleware) are never cached.
+    Every response varies on Cookie, so a shared cache never serves the anonymous copy to a logged-in user.
+
+    The copy is kept in the ACCOUNTS_PAGE_CACHE_ALIAS cache for ACCOUNTS_PAGE_CACHE_TIMEOUT seconds,
+    which is also the max-age sent to clients. It is keyed on the path and the values of the query
+    parameters listed in query_params, e.g. @cache_anonymous_page(query_params=['page']); other
+    parameters are ignored, so random query strings cannot fill the cache and evict the real pages.
+    """
+    if view is None:
+        return partial(cache_anonymous_page, query_params=query_params)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or CookieStorage.cookie_name in request.COOKIES
+            or request.user.is_authenticated
+        ):
+            response = view(request, *args, **kwargs)
+            patch_cache_control(response, private=True)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+
+        timeout = getattr(settings, 'ACCOUNTS_PAGE_CACHE_TIMEOUT', 300)
+        cache = caches[getattr(settings, 'ACCOUNTS_PAGE_CACHE_ALIAS', 'default')]
+        query = urlencode([(name, value) for name in sorted(query_params) for value in request.GET.getlist(name)])
+        key = f'accounts:page:{request.path}?{query}'
+        page = cache.get(key)
+        if page is None:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            if (
+                response.status_code != 200
+                or response.streaming
+                or response.cookies
+                or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+            ):
+                patch_vary_headers(response, ['Cookie'])
+                return response
+            page = {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'etag': quote_etag(hashlib.md5(response.content, usedforsecurity=False).hexdigest()),
+                'last_modified': int(time.time()),
+            }
+            cache.set(key, page, timeout)
+
+        response = HttpResponse(page['content'], content_type=page['content_type'])
+        response.headers['ETag'] = page['etag']
+        response.headers['Last-Modified'] = http_date(page['last_modified'])
+        patch_cache_control(response, public=True, max_age=timeout)
+        patch_vary_headers(response, ['Cookie'])
+        return get_conditional_response(
+            request, etag=page['etag'], last_modified=page['last_modified'], response=response,
+        )
+    return wrapper
+
+
+def api_auth_required(view):
+    """
+    Lets through requests carrying one of the ACCOUNTS_API_TOKENS as 'Authorization: Bearer <token>',
+    which is how other services call the API, and requests of logged-in staff users.
+    Others get a JSON '401 Unauthorized', or '403 Forbidden' for logged-in users who are not staff.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() == 'bearer' and token:
+            if any(compare_digest(token.encode(), known.encode()) for known in getattr(settings, 'ACCOUNTS_API_TOKENS', ())):
+                return view(request, *args, **kwargs)
+        elif request.user.is_authenticated:
+            if request.user.is_staff:
+                return view(request, *args, **kwargs)
+            return JsonResponse({'error': 'Staff access required.'}, status=403)
+        response = JsonResponse({'error': 'Authentication required.'}, status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return wrapper
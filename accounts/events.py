@@ -0,0 +1,208 @@
+"""
+Buffered login events and coalesced last_login updates.
+
+Django's update_last_login receiver writes the user row on every login. Instead, logins and failed
+login attempts are appended to an in-memory buffer, and the request that finds the buffer full
+(ACCOUNTS_LOGIN_EVENTS_BATCH_SIZE events) or older than ACCOUNTS_LOGIN_EVENTS_FLUSH_INTERVAL seconds
+writes it out: one bulk_create into LoginEvent and one bulk_update of last_login, holding a single
+row per user however often that user logged in during the window.
+
+A request_finished receiver also writes out a buffer that is due, so events do not wait for the
+next login to be written. A failed write keeps its events for a retry one flush interval later, up to
+ACCOUNTS_LOGIN_EVENTS_MAX_BUFFER events, beyond which the oldest are dropped.
+
+Each worker process keeps its own buffer. Events still buffered when a process exits are lost: the
+ones recorded since the last flush, plus any kept after failed writes.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .cache import invalidate_user_snapshots, normalize_email
+from .ratelimit import client_ip
+
+logger = logging.getLogger(__name__)
+
+
+class LoginEventBuffer:
+    """
+    Collects login events and last_login timestamps and writes them in batches.
+
+    Attributes:
+        batch_size (int): The number of buffered events that triggers a flush.
+        flush_interval (float): The age in seconds of the oldest buffered event that triggers a flush.
+        max_buffer (int): The most events kept while writes fail; the oldest are dropped beyond it.
+            Failed writes are retried flush_interval seconds later.
+        recorded (int): The number of events recorded.
+        written (int): The number of events written to the database.
+        dropped (int): The number of events dropped from a full buffer.
+        flushes (int): The number of batches written.
+        last_logins (int): The number of last_login values written, after coalescing.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=5.0, max_buffer=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.last_logins = 0
+        self._events = []
+        self._last_login = {}
+        self._oldest = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, event, last_login=None):
+        """
+        Buffers an unsaved LoginEvent, and the user's new last_login if given, flushing if due.
+
+        Parameters:
+            event (LoginEvent): The event to write.
+            last_login (datetime, optional): The login time to store on event.user_id.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.recorded += 1
+            self._events.append(event)
+            if len(self._events) > self.max_buffer:
+                del self._events[0]
+                self.dropped += 1
+            if last_login is not None:
+                self._last_login[event.user_id] = last_login
+            if self._oldest is None:
+                self._oldest = now
+            due = now >= self._retry_at and (
+                len(self._events) >= self.batch_size or now - self._oldest >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush_if_due(self):
+        """
+        Flushes the buffer if its oldest event is flush_interval seconds old, without taking the lock otherwise.
+        """
+        oldest, now = self._oldest, time.monotonic()
+        if oldest is not None and now - oldest >= self.flush_interval and now >= self._retry_at:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes every buffered event and last_login in one transaction.
+        A failed write is logged and its events and last_login values go back to the buffer for a
+        retry after flush_interval seconds, so logins never fail because of the log.
+
+        Returns:
+            int: The number of events written.
+        """
+        from .models import CustomUser, LoginEvent
+
+        with self._lock:
+            events, last_logins = self._events, self._last_login
+            self._events, self._last_login, self._oldest = [], {}, None
+        if not events and not last_logins:
+            return 0
+        try:
+            with transaction.atomic():
+                LoginEvent.objects.bulk_create(events, batch_size=self.batch_size)
+                if last_logins:
+                    CustomUser.objects.bulk_update(
+                        [CustomUser(pk=pk, last_login=value) for pk, value in last_logins.items()],
+                        ['last_login'], batch_size=self.batch_size,
+                    )
+        except DatabaseError:
+            logger.exception('Keeping %d login event(s) for a retry after a failed write', len(events))
+            self._requeue(events, last_logins)
+            return 0
+        invalidate_user_snapshots(*last_logins)
+        with self._lock:
+            self._retry_at = 0.0
+            self.written += len(events)
+            self.last_logins += len(last_logins)
+            self.flushes += 1
+        return len(events)
+
+    def _requeue(self, events, last_logins):
+        """
+        Puts the events and last_login values of a failed write back in front of the newer ones.
+        """
+        for event in events:
+            event.pk = None
+        with self._lock:
+            self._events[:0] = events
+            overflow = len(self._events) - self.max_buffer
+            if overflow > 0:
+                del self._events[:overflow]
+                self.dropped += overflow
+            self._last_login = {**last_logins, **self._last_login}
+            now = time.monotonic()
+            self._oldest = now if self._oldest is None else min(self._oldest, now)
+            self._retry_at = now + self.flush_interval
+
+    def stats(self):
+        """
+        Returns the buffer metrics.
+
+        Returns:
+            dict: buffered, recorded, written, dropped, flushes and last_logins.
+        """
+        with self._lock:
+            return {
+                'buffered': len(self._events),
+                'recorded': self.recorded,
+                'written': self.written,
+                'dropped': self.dropped,
+                'flushes': self.flushes,
+                'last_logins': self.last_logins,
+            }
+
+
+login_events = LoginEventBuffer(
+    batch_size=getattr(settings, 'ACCOUNTS_LOGIN_EVENTS_BATCH_SIZE', 500),
+    flush_interval=getattr(settings, 'ACCOUNTS_LOGIN_EVENTS_FLUSH_INTERVAL', 5.0),
+    max_buffer=getattr(settings, 'ACCOUNTS_LOGIN_EVENTS_MAX_BUFFER', 10000),
+)
+
+
+def flush_login_events(sender, **kwargs):
+    """
+    request_finished receiver writing out the buffer once it is due, even when no further login arrives to fill it.
+    """
+    login_events.flush_if_due()
+
+
+def _ip_address(request):
+    return client_ip(request) if request is not None else None
+
+
+def record_login(sender, request, user, **kwargs):
+    """
+    user_logged_in receiver replacing django.contrib.auth's update_last_login: sets last_login on the
+    instance and buffers the event and the new last_login instead of saving the user row.
+    """
+    from .models import LoginEvent
+
+    now = timezone.now()
+    user.last_login = now
+    if hasattr(user, '_mark_saved'):
+        user._mark_saved(['last_login'])
+    login_events.record(
+        LoginEvent(user_id=user.pk, email=user.email, succeeded=True, ip_address=_ip_address(request), created_at=now),
+        last_login=now,
+    )
+
+
+def record_login_failure(sender, credentials, request=None, **kwargs):
+    """
+    user_login_failed receiver buffering a failed attempt under the submitted email, without a query.
+    """
+    from .models import LoginEvent
+
+    email = normalize_email(credentials.get('email') or credentials.get('username') or '')
+    login_events.record(LoginEvent(email=email[:254], succeeded=False, ip_address=_ip_address(request)))
@@ -0,0 +1,13 @@
+from django.contrib.auth.hashers import ScryptPasswordHasher
+
+
+class HighSecurityScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    Scrypt with twice Django's default work factor, used by the 'high-security' hasher profile.
+
+    maxmem is raised accordingly: 128 * n * r bytes (32 MiB here) is above OpenSSL's default limit.
+    Hashes made with a lower work factor are still verified, then upgraded on the next login.
+    """
+    work_factor = 2**15
+    maxmem = 64 * 1024 * 1024
+
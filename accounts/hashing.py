@@ -0,0 +1,167 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from .metrics import LatencyRecorder
+from .timing import timed
+
+
+class HashingPoolSaturated(Exception):
+    """
+    Raised when every slot of the hashing pool is taken, so the request should be retried later.
+
+    Attributes:
+        retry_after (int): The number of seconds the client should wait before retrying.
+    """
+
+    def __init__(self, retry_after=1):
+        super().__init__('The password hashing pool is saturated.')
+        self.retry_after = retry_after
+
+
+def _init_worker(settings_module):
+    """
+    Configures Django in a freshly spawned hashing worker process.
+    """
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+class HashingService:
+    """
+    Runs password hashing and verification on a bounded pool of worker processes.
+
+    Hashers such as PBKDF2 are CPU bound and hold the GIL, so running them in the request
+    thread stalls every other request served by the same process. At most `max_pending`
+    operations may be queued or running at once; beyond that HashingPoolSaturated is raised
+    immediately instead of letting requests pile up behind the pool.
+
+    Attributes:
+        max_workers (int): The number of worker processes (0 hashes inline in the calling thread).
+        max_pending (int): The maximum number of operations queued or running at once.
+        retry_after (int): The Retry-After value, in seconds, suggested when the pool is saturated.
+        rejected (int): The number of operations refused because the pool was saturated.
+        latency (dict): A LatencyRecorder per operation ('hash' and 'verify').
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, retry_after=1):
+        self.max_workers = os.cpu_count() if max_workers is None else max_workers
+        self.max_pending = max_pending or max(self.max_workers, 1) * 4
+        self.retry_after = retry_after
+        self.rejected = 0
+        self.latency = {'hash': LatencyRecorder(), 'verify': LatencyRecorder()}
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def make_password(self, password):
+        """
+        Hashes a raw password with the preferred hasher.
+
+        Returns:
+            str: The encoded password, ready to be stored in CustomUser.password.
+
+        Raises:
+            HashingPoolSaturated: If the pool has no free slot.
+        """
+        return self._run('hash', hashers.make_password, password)
+
+    def make_passwords(self, passwords):
+        """
+        Hashes many raw passwords at once, spread over every worker process.
+
+        Meant for batch jobs such as `manage.py import_users`; unlike make_password() it is not
+        subject to the max_pending limit, which protects interactive requests.
+
+        Returns:
+            list: The encoded passwords, in the same order as `passwords`.
+        """
+        passwords = list(passwords)
+        if self.max_workers == 0 or len(passwords) < 2:
+            return [hashers.make_password(password) for password in passwords]
+        chunksize = max(1, len(passwords) // (self.max_workers * 4))
+        return list(self._get_executor().map(hashers.make_password, passwords, chunksize=chunksize))
+
+    def check_password(self, password, encoded):
+        """
+        Checks a raw password against an encoded one.
+
+        Returns:
+            bool: True if the password matches, False otherwise.
+
+        Raises:
+            HashingPoolSaturated: If the pool has no free slot.
+        """
+        return self.verify_password(password, encoded)[0]
+
+    def verify_password(self, password, encoded):
+        """
+        Checks a raw password against an encoded one and tells whether the hash is outdated.
+
+        Returns:
+            tuple: (is_correct, must_update), where must_update is True when the encoded password
+            does not use the preferred hasher or its current cost.
+
+        Raises:
+            HashingPoolSaturated: If the pool has no free slot.
+        """
+        return self._run('verify', hashers.verify_password, password, encoded)
+
+    def stats(self):
+        """
+        Returns the pool size, the number of rejected operations and the latency percentiles per operation.
+        """
+        return {
+            'workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected,
+            **{operation: recorder.snapshot() for operation, recorder in self.latency.items()},
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _run(self, operation, func, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingPoolSaturated(self.retry_after)
+        try:
+            with self.latency[operation].time(), timed('hash'):
+                if self.max_workers == 0:
+                    return func(*args)
+                try:
+                    return self._get_executor().submit(func, *args).result()
+                except BrokenProcessPool:
+                    self.shutdown()
+                    return func(*args)
+        finally:
+            self._slots.release()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'e_shop.settings'),),
+                    )
+        return self._executor
+
+
+hashing_service = HashingService(
+    max_workers=getattr(settings, 'ACCOUNTS_HASHING_WORKERS', None),
+    max_pending=getattr(settings, 'ACCOUNTS_HASHING_MAX_PENDING', None),
+    retry_after=getattr(settings, 'ACCOUNTS_HASHING_RETRY_AFTER', 1),
+)
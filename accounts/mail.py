@@ -0,0 +1,168 @@
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+from .metrics import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+
+class EmailDispatcher:
+    """
+    Sends outgoing email from a background thread so that views never wait on SMTP.
+
+    Queued messages are drained in batches of up to `batch_size` and sent over a single
+    connection of the configured EMAIL_BACKEND, which is kept open while the queue has work.
+    Messages are handed to the connection one at a time, so when a send fails only the messages
+    not sent yet are retried, with exponential backoff, before they are dropped and logged.
+    When the queue is full, a message is sent synchronously over its own connection instead.
+
+    Attributes:
+        batch_size (int): The maximum number of messages sent over one connection in a single call.
+        max_retries (int): How many times a failing batch is retried.
+        backoff (float): The delay in seconds before the first retry; doubled on each further retry.
+        run_async (bool): Whether messages are sent from the worker thread (False sends them inline).
+        sent (int): The number of messages sent successfully.
+        failed (int): The number of messages dropped after exhausting the retries.
+        overflowed (int): The number of messages sent synchronously because the queue was full.
+        retries (int): The number of batch retries performed.
+        latency (LatencyRecorder): The time spent sending each batch.
+    """
+
+    def __init__(self, batch_size=50, max_retries=3, backoff=1.0, max_queue_size=10000, run_async=True):
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.run_async = run_async
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.overflowed = 0
+        self.latency = LatencyRecorder()
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._connection = None
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        """
+        Queues an EmailMessage (or EmailMultiAlternatives) for delivery.
+
+        If the queue already holds max_queue_size messages, the message is sent synchronously
+        instead, so callers never have to handle a full queue.
+
+        Parameters:
+            message (EmailMessage): The message to send.
+        """
+        if not self.run_async:
+            self._deliver([message])
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed += 1
+            self._send_now(message)
+
+    def flush(self):
+        """
+        Blocks until every queued message has been sent or dropped.
+        """
+        self._queue.join()
+
+    def stats(self):
+        """
+        Returns the dispatcher metrics.
+
+        Returns:
+            dict: queue_depth, sent, failed, retries and the send latency percentiles.
+        """
+        return {
+            'queue_depth': self._queue.qsize(),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'overflowed': self.overflowed,
+            'latency': self.latency.snapshot(),
+        }
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='accounts-email', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._deliver(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if self._queue.empty():
+                self._close_connection()
+
+    def _deliver(self, batch):
+        pending = list(batch)
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self._connection is None:
+                    self._connection = get_connection()
+                    self._connection.open()
+                with self.latency.time():
+                    while pending:
+                        self._connection.send_messages(pending[:1])
+                        pending.pop(0)
+                        self.sent += 1
+                if not self.run_async:
+                    self._close_connection()
+                return
+            except Exception:
+                self._close_connection()
+                if attempt == self.max_retries:
+                    self.failed += len(pending)
+                    logger.exception('Dropping %d email(s) after %d attempts', len(pending), attempt + 1)
+                    return
+                self.retries += 1
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def _send_now(self, message):
+        """
+        Sends one message over a connection of its own, as the worker thread owns self._connection.
+        """
+        try:
+            get_connection().send_messages([message])
+        except Exception:
+            self.failed += 1
+            logger.exception('Dropping an email that could not be queued or sent')
+            return
+        self.sent += 1
+
+    def _close_connection(self):
+        if self._connection is None:
+            return
+        try:
+            self._connection.close()
+        except Exception:
+            logger.warning('Error while closing the email connection', exc_info=True)
+        self._connection = None
+
+
+dispatcher = EmailDispatcher(
+    batch_size=getattr(settings, 'ACCOUNTS_EMAIL_BATCH_SIZE', 50),
+    max_retries=getattr(settings, 'ACCOUNTS_EMAIL_MAX_RETRIES', 3),
+    backoff=getattr(settings, 'ACCOUNTS_EMAIL_RETRY_BACKOFF', 1.0),
+    run_async=getattr(settings, 'ACCOUNTS_EMAIL_ASYNC', True),
+)
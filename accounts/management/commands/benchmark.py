@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from accounts.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = 'Runs an accounts benchmark against a throwaway test database and prints the results.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(BENCHMARKS), help='The benchmark to run.')
+        parser.add_argument('--requests', type=int, default=200, help='Number of requests or iterations per scenario.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Number of concurrent workers.')
+        parser.add_argument('--trace', help='replay: the JSONL request trace (default: accounts/traces/sample.jsonl).')
+        parser.add_argument('--base-url', help='replay: send the requests over HTTP to this server instead of the test client.')
+        parser.add_argument(
+            '--sqlite-path',
+            help='Create the SQLite test database in this file instead of SQLITE_TEST_PATH (or in memory).',
+        )
+
+    def handle(self, *args, name, sqlite_path=None, **options):
+        if sqlite_path:
+            for connection in connections.all():
+                if connection.vendor == 'sqlite':
+                    connection.settings_dict['TEST']['NAME'] = sqlite_path
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # Benchmarks replay many requests from one client; rate limiting would turn them into 429s.
+            with override_settings(ACCOUNTS_RATELIMITS={}):
+                rows = BENCHMARKS[name](**options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+        self.print_table(rows)
+
+    def print_table(self, rows):
+        if not rows:
+            return
+        columns = list(rows[0])
+        cells = [[self.format_cell(row.get(column, '')) for column in columns] for row in rows]
+        widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(columns)]
+        self.stdout.write('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+        for line in cells:
+            self.stdout.write('  '.join(cell.ljust(width) for cell, width in zip(line, widths)))
+
+    def format_cell(self, value):
+        if isinstance(value, float):
+            return f'{value:.2f}'
+        return str(value)
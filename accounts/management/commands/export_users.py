@@ -0,0 +1,36 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import CustomUser
+from accounts.user_io import FORMATS, USER_FIELDS, RowWriter, guess_format
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports users, including their password hashes, to a CSV or JSONL file. '
+        'Rows are streamed from the database in chunks, so memory use does not grow with the table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="The file to write, or '-' for standard output.")
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension, or csv.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Number of rows fetched per query.')
+
+    def handle(self, *args, path, format, batch_size, **options):
+        format = format or guess_format(path)
+        start = time.perf_counter()
+        count = 0
+        file = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        try:
+            writer = RowWriter(file, format)
+            rows = CustomUser.objects.order_by('pk').values_list(*USER_FIELDS).iterator(chunk_size=batch_size)
+            for row in rows:
+                writer.write(row)
+                count += 1
+        finally:
+            if file is not sys.stdout:
+                file.close()
+        elapsed = time.perf_counter() - start
+        self.stderr.write(f'Exported {count} user(s) in {elapsed:.1f}s, {count / elapsed if elapsed else 0:.0f} rows/sec.')
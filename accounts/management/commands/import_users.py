@@ -0,0 +1,168 @@
+import re
+import sys
+import time
+
+from django.contrib.auth.hashers import (
+    UNUSABLE_PASSWORD_PREFIX, UNUSABLE_PASSWORD_SUFFIX_LENGTH, identify_hasher, make_password,
+)
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from accounts.cache import invalidate_user_snapshots
+from accounts.hashing import HashingService
+from accounts.models import CustomUser
+from accounts.user_io import FORMATS, USER_FIELDS, chunked, guess_format, read_rows
+
+BOOLEAN_FIELDS = ('is_active', 'is_staff')
+# The unusable passwords written by make_password(None).
+UNUSABLE_PASSWORD = re.compile(rf'{re.escape(UNUSABLE_PASSWORD_PREFIX)}[a-zA-Z0-9]{{{UNUSABLE_PASSWORD_SUFFIX_LENGTH}}}')
+UPDATABLE_FIELDS = tuple(field for field in USER_FIELDS if field not in ('email', 'date_joined'))
+
+
+class RejectedRow(ValueError):
+    """
+    Raised by Command.clean_row() for a row that cannot be imported.
+    """
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports users from a CSV or JSONL file in batches with bulk_create/bulk_update. '
+        'Passwords that are already hashed are stored as-is; raw passwords are hashed on a process pool.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The file to import, or '-' for standard input.")
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension, or csv.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows written per query.')
+        parser.add_argument('--workers', type=int, default=None, help='Hashing processes (default: one per CPU, 0 hashes inline).')
+        parser.add_argument('--update', action='store_true', help='Update users whose email already exists instead of skipping them.')
+
+    def handle(self, *args, path, format, batch_size, workers, update, **options):
+        format = format or guess_format(path)
+        self.hashing = HashingService(max_workers=workers)
+        totals = {'rows': 0, 'created': 0, 'updated': 0, 'skipped': 0, 'rejected': 0}
+        start = time.perf_counter()
+        file = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            for number, rows in enumerate(chunked(read_rows(file, format), batch_size), start=1):
+                try:
+                    with transaction.atomic():
+                        created, updated, skipped, rejected = self.import_chunk(rows, batch_size, update)
+                except IntegrityError as e:
+                    raise CommandError(f'Batch {number} was rolled back: {e}') from e
+                totals['rows'] += len(rows)
+                totals['created'] += created
+                totals['updated'] += updated
+                totals['skipped'] += skipped
+                totals['rejected'] += rejected
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Batch {number}: {self.rate(totals["rows"], start)}')
+        finally:
+            if file is not sys.stdin:
+                file.close()
+            self.hashing.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {totals["rows"]} row(s): {totals["created"]} created, {totals["updated"]} updated, '
+            f'{totals["skipped"]} skipped, {totals["rejected"]} rejected ({self.rate(totals["rows"], start)}).'
+        ))
+
+    def import_chunk(self, rows, batch_size, update):
+        """
+        Writes one chunk of rows with a single lookup, one bulk_create and one bulk_update.
+        Rows rejected by clean_row() are reported on stderr and left out.
+
+        Returns:
+            tuple: The number of users created, updated and skipped, and of rows rejected.
+        """
+        # Emails are unique regardless of case, so rows and users are matched on the lowercased email.
+        users = {}
+        rejected = 0
+        for row in rows:
+            try:
+                values = self.clean_row(row)
+            except RejectedRow as e:
+                self.stderr.write(f'Rejected row: {e}')
+                rejected += 1
+                continue
+            users[values['email'].lower()] = values
+        self.hash_passwords(users.values())
+
+        existing = {user.email.lower(): user for user in CustomUser.objects.filter(email__lower__in=list(users))}
+        new_users = [CustomUser(**values) for email, values in users.items() if email not in existing]
+        CustomUser.objects.bulk_create(new_users, batch_size=batch_size)
+        if not update:
+            return len(new_users), 0, len(existing), rejected
+
+        fields = set()
+        for email, user in existing.items():
+            for field, value in users[email].items():
+                if field in UPDATABLE_FIELDS:
+                    setattr(user, field, value)
+                    fields.add(field)
+        if fields.intersection(CustomUser.PUBLIC_FIELDS):
+            for user in existing.values():
+                user.version = F('version') + 1
+            fields.add('version')
+        if existing and fields:
+            CustomUser.objects.bulk_update(existing.values(), sorted(fields), batch_size=batch_size)
+            invalidate_user_snapshots(*(user.pk for user in existing.values()))
+        return len(new_users), len(existing), 0, rejected
+
+    def clean_row(self, row):
+        """
+        Keeps the known, non-empty columns of a row and converts them to model values.
+
+        Raises RejectedRow for a row without an email or with a value longer than its column, e.g. a
+        username defaulted to an email of more than 150 characters, before anything of its batch is written.
+        """
+        values = {field: row[field] for field in USER_FIELDS if row.get(field) not in (None, '')}
+        if 'email' not in values:
+            raise RejectedRow(f'no email: {row}')
+        values['email'] = CustomUser.objects.normalize_email(str(values['email']).strip())
+        values.setdefault('username', values['email'])
+        for field in BOOLEAN_FIELDS:
+            if isinstance(values.get(field), str):
+                values[field] = values[field].strip().lower() in ('1', 'true', 'yes', 'y', 't')
+        for field, value in values.items():
+            # Raw passwords are hashed later; encoded ones fit the column.
+            if field == 'password':
+                continue
+            max_length = CustomUser._meta.get_field(field).max_length
+            if max_length and isinstance(value, str) and len(value) > max_length:
+                raise RejectedRow(f'{field} is longer than {max_length} characters: {values["email"]}')
+        return values
+
+    def hash_passwords(self, users):
+        """
+        Hashes the raw passwords of a chunk in one call to the process pool.
+        Already encoded passwords are kept, and users without a password get an unusable one.
+        """
+        raw = []
+        for values in users:
+            password = values.get('password')
+            if password is None:
+                values['password'] = make_password(None)
+            elif not self.is_encoded(password):
+                raw.append(values)
+        for values, encoded in zip(raw, self.hashing.make_passwords(values['password'] for values in raw)):
+            values['password'] = encoded
+
+    def is_encoded(self, password):
+        """
+        Returns whether a password is already encoded: an unusable password exactly as make_password(None)
+        writes it, or a value one of PASSWORD_HASHERS can decode. Anything else, including raw passwords
+        starting with '!', is hashed.
+        """
+        if UNUSABLE_PASSWORD.fullmatch(password):
+            return True
+        try:
+            identify_hasher(password).decode(password)
+        except (ValueError, TypeError, IndexError):
+            return False
+        return True
+
+    def rate(self, rows, start):
+        elapsed = time.perf_counter() - start
+        return f'{rows} rows in {elapsed:.1f}s, {rows / elapsed if elapsed else 0:.0f} rows/sec'
@@ -0,0 +1,49 @@
+from collections import Counter
+
+from django.contrib.auth.hashers import get_hasher, identify_hasher, is_password_usable
+from django.core.management.base import BaseCommand
+
+from accounts.models import CustomUser
+
+COST_PARAMETERS = ('iterations', 'work_factor', 'time_cost', 'memory_cost', 'parallelism')
+
+
+class Command(BaseCommand):
+    help = 'Reports the distribution of password hashers and cost parameters across the user table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Number of rows fetched per query.')
+
+    def handle(self, *args, chunk_size, **options):
+        preferred = get_hasher()
+        counts = Counter()
+        outdated = Counter()
+        passwords = CustomUser.objects.values_list('password', flat=True).iterator(chunk_size=chunk_size)
+        for encoded in passwords:
+            key, must_update = self.describe(encoded, preferred)
+            counts[key] += 1
+            outdated[key] += must_update
+        total = sum(counts.values())
+        self.stdout.write(f'Preferred hasher: {preferred.algorithm} ({type(preferred).__name__})')
+        self.stdout.write(f'{"algorithm":<24}{"cost":<40}{"users":>10}{"share":>9}  status')
+        for (algorithm, cost), count in counts.most_common():
+            status = 'upgrade on login' if outdated[algorithm, cost] else 'current'
+            if algorithm in ('unusable', 'unknown'):
+                status = '-'
+            self.stdout.write(f'{algorithm:<24}{cost:<40}{count:>10}{count / total:>9.1%}  {status}')
+        self.stdout.write(f'{total} user(s)')
+
+    def describe(self, encoded, preferred):
+        """
+        Returns the (algorithm, cost) key for an encoded password and whether it must be upgraded.
+        """
+        if not encoded or not is_password_usable(encoded):
+            return ('unusable', ''), False
+        try:
+            hasher = identify_hasher(encoded)
+            decoded = hasher.decode(encoded)
+        except (ValueError, ImportError):
+            return ('unknown', ''), False
+        cost = ', '.join(f'{name}={decoded[name]}' for name in COST_PARAMETERS if name in decoded)
+        must_update = hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+        return (hasher.algorithm, cost), must_update
@@ -0,0 +1,37 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes expired sessions from the database in small batches, so the session table is never '
+        'locked for long, unlike clearsessions which deletes every expired row in one statement.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of sessions deleted per query.')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches.')
+
+    def handle(self, *args, batch_size, sleep, **options):
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not hasattr(store, 'get_model_class'):
+            self.stdout.write(f'{settings.SESSION_ENGINE} does not store sessions in the database, nothing to purge.')
+            return
+        model = store.get_model_class()
+        now = timezone.now()
+        removed = 0
+        while True:
+            # Batches are selected through the expire_date index and deleted by primary key.
+            keys = list(model.objects.filter(expire_date__lt=now).values_list('pk', flat=True)[:batch_size])
+            if not keys:
+                break
+            removed += model.objects.filter(pk__in=keys).delete()[0]
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Removed {removed} session(s) so far.')
+            if sleep:
+                time.sleep(sleep)
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} expired session(s).'))
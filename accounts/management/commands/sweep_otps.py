@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.otp import get_otp_backend
+
+
+class Command(BaseCommand):
+    help = 'Removes expired One-Time Passwords from the configured OTP backend in bulk.'
+
+    def handle(self, *args, **options):
+        removed = get_otp_backend().sweep()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} expired OTP(s).'))
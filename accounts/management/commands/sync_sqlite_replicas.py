@@ -0,0 +1,28 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies the SQLite primary database into the SQLite files standing in for read replicas '
+        '(SQLITE_REPLICA_PATHS), with the SQLite online backup API. Running it again simulates replication.'
+    )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        replicas = [alias for alias in settings.DATABASE_REPLICAS if connections[alias].vendor == 'sqlite']
+        if primary.vendor != 'sqlite' or not replicas:
+            raise CommandError('Set SQLITE_REPLICA_PATHS to use SQLite files as replicas.')
+        primary.ensure_connection()
+        for alias in replicas:
+            connections[alias].close()
+            name = connections[alias].settings_dict['NAME']
+            target = sqlite3.connect(name)
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(self.style.SUCCESS(f'Copied the primary into {alias} ({name}).'))
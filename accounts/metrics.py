@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def percentile(sorted_values, q):
+    """
+    Returns the q-th percentile (0-100) of an already sorted list using the nearest-rank method.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class LatencyRecorder:
+    """
+    Keeps a rolling window of latency samples and reports count, mean and percentiles.
+
+    Attributes:
+        size (int): The number of most recent samples used for percentiles.
+        count (int): The total number of samples recorded.
+        total (float): The sum of every recorded sample, in seconds.
+    """
+
+    def __init__(self, size=1024):
+        self.size = size
+        self.count = 0
+        self.total = 0.0
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    @contextmanager
+    def time(self):
+        """
+        Records the time spent in the with-block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(time.perf_counter() - start)
+
+    def snapshot(self):
+        """
+        Returns the recorded latencies as a dict of milliseconds.
+
+        Returns:
+            dict: count, mean_ms, p50_ms, p95_ms, p99_ms and max_ms.
+        """
+        return self._snapshot(1000, '_ms')
+
+    def _snapshot(self, scale, suffix):
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total = self.count, self.total
+        return {
+            'count': count,
+            f'mean{suffix}': total / count * scale if count else 0.0,
+            f'p50{suffix}': percentile(samples, 50) * scale,
+            f'p95{suffix}': percentile(samples, 95) * scale,
+            f'p99{suffix}': percentile(samples, 99) * scale,
+            f'max{suffix}': samples[-1] * scale if samples else 0.0,
+        }
+
+
+class CountRecorder(LatencyRecorder):
+    """
+    Keeps a rolling window of counts (e.g. SQL queries per request) and reports them unscaled.
+    """
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: count, mean, p50, p95, p99 and max.
+        """
+        return self._snapshot(1, '')
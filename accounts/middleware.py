@@ -0,0 +1,163 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+from . import timing
+from .db import replica_state
+from .hashing import HashingPoolSaturated
+
+
+class HashingBackpressureMiddleware:
+    """
+    Turns HashingPoolSaturated into a '503 Service Unavailable' response with a Retry-After header,
+    so clients back off instead of queuing behind a saturated hashing pool.
+    Supports sync and async handlers, so async views are not adapted to sync under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, HashingPoolSaturated):
+            response = HttpResponse('The server is busy, please try again shortly.', status=503)
+            response['Retry-After'] = str(exception.retry_after)
+            return response
+        return None
+
+
+class TimingMiddleware:
+    """
+    Measures a sample of requests: total latency, SQL query count and time, password hashing time
+    and template rendering time. The numbers are added to rolling per-view histograms (see the
+    metrics view) and, when ACCOUNTS_SERVER_TIMING is set, sent in a Server-Timing header.
+
+    ACCOUNTS_TIMING_SAMPLE_RATE is the fraction of requests measured (0 disables it); a request that
+    is not sampled costs one random() call here and one context variable lookup per query.
+    Place it first in MIDDLEWARE so the session and authentication queries are included.
+    Supports sync and async handlers; under ASGI the timings reach the sync code run by
+    sync_to_async() through the copied context.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'ACCOUNTS_TIMING_SAMPLE_RATE', 0.0)
+        self.server_timing = getattr(settings, 'ACCOUNTS_SERVER_TIMING', False)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        timings = timing.RequestTimings()
+        token = timing.current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            timing.current_timings.reset(token)
+        return self.record(request, response, time.perf_counter() - start, timings)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        timings = timing.RequestTimings()
+        token = timing.current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timing.current_timings.reset(token)
+        return self.record(request, response, time.perf_counter() - start, timings)
+
+    def sampled(self):
+        return self.sample_rate > 0 and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def record(self, request, response, total, timings):
+        match = request.resolver_match
+        timing.record(match.view_name if match else 'unresolved', total, timings)
+        if self.server_timing:
+            response.headers['Server-Timing'] = timings.server_timing(total)
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """
+    Keeps a client's reads on the primary database for ACCOUNTS_REPLICA_PIN_SECONDS after a request
+    of theirs wrote to it, so they do not read stale rows from a lagging replica, e.g. their old bio
+    right after profile_edit. The pin is a short-lived cookie, so it costs no session write.
+
+    Requests with unsafe methods (POST, ...) read from the primary too, since they usually read what
+    they are about to change. Does nothing unless DATABASE_REPLICAS is set; see accounts.db.ReplicaRouter.
+    Place it before SessionMiddleware and AuthenticationMiddleware so their queries are routed as well.
+    Supports sync and async handlers; the state is shared with the sync code run by sync_to_async()
+    through the copied context.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cookie_name = getattr(settings, 'ACCOUNTS_REPLICA_PIN_COOKIE', 'primary_pin')
+        self.pin_seconds = getattr(settings, 'ACCOUNTS_REPLICA_PIN_SECONDS', 10)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not getattr(settings, 'DATABASE_REPLICAS', ()):
+            return self.get_response(request)
+        state = self.initial_state(request)
+        token = replica_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_state.reset(token)
+        return self.pin(response, state)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'DATABASE_REPLICAS', ()):
+            return await self.get_response(request)
+        state = self.initial_state(request)
+        token = replica_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_state.reset(token)
+        return self.pin(response, state)
+
+    def initial_state(self, request):
+        return {
+            'pinned': self.cookie_name in request.COOKIES or request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'),
+            'wrote': False,
+        }
+
+    def pin(self, response, state):
+        if state['wrote']:
+            response.set_cookie(self.cookie_name, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_otp_store'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='password',
+            field=models.CharField(max_length=255, verbose_name='password'),
+        ),
+    ]
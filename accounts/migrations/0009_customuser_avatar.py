@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_admin_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='avatar',
+            field=models.ImageField(blank=True, upload_to='avatars/'),
+        ),
+    ]
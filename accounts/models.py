@@ -1,13 +1,23 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, router, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils import timezone
-from .utils import otp_generation
+from .avatars import avatar_urls
+from .hashing import hashing_service
+from .otp import get_otp_backend
 # Create your models here.
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password, **extra_fields):
         """
         Creates and saves a new user with the given email, and password.
+        The password is hashed once, on the hashing service's worker pool, before the insert
+        runs in its own savepoint, so a duplicate email or username raises IntegrityError
+        without breaking an enclosing transaction.
 
         Parameters:
         - email (str): The email of the user.
@@ -23,11 +33,69 @@ class CustomUserManager(BaseUserManager):
         if not email:
             raise ValueError("Please provide an email address")
         else:
-            user = self.model( email=email, password=password, **extra_fields)
-            password = user.set_password(password)
-            user.save(using=self._db)
+            email = self.normalize_email(email)
+            user = self.model(email=email, **extra_fields)
+            user.password = hashing_service.make_password(password)
+            user._password = password
+            self._insert(user)
             return user
         
+    async def acreate_user(self, email, password, **extra_fields):
+        """
+        Async version of create_user() for ASGI views.
+
+        The hashing service is called from a worker thread so the event loop is not blocked.
+        """
+        if not email:
+            raise ValueError("Please provide an email address")
+        user = self.model(email=self.normalize_email(email), **extra_fields)
+        user.password = await sync_to_async(hashing_service.make_password, thread_sensitive=False)(password)
+        user._password = password
+        await sync_to_async(self._insert)(user)
+        return user
+
+    def _insert(self, user):
+        # Manager.db is the database for reads; the insert and its savepoint go to the write database.
+        using = self._db or router.db_for_write(self.model)
+        with transaction.atomic(using=using):
+            user.save(using=using)
+
+    def _conflicts(self, username, email):
+        return self.filter(Q(username__lower=username.lower()) | Q(email__lower=email.lower())).values_list('username', 'email')[:2]
+
+    def _conflicting_field(self, username, rows):
+        if any(taken.lower() == username.lower() for taken, _ in rows):
+            return 'username'
+        return 'email' if rows else None
+
+    def conflicting_field(self, username, email):
+        """
+        Returns which field of a new user collides with an existing one, in a single query.
+
+        Signup relies on the unique constraints instead of checking before the insert; this is
+        only called after an IntegrityError to tell the user what to change.
+
+        Parameters:
+        - username (str): The requested username.
+        - email (str): The requested (normalized) email.
+
+        Returns:
+        - str: 'username' if the username is taken (case-insensitively), 'email' if only the email is, or None.
+        """
+        return self._conflicting_field(username, list(self._conflicts(username, email)))
+
+    async def aconflicting_field(self, username, email):
+        """
+        Async version of conflicting_field().
+        """
+        return self._conflicting_field(username, [row async for row in self._conflicts(username, email)])
+
+    def get_by_natural_key(self, email):
+        """
+        Returns the user with the given email, compared case-insensitively through the LOWER(email) index.
+        """
+        return self.get(email__lower=email.lower())
+
     def create_superuser(self, email, password, **extra_fields):
         """
         Creates and saves a new superuser with the given email and password.
@@ -48,64 +116,246 @@ class CustomUserManager(BaseUserManager):
         return user
 
 
+class DirtyFieldsMixin:
+    """
+    DirtyFieldsMixin makes save() write only the columns that changed since the instance was
+    loaded or last saved, and skip the query entirely when nothing changed.
+
+    The values an instance was loaded with are remembered in from_db(). Calls to save() that
+    pass update_fields, force_insert/force_update or positional arguments, and instances that
+    were never loaded or saved, behave exactly like Model.save().
+
+    Instances built from cached values with from_cache() are rebased on the database row
+    before their first save, so a stale cache entry never ends up written back.
+
+    Methods:
+        from_cache(): Builds an instance from cached column values.
+        get_dirty_fields(): Returns the names of the concrete fields whose value changed.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._original_values = instance._current_values()
+        return instance
+
+    @classmethod
+    def from_cache(cls, db, field_names, values):
+        """
+        Builds an instance like from_db() from values that may be older than the database row.
+        """
+        instance = cls.from_db(db, field_names, values)
+        instance._stale_baseline = True
+        return instance
+
+    def _rebase(self):
+        """
+        Replaces a baseline built by from_cache() with the current database row, in one query.
+
+        Fields changed since the instance was built keep their new value; every other loaded
+        field takes the value of the row, so that saving never writes back a cached value.
+        """
+        if not self.__dict__.pop('_stale_baseline', False) or self._state.adding:
+            return
+        dirty = {self._meta.get_field(name).attname for name in self.get_dirty_fields()}
+        row = (
+            type(self)._base_manager.using(router.db_for_write(type(self), instance=self, read_only=True))
+            .filter(pk=self.pk).values(*self._original_values).first()
+        )
+        if row is None:
+            return
+        for attname, value in row.items():
+            if attname not in dirty:
+                self.__dict__[attname] = value
+        self._original_values = row
+
+    def _current_values(self):
+        """
+        Returns the loaded (non-deferred) concrete field values, keyed by attname.
+        """
+        return {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def get_dirty_fields(self):
+        """
+        Returns the names of the concrete fields whose value differs from the one loaded or last saved.
+
+        Values are compared after the field's to_python() conversion, so assigning '2000-01-31'
+        to a DateField holding date(2000, 1, 31) does not mark it as changed.
+        """
+        original = getattr(self, '_original_values', None)
+        if original is None:
+            return [field.name for field in self._meta.concrete_fields]
+        dirty = []
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__:
+                continue
+            value = self.__dict__[field.attname]
+            if field.attname not in original:
+                dirty.append(field.name)
+                continue
+            try:
+                value = field.to_python(value)
+            except ValidationError:
+                pass
+            if value != original[field.attname]:
+                dirty.append(field.name)
+        return dirty
+
+    def save(self, *args, **kwargs):
+        tracked = (
+            not args
+            and not self._state.adding
+            and hasattr(self, '_original_values')
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+            and not kwargs.get('force_update')
+        )
+        self._rebase()
+        if tracked:
+            dirty = self.get_dirty_fields()
+            if not dirty:
+                return
+            kwargs['update_fields'] = dirty
+        super().save(*args, **kwargs)
+        self._mark_saved(kwargs.get('update_fields'))
 
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        if kwargs.get('fields') is None:
+            self.__dict__.pop('_stale_baseline', None)
+        self._mark_saved(kwargs.get('fields'))
 
-class CustomUser(AbstractUser):
+    def _mark_saved(self, field_names=None):
+        """
+        Records the current values as the database state, for every field or only for `field_names`.
+        """
+        current = self._current_values()
+        if field_names is not None:
+            attnames = {self._meta.get_field(name).attname for name in field_names}
+            current = {attname: value for attname, value in current.items() if attname in attnames}
+        self._original_values = {**getattr(self, '_original_values', {}), **current}
+
+
+class CustomUser(DirtyFieldsMixin, AbstractUser):
     """
     CustomUser class represents a custom user model that extends the AbstractUser class provided by Django.
-    It includes additional fields such as date_of_birth, bio, location, otp_field, and otp_created_at for user information and OTP verification.
-    The class utilizes a CustomUserManager for user creation and includes methods for generating and validating OTPs.
+    It includes additional fields such as date_of_birth, bio and location for user information.
+    The class utilizes a CustomUserManager for user creation and includes methods for generating and validating OTPs,
+    which are kept in the configured OTP backend (see accounts.otp) rather than on the user row.
+    Through DirtyFieldsMixin, save() only writes the columns that changed.
     Attributes:
         email (EmailField): The unique email address of the user.
         date_of_birth (DateField): The date of birth of the user (nullable).
         bio (CharField): A short bio or description of the user (max length 1000).
         location (CharField): The location of the user (max length 255, nullable).
-        otp_field (CharField): The field to store the generated OTP (max length 6, nullable).
-        otp_created_at (DateTimeField): The timestamp when the OTP was generated (nullable).
+        avatar (ImageField): The profile picture, stored under a content-hashed name (see accounts.avatars).
+        version (PositiveIntegerField): Incremented whenever one of PUBLIC_FIELDS changes; the user
+            lookup API derives its ETags from it.
     Methods:
-        save_otp(): Generates a new OTP and saves it along with the creation timestamp.
-        valid_otp(): Validates the OTP by checking if it was created within the last 10 minutes.
+        avatar_urls: The URL of each avatar thumbnail, keyed by size.
+        save_otp(): Generates a new OTP and stores it in the OTP backend.
+        valid_otp(): Validates an OTP against the one stored in the OTP backend.
         __str__(): Returns the username of the CustomUser instance for string representation.
     """
     email = models.EmailField(unique=True)
     date_of_birth = models.DateField(null=True, blank=True)
     bio = models.CharField(max_length=1000)
     location = models.CharField(max_length=255, blank=True, null=True)
-    otp_field = models.CharField(max_length=6, blank=True, null=True)
-    otp_created_at = models.DateTimeField(blank=True, null=True)
-    password = models.CharField(max_length=100)
+    password = models.CharField('password', max_length=255)
+    avatar = models.ImageField(upload_to='avatars/', blank=True)
+    version = models.PositiveIntegerField(default=1, editable=False)
 
+    # The display fields other services read through the user lookup API.
+    PUBLIC_FIELDS = ('username', 'location', 'bio')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
     objects = CustomUserManager()    
 
-    def save_otp(self):
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            models.UniqueConstraint(Lower('email'), name='accounts_customuser_email_ci_unique'),
+            models.UniqueConstraint(Lower('username'), name='accounts_customuser_username_ci_unique'),
+        ]
+        # Back the admin's is_active/is_staff filters while keeping its email ordering.
+        indexes = [
+            models.Index(fields=['is_active', 'email'], name='accounts_cu_active_email_idx'),
+            models.Index(fields=['is_staff', 'email'], name='accounts_cu_staff_email_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
         """
-        Generates a One-Time Password (OTP) and saves it to the user's otp_field.
-        Also sets the otp_created_at field to the current time.
+        Saves the changed columns of the user; accounts.cache.drop_cached_user() then drops its
+        emails and snapshot from the caches. When one of PUBLIC_FIELDS is written, version is
+        incremented in the same UPDATE, as version + 1 computed by the database so that concurrent
+        saves each bump it, and re-read.
+        """
+        self._rebase()
+        bump_version = False
+        if not self._state.adding:
+            written = set(self.get_dirty_fields())
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                written &= set(update_fields)
+            if written.intersection(self.PUBLIC_FIELDS):
+                bump_version = True
+                self.version = F('version') + 1
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'version'}
+        super().save(*args, **kwargs)
+        if bump_version:
+            self.refresh_from_db(using=self._state.db, fields=['version'])
+
+    @property
+    def avatar_urls(self):
+        """
+        Returns {size: URL} of the avatar thumbnails (see accounts.avatars.AVATAR_SIZES), or {} without an avatar.
+        """
+        if not self.avatar:
+            return {}
+        return avatar_urls(self.avatar.name)
+
+    def otp_key(self, purpose):
+        """
+        Returns the key under which this user's OTP for the given purpose is stored.
+        """
+        return f'{purpose}:{self.pk}'
+
+    def save_otp(self, purpose='password_reset'):
+        """
+        Generates a One-Time Password (OTP) and stores it in the OTP backend.
+
+        The OTP expires after ACCOUNTS_OTP_TTL seconds. Issuing it never writes to the user row.
+
+        Parameters:
+        purpose (str): What the OTP is used for; each purpose has its own OTP.
 
-        This method is typically used for generating and storing an OTP for 
-        user verification purposes.
+        Returns:
+        str: The generated OTP.
         """
-        self.otp_field = str(otp_generation())
-        self.otp_created_at = timezone.now()
-        self.save()
+        return get_otp_backend().issue(self.otp_key(purpose))
    
-    def valid_otp(self):
+    def valid_otp(self, otp, purpose='password_reset', consume=True):
         """
-        Validates the One-Time Password (OTP) by checking if it was created within the last 10 minutes.
+        Validates a One-Time Password (OTP) against the one stored for this user.
+
+        A matching OTP is consumed unless consume is False, so it cannot be used twice. Failed
+        attempts are counted by the OTP backend, which discards the OTP after ACCOUNTS_OTP_MAX_ATTEMPTS.
 
-        This method is used to ensure that the OTP is still valid and has not expired.
+        Parameters:
+        otp (str): The OTP submitted by the user.
+        purpose (str): What the OTP is used for.
+        consume (bool): Whether a matching OTP is consumed.
 
         Returns:
-        bool: True if the OTP is valid (i.e., created within the last 10 minutes), False otherwise.
+        bool: True if the OTP matches and has not expired, False otherwise.
         """
-        now = now.timezone()
-        if self.otp_created_at and now(now - self.otp_created_at).total_seconds() < 600:
-            return True
-        return False
+        return get_otp_backend().verify(self.otp_key(purpose), otp, consume=consume)
     
     def __str__(self):
         """
@@ -118,4 +368,58 @@ class CustomUser(AbstractUser):
         Returns:
         str: The username of the CustomUser instance.
         """
-        return self.username
\ No newline at end of file
+        return self.username
+
+
+# Enables `email__lower=...` / `username__lower=...` lookups, which match the LOWER() expression
+# of the case-insensitive unique indexes on CustomUser and can therefore be served by them.
+# The lookup is registered on these two fields only, not on every CharField of the project.
+for field_name in ('email', 'username'):
+    CustomUser._meta.get_field(field_name).register_lookup(Lower)
+
+
+class OneTimePassword(models.Model):
+    """
+    OneTimePassword stores OTPs for the DatabaseOTPBackend, outside of the user table.
+
+    Attributes:
+        key (CharField): The unique key the OTP is stored under, e.g. 'password_reset:42'.
+        code (CharField): The OTP's HMAC-SHA256 digest (see accounts.otp.hash_otp), never the OTP itself.
+        created_at (DateTimeField): The timestamp when the OTP was issued.
+        expires_at (DateTimeField): The timestamp after which the OTP is no longer valid (indexed for sweeping).
+        attempts (PositiveSmallIntegerField): The failed verifications of this OTP.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    code = models.CharField(max_length=128)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    def __str__(self):
+        return self.key
+
+
+class LoginEvent(models.Model):
+    """
+    LoginEvent is an append-only record of a login attempt, written in batches by accounts.events.
+
+    Attributes:
+        user (ForeignKey): The user who logged in; empty for failed attempts, which are recorded
+            without looking the user up. Not a database constraint, so a batch written after the
+            user was deleted still goes through.
+        email (CharField): The email the attempt was made with.
+        succeeded (BooleanField): Whether the login succeeded.
+        ip_address (GenericIPAddressField): The client's address, if known.
+        created_at (DateTimeField): When the attempt was made (indexed for pruning).
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL,
+        db_constraint=False, related_name='login_events',
+    )
+    email = models.CharField(max_length=254, blank=True)
+    succeeded = models.BooleanField()
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f'{self.email} {"succeeded" if self.succeeded else "failed"} at {self.created_at}'
@@ -0,0 +1,292 @@
+import threading
+import time
+from datetime import timedelta
+from functools import lru_cache
+from hmac import compare_digest
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from django.utils.module_loading import import_string
+
+from .utils import otp_generation
+
+
+def hash_otp(key, code):
+    """
+    Returns the HMAC-SHA256 of an OTP, keyed with SECRET_KEY and bound to the key it is stored under.
+
+    Only this digest is stored, so a leaked OTP table or cache does not reveal usable codes, and a
+    digest copied to another key does not match there.
+    """
+    return salted_hmac('accounts.otp', f'{key}:{code}', algorithm='sha256').hexdigest()
+
+
+class BaseOTPBackend:
+    """
+    Base class for One-Time Password stores.
+
+    An OTP is stored under a key (e.g. 'password_reset:42') together with its expiry,
+    so issuing and verifying it is a single keyed operation that never touches the
+    user row. Backends only ever see the code's digest (see hash_otp). Consuming an OTP
+    is atomic, so two concurrent submissions of the same code cannot both succeed.
+    Failed verifications are counted with the OTP, on the server, and the OTP is discarded
+    once max_attempts of them failed, so replaying an older session cannot reset the count.
+    Subclasses implement set(), get(), consume(), fail(), discard() and sweep().
+
+    Attributes:
+        ttl (int): The number of seconds an issued OTP stays valid.
+        max_attempts (int): The failed verifications after which an OTP is discarded (None for no limit).
+    """
+
+    def __init__(self, ttl=600, max_attempts=None):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+
+    def issue(self, key):
+        """
+        Generates a new OTP for the given key, replacing any previous one and its failed attempts.
+
+        Parameters:
+            key (str): The key the OTP is stored under.
+
+        Returns:
+            str: The generated OTP.
+        """
+        code = str(otp_generation())
+        self.set(key, hash_otp(key, code))
+        return code
+
+    def verify(self, key, code, consume=True):
+        """
+        Checks an OTP against the one stored for the given key.
+
+        Parameters:
+            key (str): The key the OTP is stored under.
+            code (str): The OTP submitted by the user.
+            consume (bool): Whether a matching OTP is discarded so it cannot be reused.
+
+        Returns:
+            bool: True if a non-expired OTP is stored for the key and matches code, False otherwise.
+        """
+        if not code:
+            valid = False
+        elif consume:
+            valid = self.consume(key, hash_otp(key, code))
+        else:
+            stored = self.get(key)
+            valid = stored is not None and compare_digest(stored, hash_otp(key, code))
+        if not valid and self.max_attempts is not None:
+            self.fail(key)
+        return valid
+
+    def set(self, key, code):
+        raise NotImplementedError('subclasses of BaseOTPBackend must provide a set() method')
+
+    def get(self, key):
+        raise NotImplementedError('subclasses of BaseOTPBackend must provide a get() method')
+
+    def consume(self, key, code):
+        """
+        Removes the OTP stored for the key if it has not expired and matches `code`, atomically.
+
+        Returns:
+            bool: Whether this call removed it; of several concurrent calls, at most one returns True.
+        """
+        raise NotImplementedError('subclasses of BaseOTPBackend must provide a consume() method')
+
+    def fail(self, key):
+        """
+        Counts a failed verification of the OTP stored for the key, discarding it at max_attempts.
+        """
+        raise NotImplementedError('subclasses of BaseOTPBackend must provide a fail() method')
+
+    def discard(self, key):
+        raise NotImplementedError('subclasses of BaseOTPBackend must provide a discard() method')
+
+    def sweep(self):
+        """
+        Removes every expired OTP in bulk.
+
+        Returns:
+            int: The number of OTPs removed.
+        """
+        raise NotImplementedError('subclasses of BaseOTPBackend must provide a sweep() method')
+
+
+class LocMemOTPBackend(BaseOTPBackend):
+    """
+    Stores OTPs in a process-local dictionary with TTL eviction.
+
+    Suitable for a single process (development, tests); OTPs are not shared between workers.
+    """
+
+    def __init__(self, ttl=600, max_attempts=None):
+        super().__init__(ttl, max_attempts)
+        self._codes = {}
+        self._lock = threading.Lock()
+
+    def set(self, key, code):
+        with self._lock:
+            self._codes[key] = (code, time.monotonic() + self.ttl, 0)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._codes.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._codes[key]
+                return None
+            return entry[0]
+
+    def consume(self, key, code):
+        with self._lock:
+            entry = self._codes.get(key)
+            if entry is None or entry[1] <= time.monotonic() or not compare_digest(entry[0], code):
+                return False
+            del self._codes[key]
+            return True
+
+    def fail(self, key):
+        with self._lock:
+            entry = self._codes.get(key)
+            if entry is None:
+                return
+            code, expires_at, failures = entry
+            if failures + 1 >= self.max_attempts:
+                del self._codes[key]
+            else:
+                self._codes[key] = (code, expires_at, failures + 1)
+
+    def discard(self, key):
+        with self._lock:
+            self._codes.pop(key, None)
+
+    def sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (code, expires_at, failures) in self._codes.items() if expires_at <= now]
+            for key in expired:
+                del self._codes[key]
+        return len(expired)
+
+
+class CacheOTPBackend(BaseOTPBackend):
+    """
+    Stores OTPs in a Django cache, which evicts them on its own once the TTL has passed.
+    The cache alias is read from the ACCOUNTS_OTP_CACHE_ALIAS setting. Failed attempts are
+    counted under a second key with cache.incr().
+    """
+
+    key_prefix = 'accounts:otp:'
+    failures_prefix = 'accounts:otp-failures:'
+
+    def __init__(self, ttl=600, max_attempts=None, alias=None):
+        super().__init__(ttl, max_attempts)
+        self.alias = alias or getattr(settings, 'ACCOUNTS_OTP_CACHE_ALIAS', 'default')
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def set(self, key, code):
+        self.cache.set_many({self.key_prefix + key: code, self.failures_prefix + key: 0}, timeout=self.ttl)
+
+    def get(self, key):
+        return self.cache.get(self.key_prefix + key)
+
+    def consume(self, key, code):
+        stored = self.get(key)
+        if stored is None or not compare_digest(stored, code):
+            return False
+        # delete() reports whether the key was still there, so only one concurrent caller wins.
+        return self.cache.delete(self.key_prefix + key)
+
+    def fail(self, key):
+        try:
+            failures = self.cache.incr(self.failures_prefix + key)
+        except ValueError:
+            # No OTP was issued for the key, or it expired.
+            return
+        if failures >= self.max_attempts:
+            self.discard(key)
+
+    def discard(self, key):
+        self.cache.delete_many([self.key_prefix + key, self.failures_prefix + key])
+
+    def sweep(self):
+        return 0
+
+
+class DatabaseOTPBackend(BaseOTPBackend):
+    """
+    Stores OTPs in the OneTimePassword table, looked up by its unique key and
+    swept through the index on expires_at. Failed attempts are counted on the row.
+    """
+
+    def set(self, key, code):
+        from .models import OneTimePassword
+
+        now = timezone.now()
+        OneTimePassword.objects.bulk_create(
+            [OneTimePassword(key=key, code=code, created_at=now, expires_at=now + timedelta(seconds=self.ttl), attempts=0)],
+            update_conflicts=True,
+            unique_fields=['key'],
+            update_fields=['code', 'created_at', 'expires_at', 'attempts'],
+        )
+
+    def get(self, key):
+        from .models import OneTimePassword
+
+        return (
+            OneTimePassword.objects.filter(key=key, expires_at__gt=timezone.now())
+            .values_list('code', flat=True)
+            .first()
+        )
+
+    def consume(self, key, code):
+        from .models import OneTimePassword
+
+        # A single DELETE matching the digest: of concurrent calls, only one deletes the row.
+        deleted, _ = OneTimePassword.objects.filter(key=key, code=code, expires_at__gt=timezone.now()).delete()
+        return deleted > 0
+
+    def fail(self, key):
+        from .models import OneTimePassword
+
+        OneTimePassword.objects.filter(key=key).update(attempts=F('attempts') + 1)
+        OneTimePassword.objects.filter(key=key, attempts__gte=self.max_attempts).delete()
+
+    def discard(self, key):
+        from .models import OneTimePassword
+
+        OneTimePassword.objects.filter(key=key).delete()
+
+    def sweep(self):
+        from .models import OneTimePassword
+
+        return OneTimePassword.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+
+
+@lru_cache(maxsize=None)
+def get_otp_backend():
+    """
+    Returns the OTP backend configured by the ACCOUNTS_OTP_BACKEND, ACCOUNTS_OTP_TTL and
+    ACCOUNTS_OTP_MAX_ATTEMPTS settings.
+    """
+    backend = getattr(settings, 'ACCOUNTS_OTP_BACKEND', 'accounts.otp.DatabaseOTPBackend')
+    return import_string(backend)(
+        ttl=getattr(settings, 'ACCOUNTS_OTP_TTL', 600),
+        max_attempts=getattr(settings, 'ACCOUNTS_OTP_MAX_ATTEMPTS', 5),
+    )
+
+
+@receiver(setting_changed)
+def reset_otp_backend(setting, **kwargs):
+    if setting.startswith('ACCOUNTS_OTP_'):
+        get_otp_backend.cache_clear()
@@ -0,0 +1,239 @@
+import hashlib
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import lru_cache, wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+
+def _window(now, window):
+    """
+    Returns the index of the fixed window containing `now` and the seconds elapsed in it.
+    """
+    index, elapsed = divmod(now, window)
+    return int(index), elapsed
+
+
+def _estimate(previous, current, elapsed, window):
+    """
+    Sliding-window estimate: the previous window's count weighted by how much of it still
+    overlaps the last `window` seconds, plus the current window's count.
+    """
+    return previous * (window - elapsed) / window + current
+
+
+class BaseRateLimitStore:
+    """
+    Base class for sliding-window counters.
+
+    Each key keeps the number of hits in the current and the previous fixed window, which
+    approximates a true sliding window with two integers per key. Subclasses implement hit().
+    """
+
+    def hit(self, key, limit, window):
+        """
+        Counts a hit for the key unless it already reached its limit.
+
+        Parameters:
+            key (str): The counter key, e.g. 'login:ip:<digest>'.
+            limit (int): The number of hits allowed per window.
+            window (int): The window length in seconds.
+
+        Returns:
+            int: 0 if the hit was allowed and counted, otherwise the number of seconds to wait.
+        """
+        raise NotImplementedError('subclasses of BaseRateLimitStore must provide a hit() method')
+
+
+class LocMemRateLimitStore(BaseRateLimitStore):
+    """
+    Keeps the counters in a bounded, process-local LRU dictionary.
+
+    A hit is a dictionary lookup and a few additions under a short lock, with no I/O, so it is
+    cheap enough to run before any query or password hash. Counters are not shared between workers.
+
+    Attributes:
+        maxsize (int): The maximum number of keys kept; the least recently used are dropped first.
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window):
+        index, elapsed = _window(time.monotonic(), window)
+        with self._lock:
+            previous = current = 0
+            entry = self._counters.get(key)
+            if entry is not None:
+                if entry[0] == index:
+                    previous, current = entry[1], entry[2]
+                elif entry[0] == index - 1:
+                    previous = entry[2]
+            if _estimate(previous, current, elapsed, window) >= limit:
+                return math.ceil(window - elapsed)
+            self._counters[key] = (index, previous, current + 1)
+            self._counters.move_to_end(key)
+            if len(self._counters) > self.maxsize:
+                self._counters.popitem(last=False)
+        return 0
+
+
+class CacheRateLimitStore(BaseRateLimitStore):
+    """
+    Keeps the counters in a Django cache, shared by every worker using the same cache.
+    The cache alias is read from the ACCOUNTS_RATELIMIT_CACHE_ALIAS setting.
+
+    A hit costs one get_many() and one add() or incr(). Concurrent hits can overshoot the limit
+    by the number of racing requests, which is acceptable for abuse protection.
+    """
+
+    key_prefix = 'accounts:ratelimit:'
+
+    def __init__(self, alias=None):
+        self.alias = alias or getattr(settings, 'ACCOUNTS_RATELIMIT_CACHE_ALIAS', 'default')
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def hit(self, key, limit, window):
+        index, elapsed = _window(time.time(), window)
+        previous_key = f'{self.key_prefix}{key}:{index - 1}'
+        current_key = f'{self.key_prefix}{key}:{index}'
+        counts = self.cache.get_many([previous_key, current_key])
+        if _estimate(counts.get(previous_key, 0), counts.get(current_key, 0), elapsed, window) >= limit:
+            return math.ceil(window - elapsed)
+        if not self.cache.add(current_key, 1, timeout=2 * window):
+            try:
+                self.cache.incr(current_key)
+            except ValueError:
+                self.cache.set(current_key, 1, timeout=2 * window)
+        return 0
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR')
+
+
+def posted_email(request):
+    return (request.POST.get('email') or '').strip().lower() or None
+
+
+# Functions returning the value a request is counted under, by the key names used in ACCOUNTS_RATELIMITS.
+KEY_FUNCTIONS = {
+    'ip': client_ip,
+    'email': posted_email,
+}
+
+
+class RateLimiter:
+    """
+    Applies the limits of ACCOUNTS_RATELIMITS to requests and counts the outcomes for monitoring.
+
+    Limits are grouped by scope (e.g. 'login'); each scope limits requests per key (e.g. per client IP
+    and per submitted email). Key values are hashed, so emails are not kept in the store.
+
+    Attributes:
+        store (BaseRateLimitStore): Where the counters are kept.
+        limits (dict): {scope: {key name: (requests, seconds)}}.
+    """
+
+    def __init__(self, store, limits):
+        self.store = store
+        self.limits = limits
+        self._allowed = Counter()
+        self._rejected = Counter()
+        self._lock = threading.Lock()
+
+    def check(self, scope, request):
+        """
+        Counts a request against every limit of its scope.
+
+        Parameters:
+            scope (str): The scope to apply, a key of ACCOUNTS_RATELIMITS.
+            request (HttpRequest): The request being limited.
+
+        Returns:
+            int: 0 if the request is allowed, otherwise the number of seconds the client should wait.
+        """
+        for name, (limit, window) in self.limits.get(scope, {}).items():
+            value = KEY_FUNCTIONS[name](request)
+            if not value:
+                continue
+            digest = hashlib.blake2b(value.encode(), digest_size=16).hexdigest()
+            retry_after = self.store.hit(f'{scope}:{name}:{digest}', limit, window)
+            if retry_after:
+                with self._lock:
+                    self._rejected[f'{scope}:{name}'] += 1
+                return retry_after
+        with self._lock:
+            self._allowed[scope] += 1
+        return 0
+
+    def stats(self):
+        """
+        Returns the number of allowed requests per scope and of rejected requests per scope and key.
+        """
+        with self._lock:
+            return {'allowed': dict(self._allowed), 'rejected': dict(self._rejected)}
+
+
+@lru_cache(maxsize=None)
+def get_rate_limiter():
+    """
+    Returns the rate limiter configured by the ACCOUNTS_RATELIMIT_STORE and ACCOUNTS_RATELIMITS settings.
+    """
+    store = getattr(settings, 'ACCOUNTS_RATELIMIT_STORE', 'accounts.ratelimit.LocMemRateLimitStore')
+    return RateLimiter(import_string(store)(), getattr(settings, 'ACCOUNTS_RATELIMITS', {}))
+
+
+@receiver(setting_changed)
+def reset_rate_limiter(setting, **kwargs):
+    if setting.startswith('ACCOUNTS_RATELIMIT'):
+        get_rate_limiter.cache_clear()
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse('Too many attempts, please try again later.', status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(scope, methods=('POST',)):
+    """
+    Rejects requests over the limits of `scope` with a '429 Too Many Requests' response and a
+    Retry-After header, before the view runs any query or password hash. Works on sync and async views.
+
+    Parameters:
+        scope (str): The scope to apply, a key of ACCOUNTS_RATELIMITS.
+        methods (tuple): The HTTP methods that are limited; other requests pass through.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if request.method in methods:
+                    retry_after = await sync_to_async(get_rate_limiter().check)(scope, request)
+                    if retry_after:
+                        return too_many_requests(retry_after)
+                return await view(request, *args, **kwargs)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if request.method in methods:
+                    retry_after = get_rate_limiter().check(scope, request)
+                    if retry_after:
+                        return too_many_requests(retry_after)
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
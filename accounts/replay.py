@@ -0,0 +1,175 @@
+"""
+Replays recorded request traces against the accounts views, for `manage.py benchmark replay`.
+
+A trace is a JSONL file with one request per line:
+
+    {"method": "POST", "path": "/login/", "data": {"email": "bench@example.com"}}
+    {"method": "GET", "path": "/profile/", "login": true}
+
+`data` is sent as form data (POST) or as the query string (GET). Requests with `"login": true`
+are sent by a client logged in as the benchmark user. Blank lines and lines starting with '#'
+are ignored.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from itertools import cycle, islice
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urljoin, urlsplit
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from django.urls import Resolver404, resolve, reverse
+
+from .metrics import LatencyRecorder
+
+
+def read_trace(path):
+    """
+    Reads a trace file.
+
+    Returns:
+        list: One dict per request, with method, path, data, login and url_name keys.
+    """
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            entry = json.loads(line)
+            if 'path' not in entry:
+                raise ValueError(f'Line {number} of {path} has no path.')
+            entries.append({
+                'method': entry.get('method', 'GET').upper(),
+                'path': entry['path'],
+                'data': entry.get('data') or {},
+                'login': bool(entry.get('login')),
+                'url_name': url_name(entry['path']),
+            })
+    return entries
+
+
+def url_name(path):
+    """
+    Returns the URL name a path resolves to, or the path itself if it does not resolve.
+    """
+    try:
+        return resolve(urlsplit(path).path).url_name or path
+    except Resolver404:
+        return path
+
+
+class ClientDriver:
+    """
+    Sends trace requests in-process through the Django test client.
+    """
+
+    def __init__(self, user):
+        from django.test import Client
+
+        self.anonymous = Client()
+        self.logged_in = Client()
+        self.logged_in.force_login(user)
+
+    def send(self, entry):
+        client = self.logged_in if entry['login'] else self.anonymous
+        method = getattr(client, entry['method'].lower())
+        return method(entry['path'], entry['data']).status_code
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPDriver:
+    """
+    Sends trace requests over HTTP to a running server, e.g. `manage.py runserver` or an ASGI server.
+
+    Redirects are not followed. POSTs carry the CSRF token from the client's csrftoken cookie, which
+    is obtained with a GET of the login page on first use. Requests with `"login": true` use a session
+    logged in through the login form with the given credentials, which must exist on that server.
+    """
+
+    def __init__(self, base_url, email, password):
+        self.base_url = base_url
+        self.email = email
+        self.password = password
+        self.anonymous = self._opener()
+        self.logged_in = None
+
+    def _opener(self):
+        jar = CookieJar()
+        opener = build_opener(HTTPCookieProcessor(jar), _NoRedirect)
+        opener.jar = jar
+        return opener
+
+    def _csrf_token(self, opener):
+        token = next((cookie.value for cookie in opener.jar if cookie.name == 'csrftoken'), None)
+        if token is None:
+            self._open(opener, Request(urljoin(self.base_url, reverse('login'))))
+            token = next((cookie.value for cookie in opener.jar if cookie.name == 'csrftoken'), '')
+        return token
+
+    def _open(self, opener, request):
+        try:
+            with opener.open(request) as response:
+                response.read()
+                return response.status
+        except HTTPError as error:
+            return error.code
+
+    def _request(self, opener, method, path, data):
+        url = urljoin(self.base_url, path)
+        if method == 'GET':
+            if data:
+                url = f'{url}?{urlencode(data)}'
+            return self._open(opener, Request(url))
+        token = self._csrf_token(opener)
+        body = urlencode({**data, 'csrfmiddlewaretoken': token}).encode()
+        return self._open(opener, Request(url, data=body, method=method, headers={'Referer': url, 'X-CSRFToken': token}))
+
+    def send(self, entry):
+        opener = self.anonymous
+        if entry['login']:
+            if self.logged_in is None:
+                self.logged_in = self._opener()
+                self._request(self.logged_in, 'POST', reverse('login_step_2'), {'email': self.email, 'password': self.password})
+            opener = self.logged_in
+        return self._request(opener, entry['method'], entry['path'], entry['data'])
+
+
+def replay(entries, drivers, count):
+    """
+    Sends `count` requests from the trace (repeating it as needed), spread over one thread per driver.
+
+    Returns:
+        tuple: {url name: LatencyRecorder}, {url name: Counter of status codes}, a LatencyRecorder
+        of every request and the elapsed seconds.
+    """
+    schedule = list(islice(cycle(entries), count))
+    names = {entry['url_name'] for entry in entries}
+    recorders = {name: LatencyRecorder(size=count) for name in names}
+    statuses = {name: Counter() for name in names}
+    total = LatencyRecorder(size=count)
+    lock = threading.Lock()
+    concurrency = len(drivers)
+
+    def worker(index):
+        driver = drivers[index]
+        for entry in schedule[index::concurrency]:
+            start = time.perf_counter()
+            status = driver.send(entry)
+            seconds = time.perf_counter() - start
+            recorders[entry['url_name']].record(seconds)
+            total.record(seconds)
+            with lock:
+                statuses[entry['url_name']][status] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    return recorders, statuses, total, time.perf_counter() - start
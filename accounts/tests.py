@@ -1,3 +1,1375 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages import get_messages
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.mail import EmailMessage
+from django.db import DatabaseError, connection, connections
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.template.loader import render_to_string
+from django.urls import resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import timing
+from .admin import CustomUserAdmin
+from .avatars import AVATAR_SIZES, get_thumbnail_executor, store_avatar, thumbnail_name
+from .backends import EmailBackend
+from .benchmarks import bench_urlconf
+from .cache import (
+    USER_SNAPSHOT_FIELDS, EmailExistenceCache, email_cache, email_exists, get_user_snapshot, invalidate_user_snapshots,
+    set_user_snapshot, user_snapshot_cache,
+)
+from .db import ReplicaRouter, _applied_sqlite_pragmas
+from .decorators import cache_anonymous_page
+from .events import login_events
+from .hashing import HashingPoolSaturated, hashing_service
+from .mail import EmailDispatcher
+from .middleware import HashingBackpressureMiddleware, ReplicaPinningMiddleware, TimingMiddleware
+from .models import CustomUser, LoginEvent, OneTimePassword
+from .otp import CacheOTPBackend, DatabaseOTPBackend, LocMemOTPBackend, hash_otp
+from .pagination import LargeTablePaginator
+from .ratelimit import CacheRateLimitStore, LocMemRateLimitStore, get_rate_limiter
+from .validators import DEFAULT_PASSWORD_LIST_PATH, PasswordPolicy, _load_common_passwords
+from .views import alogin_step_1
+
+
+def setUpModule():
+    # A due login event buffer is written at the end of any request; keep the logins of earlier tests
+    # out of the queries counted by later ones. LoginEventTests flushes the buffer explicitly.
+    patcher = mock.patch.object(login_events, 'flush_interval', float('inf'))
+    patcher.start()
+    unittest.addModuleCleanup(patcher.stop)
+
+
+def user_updates(queries):
+    """
+    Returns the UPDATE statements issued against the users table.
+    """
+    return [query['sql'] for query in queries if query['sql'].startswith('UPDATE "accounts_customuser"')]
+
+
+class PartialUpdateTests(TestCase):
+    """
+    CustomUser.save() only writes the columns that changed, and nothing if none did.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(
+            email='ada@example.com', username='ada', password=make_password('Secret-pass1'), bio='Mathematician',
+        )
+        self.client.force_login(self.user)
+
+    def test_profile_edit_updates_only_changed_columns(self):
+        data = {'bio': 'Analyst', 'location': 'London', 'date_of_birth': '1815-12-10'}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('profile_edit'), data)
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+        updates = user_updates(queries)
+        self.assertEqual(len(updates), 1)
+        set_clause = updates[0].split(' SET ')[1].split(' WHERE ')[0]
+        self.assertEqual(
+            sorted(column.split(' = ')[0] for column in set_clause.split(', ')),
+            ['"bio"', '"date_of_birth"', '"location"', '"version"'],
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('profile_edit'), data)
+        self.assertEqual(user_updates(queries), [])
+
+    def test_save_without_changes_issues_no_query(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            user.save()
+        user.first_name = 'Ada'
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"password"', queries[0]['sql'])
+
+    def test_concurrent_saves_each_bump_the_version(self):
+        first, second = CustomUser.objects.get(pk=self.user.pk), CustomUser.objects.get(pk=self.user.pk)
+        first.bio = 'Analyst'
+        first.save()
+        second.location = 'London'
+        with CaptureQueriesContext(connection) as queries:
+            second.save()
+        self.assertEqual(len(queries), 2)
+        self.assertEqual((first.version, second.version), (2, 3))
+        self.assertEqual(second.get_dirty_fields(), [])
+
+    def test_partial_save_keeps_other_changes_dirty(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.bio = 'Analyst'
+        user.save(update_fields=['last_login'])
+        self.assertEqual(user.get_dirty_fields(), ['bio'])
+
+    def test_save_otp_does_not_touch_user_row(self):
+        with CaptureQueriesContext(connection) as queries:
+            otp = self.user.save_otp()
+            self.assertTrue(self.user.valid_otp(otp))
+        self.assertFalse([query for query in queries if 'accounts_customuser' in query['sql']])
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Query plans are checked with SQLite\'s EXPLAIN QUERY PLAN.')
+class QueryPlanTests(TestCase):
+    """
+    Every query the accounts views run against the accounts tables is served by an index.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='ada@example.com', username='ada', password='Secret-pass1!')
+
+    def assertNoFullScans(self, queries):
+        for query in queries:
+            sql = query['sql']
+            if '"accounts_' not in sql or not sql.startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+            scans = [step for step in plan if step.startswith('SCAN') and 'accounts_' in step]
+            self.assertFalse(scans, f'Full table scan in {sql!r}: {plan}')
+
+    def request(self, method, url_name, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            getattr(self.client, method)(reverse(url_name), data)
+        self.assertNoFullScans(queries)
+
+    def test_login_views(self):
+        self.request('post', 'login', {'email': 'ADA@example.com'})
+        self.request('post', 'login', {'email': 'nobody@example.com'})
+        self.request('post', 'login_step_2', {'email': 'Ada@Example.com', 'password': 'Secret-pass1!'})
+
+    def test_signup(self):
+        self.request('post', 'signup', {
+            'username': 'ADA', 'email': 'other@example.com',
+            'password': 'Other-pass1!', 'confirm_password': 'Other-pass1!',
+        })
+        self.request('post', 'signup', {
+            'username': 'grace', 'email': 'grace@example.com',
+            'password': 'Grace-pass1!', 'confirm_password': 'Grace-pass1!',
+        })
+
+    def test_profile_views(self):
+        self.client.force_login(self.user)
+        self.request('get', 'profile')
+        self.request('post', 'profile_edit', {'bio': 'Analyst', 'location': 'London', 'date_of_birth': ''})
+        self.request('post', 'change_password', {
+            'old_password': 'Secret-pass1!', 'new_password1': 'Newer-pass1!', 'new_password2': 'Newer-pass1!',
+        })
+
+    def test_user_lookup(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.request('get', 'user_lookup', {'ids': f'{self.user.pk},999'})
+        self.request('get', 'user_lookup', {'emails': 'ADA@example.com,nobody@example.com'})
+
+    @override_settings(ACCOUNTS_RATELIMITS={})
+    def test_password_reset_views(self):
+        with mock.patch('accounts.otp.otp_generation', return_value=123456):
+            self.request('post', 'password_reset_otp', {'email': 'ADA@example.com'})
+        self.request('post', 'password_reset_otp', {'otp': '123456'})
+        self.request('post', 'password_reset_complete', {'new_password1': 'Newer-pass1!', 'new_password2': 'Newer-pass1!'})
+
+
+def signup_data(username, email, password='Secret-pass1!'):
+    return {'username': username, 'email': email, 'password': password, 'confirm_password': password}
+
+
+class SignupTests(TestCase):
+    """
+    Signup inserts without checking first and reports the field that collided.
+    """
+
+    def setUp(self):
+        CustomUser.objects.create_user(email='ada@example.com', username='ada', password='Secret-pass1!')
+
+    def signup(self, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('signup'), data)
+        user_queries = [query['sql'] for query in queries if '"accounts_customuser"' in query['sql']]
+        return response, [str(message) for message in get_messages(response.wsgi_request)], user_queries
+
+    def test_new_user_is_a_single_insert(self):
+        response, messages, queries = self.signup(signup_data('grace', 'grace@example.com'))
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.assertEqual([sql.split()[0] for sql in queries if not sql.startswith('UPDATE')], ['INSERT'])
+
+    def test_duplicate_username(self):
+        response, messages, queries = self.signup(signup_data('ADA', 'grace@example.com'))
+        self.assertRedirects(response, reverse('signup'), fetch_redirect_response=False)
+        self.assertEqual(messages, ['Username already exists'])
+        self.assertEqual([sql.split()[0] for sql in queries], ['INSERT', 'SELECT'])
+
+    def test_duplicate_email(self):
+        response, messages, queries = self.signup(signup_data('grace', 'Ada@example.com'))
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        self.assertEqual(messages, ['Email already exists, Please login'])
+        self.assertEqual(CustomUser.objects.count(), 1)
+
+
+class ConcurrentSignupTests(TransactionTestCase):
+    """
+    Concurrent signups for the same email create exactly one user; the others are told to log in.
+    """
+    # Outside of a test transaction, reads are routed to the replicas (mirrors of 'default') when configured.
+    databases = '__all__'
+
+    def test_concurrent_signups_with_the_same_email(self):
+        threads_count = 4
+        barrier = threading.Barrier(threads_count)
+        results = []
+
+        def signup(number):
+            try:
+                client = Client()
+                barrier.wait()
+                response = client.post(reverse('signup'), signup_data(f'user{number}', 'race@example.com'))
+                results.append(response.url)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=signup, args=(number,)) for number in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(CustomUser.objects.filter(email='race@example.com').count(), 1)
+        self.assertEqual(sorted(results), [reverse('home')] + [reverse('login')] * (threads_count - 1))
+
+
+@override_settings(ACCOUNTS_RATELIMITS={})
+class PasswordResetTests(TestCase):
+    """
+    The OTP password reset stores only a digest of the OTP and does not reveal which emails exist.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='ada@example.com', username='ada', password='Secret-pass1!')
+
+    def start(self, email='Ada@example.com'):
+        with mock.patch('accounts.otp.otp_generation', return_value=123456):
+            return self.client.post(reverse('password_reset_otp'), {'email': email})
+
+    def test_reset_flow(self):
+        self.start()
+        self.assertNotIn('123456', OneTimePassword.objects.get().code)
+        response = self.client.post(reverse('password_reset_otp'), {'otp': '123456'})
+        self.assertRedirects(response, reverse('password_reset_complete'), fetch_redirect_response=False)
+        response = self.client.post(reverse('password_reset_complete'), {
+            'new_password1': 'Newer-pass1!', 'new_password2': 'Newer-pass1!',
+        })
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('Newer-pass1!'))
+        self.assertFalse(OneTimePassword.objects.exists())
+
+    def test_unknown_email_gets_the_same_response(self):
+        known = self.start()
+        unknown = Client().post(reverse('password_reset_otp'), {'email': 'nobody@example.com'})
+        self.assertEqual((unknown.status_code, unknown.url), (known.status_code, known.url))
+
+    def test_complete_requires_a_verified_otp(self):
+        self.start()
+        self.client.post(reverse('password_reset_otp'), {'otp': '654321'})
+        response = self.client.post(reverse('password_reset_complete'), {
+            'new_password1': 'Newer-pass1!', 'new_password2': 'Newer-pass1!',
+        })
+        self.assertRedirects(response, reverse('password_reset'), fetch_redirect_response=False)
+
+    def test_too_many_wrong_otps_end_the_reset(self):
+        self.start()
+        with self.settings(ACCOUNTS_OTP_MAX_ATTEMPTS=2):
+            self.client.post(reverse('password_reset_otp'), {'otp': '000000'})
+            response = self.client.post(reverse('password_reset_otp'), {'otp': '000000'})
+            self.assertRedirects(response, reverse('password_reset'), fetch_redirect_response=False)
+        response = self.client.post(reverse('password_reset_otp'), {'otp': '123456'})
+        self.assertRedirects(response, reverse('password_reset'), fetch_redirect_response=False)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies', ACCOUNTS_OTP_MAX_ATTEMPTS=3)
+    def test_replaying_the_session_cookie_does_not_reset_the_attempts(self):
+        self.start()
+        self.client.post(reverse('password_reset_otp'), {'otp': '000000'})
+        cookie = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        for _ in range(2):
+            self.client.cookies[settings.SESSION_COOKIE_NAME] = cookie
+            self.client.post(reverse('password_reset_otp'), {'otp': '000000'})
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = cookie
+        response = self.client.post(reverse('password_reset_otp'), {'otp': '123456'})
+        self.assertRedirects(response, reverse('password_reset_otp'), fetch_redirect_response=False)
+        self.assertFalse(OneTimePassword.objects.filter(key=self.user.otp_key('password_reset')).exists())
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_replaying_the_session_cookie_does_not_repeat_the_reset(self):
+        self.start()
+        self.client.post(reverse('password_reset_otp'), {'otp': '123456'})
+        cookie = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        passwords = {'new_password1': 'Newer-pass1!', 'new_password2': 'Newer-pass1!'}
+        self.client.post(reverse('password_reset_complete'), passwords)
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = cookie
+        response = self.client.post(reverse('password_reset_complete'), {
+            'new_password1': 'Newest-pass1!', 'new_password2': 'Newest-pass1!',
+        })
+        self.assertRedirects(response, reverse('password_reset'), fetch_redirect_response=False)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('Newer-pass1!'))
+
+    def test_resend_cooldown_needs_no_query(self):
+        self.start()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('resend_otp'))
+        self.assertFalse([query for query in queries if '"accounts_' in query['sql']])
+        self.assertRedirects(response, reverse('password_reset_otp'), fetch_redirect_response=False)
+        messages = [str(message) for message in get_messages(response.wsgi_request)]
+        self.assertEqual(messages[-1], 'Please wait before requesting another OTP.')
+        self.assertFalse(self.client.get(reverse('password_reset_otp')).context['can_resend'])
+
+
+class OTPBackendTests(TestCase):
+    """
+    Every OTP backend issues, verifies, expires, consumes once and sweeps OTPs.
+    """
+
+    backends = {
+        'locmem': LocMemOTPBackend,
+        'cache': CacheOTPBackend,
+        'database': DatabaseOTPBackend,
+    }
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_issue_verify_and_consume(self):
+        for name, backend_class in self.backends.items():
+            with self.subTest(backend=name):
+                backend = backend_class()
+                with mock.patch('accounts.otp.otp_generation', return_value=123456):
+                    code = backend.issue('password_reset:1')
+                self.assertEqual(backend.get('password_reset:1'), hash_otp('password_reset:1', '123456'))
+                self.assertFalse(backend.verify('password_reset:1', ''))
+                self.assertFalse(backend.verify('password_reset:1', '654321'))
+                self.assertFalse(backend.verify('password_reset:2', code))
+                self.assertTrue(backend.verify('password_reset:1', code, consume=False))
+                self.assertTrue(backend.verify('password_reset:1', code))
+                self.assertFalse(backend.verify('password_reset:1', code))
+
+    def test_a_new_otp_replaces_the_previous_one(self):
+        for name, backend_class in self.backends.items():
+            with self.subTest(backend=name):
+                backend = backend_class()
+                with mock.patch('accounts.otp.otp_generation', side_effect=[111111, 222222]):
+                    backend.issue('password_reset:1')
+                    backend.issue('password_reset:1')
+                self.assertFalse(backend.verify('password_reset:1', '111111'))
+                self.assertTrue(backend.verify('password_reset:1', '222222'))
+
+    def test_expired_otps_do_not_verify_and_are_swept(self):
+        for name, backend_class in self.backends.items():
+            with self.subTest(backend=name):
+                backend = backend_class(ttl=-1)
+                expired_code = backend.issue('password_reset:1')
+                backend.issue('password_reset:3')
+                backend.ttl = 600
+                valid_code = backend.issue('password_reset:2')
+                self.assertFalse(backend.verify('password_reset:1', expired_code))
+                # The cache evicts expired OTPs on its own.
+                self.assertEqual(backend.sweep(), {'locmem': 2, 'cache': 0, 'database': 2}[name])
+                self.assertTrue(backend.verify('password_reset:2', valid_code))
+
+    def test_failed_attempts_discard_the_otp(self):
+        for name, backend_class in self.backends.items():
+            with self.subTest(backend=name):
+                backend = backend_class(max_attempts=2)
+                code = backend.issue('password_reset:1')
+                self.assertFalse(backend.verify('password_reset:1', '000000', consume=False))
+                self.assertTrue(backend.verify('password_reset:1', code, consume=False))
+                self.assertFalse(backend.verify('password_reset:1', ''))
+                self.assertFalse(backend.verify('password_reset:1', code))
+                # A new OTP starts with no failed attempts.
+                code = backend.issue('password_reset:1')
+                self.assertFalse(backend.verify('password_reset:1', '000000'))
+                self.assertTrue(backend.verify('password_reset:1', code))
+
+    def test_concurrent_submissions_consume_once(self):
+        for name in ('locmem', 'cache'):
+            with self.subTest(backend=name):
+                backend = self.backends[name]()
+                code = backend.issue('password_reset:1')
+                barrier = threading.Barrier(8)
+                results = []
+
+                def submit():
+                    barrier.wait()
+                    results.append(backend.verify('password_reset:1', code))
+
+                threads = [threading.Thread(target=submit) for _ in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                self.assertEqual(results.count(True), 1)
+
+    def test_database_consume_is_a_single_delete(self):
+        backend = DatabaseOTPBackend()
+        code = backend.issue('password_reset:1')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(backend.verify('password_reset:1', code))
+        self.assertEqual([query['sql'].split()[0] for query in queries], ['DELETE'])
+
+    @override_settings(ACCOUNTS_OTP_BACKEND='accounts.otp.DatabaseOTPBackend')
+    def test_sweep_otps_command(self):
+        DatabaseOTPBackend(ttl=-1).issue('password_reset:1')
+        DatabaseOTPBackend().issue('password_reset:2')
+        stdout = StringIO()
+        call_command('sweep_otps', stdout=stdout)
+        self.assertIn('Removed 1 expired OTP(s).', stdout.getvalue())
+        self.assertEqual(list(OneTimePassword.objects.values_list('key', flat=True)), ['password_reset:2'])
+
+
+@override_settings(ACCOUNTS_API_TOKENS=['secret-token'])
+class UserLookupTests(TestCase):
+    """
+    The user lookup API resolves a batch in one query and answers repeated polls with 304.
+    """
+
+    def setUp(self):
+        self.ada = CustomUser.objects.create_user(email='Ada@example.com', username='ada', password='Secret-pass1!', bio='Mathematician')
+        self.grace = CustomUser.objects.create_user(email='grace@example.com', username='grace', password='Secret-pass1!')
+
+    def lookup(self, etag=None, **params):
+        headers = {'Authorization': 'Bearer secret-token'}
+        if etag:
+            headers['If-None-Match'] = etag
+        return self.client.get(reverse('user_lookup'), params, headers=headers)
+
+    def test_lookup_by_ids_and_emails(self):
+        with self.assertNumQueries(1):
+            response = self.lookup(ids=f'{self.ada.pk},{self.grace.pk},999')
+            users = json.loads(b''.join(response.streaming_content))['users']
+        self.assertEqual(sorted(users), sorted([str(self.ada.pk), str(self.grace.pk)]))
+        self.assertEqual(users[str(self.ada.pk)], {'id': self.ada.pk, 'username': 'ada', 'location': None, 'bio': 'Mathematician'})
+        response = self.lookup(emails='ADA@example.com')
+        self.assertEqual(list(json.loads(b''.join(response.streaming_content))['users']), ['ada@example.com'])
+
+    def test_etag_changes_with_the_version(self):
+        etag = self.lookup(ids=str(self.ada.pk))['ETag']
+        self.assertEqual(self.lookup(etag, ids=str(self.ada.pk)).status_code, 304)
+        self.ada.last_login = self.ada.date_joined
+        self.ada.save()
+        self.assertEqual(self.lookup(etag, ids=str(self.ada.pk)).status_code, 304)
+        self.ada.location = 'London'
+        self.ada.save()
+        self.assertEqual(self.lookup(etag, ids=str(self.ada.pk)).status_code, 200)
+
+    def test_authentication(self):
+        response = self.client.get(reverse('user_lookup'), {'ids': '1'}, headers={'Authorization': 'Bearer wrong'})
+        self.assertEqual(response.status_code, 401)
+        self.client.force_login(self.grace)
+        self.assertEqual(self.client.get(reverse('user_lookup'), {'ids': '1'}).status_code, 403)
+
+    def test_invalid_batches(self):
+        self.assertEqual(self.lookup(ids='1,a').status_code, 400)
+        self.assertEqual(self.lookup(ids='1', emails='ada@example.com').status_code, 400)
+        with self.settings(ACCOUNTS_USER_API_MAX_BATCH=2):
+            self.assertEqual(self.lookup(ids='1,2,3').status_code, 400)
+
+
+class EmailExistenceCacheTests(TestCase):
+    """
+    email_exists answers repeated lookups of existing emails from a bounded LRU, never caches
+    misses, and drops the entries of users whose email changes or who are deleted.
+    """
+
+    def setUp(self):
+        email_cache.clear()
+        self.addCleanup(email_cache.clear)
+        self.user = CustomUser.objects.create_user(email='Ada@example.com', username='ada', password='Secret-pass1!')
+
+    def test_repeated_lookups_need_no_query(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(email_exists('ada@example.com'))
+        with self.assertNumQueries(0):
+            self.assertTrue(email_exists('ADA@example.com'))
+
+    def test_misses_are_not_cached(self):
+        self.assertFalse(email_exists('grace@example.com'))
+        CustomUser.objects.create_user(email='grace@example.com', username='grace', password='Secret-pass1!')
+        self.assertTrue(email_exists('grace@example.com'))
+
+    def test_changing_the_email_drops_the_old_entry(self):
+        self.assertTrue(email_exists('ada@example.com'))
+        self.user.email = 'lovelace@example.com'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertNotIn('ada@example.com', email_cache)
+        self.assertFalse(email_exists('ada@example.com'))
+        self.assertTrue(email_exists('lovelace@example.com'))
+
+    def test_deleting_the_user_drops_the_entry(self):
+        self.assertTrue(email_exists('ada@example.com'))
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.filter(pk=self.user.pk).delete()
+        self.assertNotIn('ada@example.com', email_cache)
+        self.assertFalse(email_exists('ada@example.com'))
+
+    def test_size_and_ttl_are_enforced(self):
+        cache = EmailExistenceCache(maxsize=2, ttl=300)
+        with mock.patch('accounts.cache.time.monotonic', return_value=1000):
+            cache.add('a@example.com')
+            cache.add('b@example.com')
+            self.assertIn('a@example.com', cache)
+            cache.add('c@example.com')
+            self.assertEqual(len(cache), 2)
+            # b was the least recently used entry.
+            self.assertNotIn('b@example.com', cache)
+            self.assertIn('a@example.com', cache)
+        with mock.patch('accounts.cache.time.monotonic', return_value=1301):
+            self.assertNotIn('a@example.com', cache)
+            self.assertNotIn('c@example.com', cache)
+        self.assertEqual(len(cache), 0)
+
+
+class UserSnapshotTests(TestCase):
+    """
+    User snapshots live in the shared cache only, are dropped by every write, and are never
+    used as the baseline of a save.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='ada@example.com', username='ada', password='Secret-pass1!', bio='Mathematician')
+        self.backend = EmailBackend()
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir.name}
+        self.enterContext(self.settings(CACHES={**settings.CACHES, 'shared': shared}, ACCOUNTS_USER_CACHE_ALIAS='shared'))
+
+    def test_disabled_without_a_shared_cache(self):
+        for alias in (None, 'default'):
+            with self.subTest(alias=alias), self.settings(ACCOUNTS_USER_CACHE_ALIAS=alias):
+                self.assertIsNone(user_snapshot_cache())
+                self.backend.get_user(self.user.pk)
+                with self.assertNumQueries(1):
+                    self.backend.get_user(self.user.pk)
+
+    def test_save_and_update_invalidate(self):
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk).bio, 'Mathematician')
+        self.user.bio = 'Analyst'
+        self.user.save()
+        self.assertEqual(self.backend.get_user(self.user.pk).bio, 'Analyst')
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        invalidate_user_snapshots(self.user.pk)
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_stale_read_cannot_refill_after_a_password_change(self):
+        self.backend.get_user(self.user.pk)
+        # Read by another request just before the password change below commits.
+        stale = CustomUser.objects.only(*USER_SNAPSHOT_FIELDS).get(pk=self.user.pk)
+        self.user.set_password('Other-pass1!')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        set_user_snapshot(stale)
+        self.assertEqual(self.backend.get_user(self.user.pk).password, self.user.password)
+
+    def test_queryset_delete_invalidates(self):
+        self.backend.get_user(self.user.pk)
+        stale = CustomUser.objects.only(*USER_SNAPSHOT_FIELDS).get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.filter(pk=self.user.pk).delete()
+        set_user_snapshot(stale)
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    @mock.patch.object(ReplicaRouter, 'db_for_read', return_value='replica')
+    def test_snapshots_are_read_from_the_primary(self, db_for_read):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+        self.assertEqual(len(queries), 1)
+        self.assertIsNotNone(get_user_snapshot(self.user.pk))
+
+    def test_save_rebases_on_the_row(self):
+        self.backend.get_user(self.user.pk)
+        # A write the snapshot has not seen yet.
+        CustomUser.objects.filter(pk=self.user.pk).update(bio='Analyst')
+        user = self.backend.get_user(self.user.pk)
+        self.assertEqual(user.bio, 'Mathematician')
+        user.location = 'London'
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertEqual(len(user_updates(queries)), 1)
+        self.assertEqual(user.bio, 'Analyst')
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.bio, self.user.location), ('Analyst', 'London'))
+
+
+@override_settings(ACCOUNTS_RATELIMITS={})
+class LoginEventTests(TestCase):
+    """
+    Logins are buffered as events and last_login is written once per user per flush.
+    """
+
+    def setUp(self):
+        # Write out the logins of earlier tests, whose user ids may be reused by this one.
+        login_events.flush()
+        LoginEvent.objects.all().delete()
+        self.user = CustomUser.objects.create_user(email='ada@example.com', username='ada', password='Secret-pass1!')
+        patcher = mock.patch.multiple(login_events, batch_size=1000, flush_interval=3600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(login_events.flush)
+
+    def login(self, password='Secret-pass1!'):
+        return Client().post(reverse('login_step_2'), {'email': 'ada@example.com', 'password': password})
+
+    def test_logins_do_not_update_the_user_row(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.login()
+        self.assertEqual(user_updates(queries), [])
+        self.assertFalse(LoginEvent.objects.exists())
+
+    def test_flush_coalesces_last_login(self):
+        for _ in range(3):
+            self.login()
+        self.login(password='wrong')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(login_events.flush(), 4)
+        self.assertEqual(len(user_updates(queries)), 1)
+        self.assertEqual(LoginEvent.objects.filter(user=self.user, succeeded=True).count(), 3)
+        failed = LoginEvent.objects.get(succeeded=False)
+        self.assertEqual((failed.email, failed.user_id), ('ada@example.com', None))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login, LoginEvent.objects.filter(succeeded=True).latest('created_at').created_at)
+
+    def test_due_buffer_is_flushed_at_the_end_of_any_request(self):
+        self.login()
+        self.client.get(reverse('login'))
+        self.assertFalse(LoginEvent.objects.exists())
+        with mock.patch.object(login_events, 'flush_interval', 0):
+            self.client.get(reverse('login'))
+        self.assertEqual(LoginEvent.objects.count(), 1)
+
+    def test_failed_write_is_retried(self):
+        self.login()
+        self.login(password='wrong')
+        with mock.patch.object(LoginEvent.objects, 'bulk_create', side_effect=DatabaseError), self.assertLogs('accounts.events'):
+            self.assertEqual(login_events.flush(), 0)
+        self.assertEqual(login_events.stats()['buffered'], 2)
+        self.login()
+        self.assertEqual(login_events.flush(), 3)
+        self.assertEqual(LoginEvent.objects.count(), 3)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_failed_write_keeps_at_most_max_buffer_events(self):
+        for _ in range(3):
+            self.login()
+        dropped = login_events.stats()['dropped']
+        with mock.patch.object(login_events, 'max_buffer', 2), self.assertLogs('accounts.events'):
+            with mock.patch.object(LoginEvent.objects, 'bulk_create', side_effect=DatabaseError):
+                login_events.flush()
+        self.assertEqual(login_events.stats()['buffered'], 2)
+        self.assertEqual(login_events.stats()['dropped'], dropped + 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+    """
+    Reads go to a replica unless the client wrote recently; writes always go to the primary.
+    """
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def run_request(self, method='get', cookies=None, write=False):
+        routed = {}
+
+        def view(request):
+            routed['read'] = self.router.db_for_read(CustomUser)
+            if write:
+                routed['write'] = self.router.db_for_write(CustomUser)
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        return ReplicaPinningMiddleware(view)(request), routed
+
+    def test_reads_go_to_a_replica(self):
+        response, routed = self.run_request()
+        self.assertEqual(routed, {'read': 'replica'})
+        self.assertNotIn('primary_pin', response.cookies)
+        self.assertEqual(self.router.db_for_read(Session), 'default')
+
+    def test_a_write_pins_the_client_to_the_primary(self):
+        response, routed = self.run_request('post', write=True)
+        self.assertEqual(routed, {'read': 'default', 'write': 'default'})
+        self.assertEqual(response.cookies['primary_pin']['max-age'], 10)
+        response, routed = self.run_request(cookies={'primary_pin': '1'})
+        self.assertEqual(routed, {'read': 'default'})
+
+    async def test_async_handlers(self):
+        routed = {}
+
+        def write():
+            routed['read'] = self.router.db_for_read(CustomUser)
+            routed['write'] = self.router.db_for_write(CustomUser)
+
+        async def view(request):
+            await sync_to_async(write)()
+            return HttpResponse()
+
+        middleware = ReplicaPinningMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get('/'))
+        self.assertEqual(routed, {'read': 'replica', 'write': 'default'})
+        self.assertIn('primary_pin', response.cookies)
+
+    def test_reads_from_the_primary_do_not_pin(self):
+        def view(request):
+            self.router.db_for_write(CustomUser, read_only=True)
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(view)(RequestFactory().get('/'))
+        self.assertNotIn('primary_pin', response.cookies)
+
+    def test_migrations_only_run_on_the_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'accounts'))
+        self.assertFalse(self.router.allow_migrate('replica', 'accounts'))
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'configure_sqlite only configures SQLite connections.')
+class ConfigureSQLiteTests(SimpleTestCase):
+    """
+    configure_sqlite sets the connection pragmas on every connection and journal_mode only once per file.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+        self.addCleanup(_applied_sqlite_pragmas.pop, (self.path, 'journal_mode'), None)
+
+    def connect(self):
+        default = connections['default']
+        wrapper = type(default)({**default.settings_dict, 'NAME': self.path}, alias='sqlite_file')
+        wrapper.force_debug_cursor = True
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper, [query['sql'] for query in wrapper.queries]
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        wrapper, queries = self.connect()
+        self.assertIn('PRAGMA journal_mode = wal', queries)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        # The busy timeout comes from the driver's timeout option alone.
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), settings.DATABASES['default']['OPTIONS']['timeout'] * 1000)
+        self.assertNotIn('busy_timeout', settings.SQLITE_PRAGMAS)
+
+    def test_journal_mode_is_set_once_per_file(self):
+        self.connect()
+        wrapper, queries = self.connect()
+        self.assertIn('PRAGMA synchronous = normal', queries)
+        self.assertFalse([query for query in queries if 'journal_mode' in query])
+        # Another process only reads it, as the file already uses WAL.
+        del _applied_sqlite_pragmas[self.path, 'journal_mode']
+        wrapper, queries = self.connect()
+        self.assertEqual([query for query in queries if 'journal_mode' in query], ['PRAGMA journal_mode'])
+
+
+class EmailDispatcherTests(TestCase):
+    """
+    The dispatcher only retries unsent messages and sends synchronously when its queue is full.
+    """
+
+    def message(self, number):
+        return EmailMessage(subject=f'Message {number}', body='Body', to=['ada@example.com'])
+
+    def test_retry_only_resends_unsent_messages(self):
+        dispatcher = EmailDispatcher(backoff=0, run_async=False)
+        connection = mock.Mock()
+        connection.send_messages.side_effect = [1, OSError('connection lost'), 1, 1]
+        with mock.patch('accounts.mail.get_connection', return_value=connection):
+            dispatcher._deliver([self.message(number) for number in range(3)])
+        subjects = [call.args[0][0].subject for call in connection.send_messages.call_args_list]
+        self.assertEqual(subjects, ['Message 0', 'Message 1', 'Message 1', 'Message 2'])
+        self.assertEqual((dispatcher.sent, dispatcher.failed, dispatcher.retries), (3, 0, 1))
+
+    def test_full_queue_sends_synchronously(self):
+        dispatcher = EmailDispatcher(max_queue_size=1)
+        with mock.patch.object(dispatcher, '_ensure_worker'):
+            dispatcher.send(self.message(0))
+            dispatcher.send(self.message(1))
+        self.assertEqual([message.subject for message in mail.outbox], ['Message 1'])
+        self.assertEqual((dispatcher.overflowed, dispatcher.sent), (1, 1))
+
+
+ASYNC_URLCONF = bench_urlconf({'login', 'login_step_2', 'signup', 'profile', 'profile_edit', 'change_password'})
+
+
+@override_settings(ROOT_URLCONF=ASYNC_URLCONF, ACCOUNTS_RATELIMITS={})
+class AsyncViewTests(TestCase):
+    """
+    The async views behave like their sync counterparts.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='ada@example.com', username='ada', password='Secret-pass1!')
+
+    async def test_login(self):
+        self.assertIs(resolve(reverse('login')).func, alogin_step_1)
+        response = await self.async_client.post(reverse('login'), {'email': 'Ada@example.com'})
+        self.assertTemplateUsed(response, 'accounts/password.html')
+        response = await self.async_client.post(reverse('login'), {'email': 'nobody@example.com'})
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        response = await self.async_client.post(reverse('login_step_2'), {'email': 'ada@example.com', 'password': 'wrong'})
+        self.assertRedirects(response, reverse('login_step_2'), fetch_redirect_response=False)
+        response = await self.async_client.post(reverse('login_step_2'), {'email': 'ada@example.com', 'password': 'Secret-pass1!'})
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        response = await self.async_client.get(reverse('profile'))
+        self.assertContains(response, 'ada')
+
+    async def test_signup(self):
+        response = await self.async_client.post(reverse('signup'), signup_data('grace', 'grace@example.com'))
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.assertTrue(await CustomUser.objects.filter(email='grace@example.com').aexists())
+        response = await self.async_client.post(reverse('signup'), signup_data('ADA', 'other@example.com'))
+        self.assertRedirects(response, reverse('signup'), fetch_redirect_response=False)
+        response = await self.async_client.post(reverse('signup'), signup_data('hopper', 'ADA@example.com'))
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+
+    async def test_login_required_redirects_anonymous_users(self):
+        for url_name in ('profile_edit', 'change_password'):
+            response = await self.async_client.get(reverse(url_name))
+            self.assertRedirects(response, f'{reverse("login")}?next={reverse(url_name)}', fetch_redirect_response=False)
+
+    async def test_profile_edit(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(reverse('profile_edit'), {'bio': 'Analyst', 'location': 'London'})
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+        await self.user.arefresh_from_db()
+        self.assertEqual((self.user.bio, self.user.location), ('Analyst', 'London'))
+
+
+class HashingBackpressureTests(TestCase):
+    """
+    A saturated hashing pool turns into a 503 with Retry-After, from sync and async views alike.
+    """
+
+    def test_saturated_pool_returns_503(self):
+        with mock.patch.object(hashing_service, 'make_password', side_effect=HashingPoolSaturated(retry_after=3)):
+            response = self.client.post(reverse('signup'), signup_data('grace', 'grace@example.com'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '3')
+
+    @override_settings(ROOT_URLCONF=ASYNC_URLCONF)
+    async def test_saturated_pool_returns_503_from_async_views(self):
+        with mock.patch.object(hashing_service, 'make_password', side_effect=HashingPoolSaturated(retry_after=3)):
+            response = await self.async_client.post(reverse('signup'), signup_data('grace', 'grace@example.com'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '3')
+
+    def test_middleware_supports_async_handlers(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(HashingBackpressureMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(HashingBackpressureMiddleware(lambda request: HttpResponse())))
+
+
+@override_settings(ACCOUNTS_TIMING_SAMPLE_RATE=1.0, ACCOUNTS_SERVER_TIMING=True)
+class TimingMiddlewareTests(TestCase):
+    """
+    Sampled requests get a Server-Timing header and are recorded per view, under WSGI and ASGI.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='ada@example.com', username='ada', password='Secret-pass1!')
+        timing.reset()
+        self.addCleanup(timing.reset)
+
+    def test_server_timing(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('profile'))
+        self.assertRegex(response['Server-Timing'], r'^queries;desc="\d+ SQL queries", db;dur=.*, total;dur=')
+        self.assertIn('profile', timing.histograms())
+
+    @override_settings(ROOT_URLCONF=ASYNC_URLCONF)
+    async def test_server_timing_from_async_views(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('profile'))
+        self.assertRegex(response['Server-Timing'], r'^queries;desc="\d+ SQL queries", db;dur=.*, total;dur=')
+
+    @override_settings(ACCOUNTS_TIMING_SAMPLE_RATE=0.0)
+    def test_unsampled(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('login')))
+        self.assertEqual(timing.histograms(), {})
+
+    def test_middleware_supports_async_handlers(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(TimingMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(TimingMiddleware(lambda request: HttpResponse())))
+
+
+class RateLimitTests(TestCase):
+    """
+    The sliding-window stores enforce the limit and recover as the window slides, and the
+    decorated views answer 429 with Retry-After once a limit is reached.
+    """
+
+    def assert_limits(self, store, clock):
+        clock.return_value = 6000.0
+        self.assertEqual([store.hit('k', 2, 60) for _ in range(3)], [0, 0, 60])
+        # At the start of the next window the previous one still counts in full...
+        clock.return_value = 6060.0
+        self.assertEqual(store.hit('k', 2, 60), 60)
+        # ...and only half of it halfway through.
+        clock.return_value = 6090.0
+        self.assertEqual([store.hit('k', 2, 60), store.hit('k', 2, 60)], [0, 30])
+        clock.return_value = 6240.0
+        self.assertEqual(store.hit('k', 2, 60), 0)
+        self.assertEqual(store.hit('other', 2, 60), 0)
+
+    def test_locmem_store(self):
+        with mock.patch('accounts.ratelimit.time.monotonic') as clock:
+            self.assert_limits(LocMemRateLimitStore(), clock)
+
+    def test_cache_store(self):
+        with mock.patch('accounts.ratelimit.time.time') as clock:
+            self.assert_limits(CacheRateLimitStore(), clock)
+
+    @override_settings(ACCOUNTS_RATELIMITS={'login': {'ip': (10, 60), 'email': (2, 60)}})
+    def test_view_returns_429(self):
+        for _ in range(2):
+            self.assertEqual(self.client.post(reverse('login'), {'email': 'ada@example.com'}).status_code, 302)
+        response = self.client.post(reverse('login'), {'email': 'ADA@example.com'})
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(0 < int(response['Retry-After']) <= 60)
+        self.assertEqual(self.client.post(reverse('login'), {'email': 'grace@example.com'}).status_code, 302)
+        self.assertEqual(self.client.get(reverse('login')).status_code, 200)
+        self.assertEqual(get_rate_limiter().stats(), {'allowed': {'login': 3}, 'rejected': {'login:email': 1}})
+
+    @override_settings(ROOT_URLCONF=ASYNC_URLCONF, ACCOUNTS_RATELIMITS={'login': {'ip': (1, 60)}})
+    async def test_async_view_returns_429(self):
+        self.assertEqual((await self.async_client.post(reverse('login'), {'email': 'ada@example.com'})).status_code, 302)
+        response = await self.async_client.post(reverse('login'), {'email': 'ada@example.com'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+
+class AnonymousPageCacheTests(TestCase):
+    """
+    cache_anonymous_page serves anonymous visitors a shared copy and never caches pages of
+    logged-in users or pages embedding a CSRF token.
+    """
+
+    def setUp(self):
+        caches['default'].clear()
+        self.factory = RequestFactory()
+        self.renders = 0
+
+    def view(self, request):
+        self.renders += 1
+        return HttpResponse(f'render {self.renders}')
+
+    def get(self, view, user=None, path='/page/', query_params=(), **headers):
+        request = self.factory.get(path, headers=headers)
+        request.user = user or AnonymousUser()
+        return cache_anonymous_page(query_params=query_params)(view)(request)
+
+    def test_anonymous_responses_are_cached(self):
+        response = self.get(self.view)
+        self.assertEqual(response.content, b'render 1')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertEqual(self.get(self.view).content, b'render 1')
+        self.assertEqual(self.get(self.view, if_none_match=response['ETag']).status_code, 304)
+        self.assertEqual(self.renders, 1)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(self.client.get(reverse('home'), headers={'If-None-Match': response['ETag']}).status_code, 304)
+
+    def test_authenticated_responses_are_not_cached(self):
+        user = CustomUser.objects.create_user(email='ada@example.com', username='ada', password='Secret-pass1!')
+        for _ in range(2):
+            response = self.get(self.view, user)
+        self.assertEqual(response.content, b'render 2')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.get(self.view).content, b'render 3')
+        self.client.force_login(user)
+        self.assertContains(self.client.get(reverse('home')), 'ada')
+
+    def test_only_listed_query_parameters_are_part_of_the_key(self):
+        self.assertEqual(self.get(self.view, path='/page/?utm=1').content, b'render 1')
+        self.assertEqual(self.get(self.view, path='/page/?utm=2').content, b'render 1')
+        self.assertEqual(self.get(self.view, path='/page/?page=2', query_params=['page']).content, b'render 2')
+        self.assertEqual(self.get(self.view, path='/page/?page=2&utm=3', query_params=['page']).content, b'render 2')
+        self.assertEqual(self.get(self.view, path='/page/', query_params=['page']).content, b'render 1')
+
+    def test_csrf_responses_are_not_cached(self):
+        def view(request):
+            return HttpResponse(get_token(request))
+
+        first, second = self.get(view), self.get(view)
+        self.assertNotEqual(first.content, second.content)
+        self.assertIsNone(caches['default'].get('accounts:page:/page/?'))
+
+
+class NavFragmentCacheTests(TestCase):
+    """
+    base.html caches only the anonymous navigation; the logged-in one, with the username and a
+    CSRF token, is rendered for every request, so one user's navigation never reaches another.
+    """
+
+    def setUp(self):
+        self.cache = caches['template_fragments']
+        self.cache.clear()
+        self.key = make_template_fragment_key('base_nav_anonymous')
+
+    def render(self, user=None):
+        request = RequestFactory().get('/')
+        request.user = user or AnonymousUser()
+        return render_to_string('base.html', request=request)
+
+    def test_anonymous_nav_is_cached(self):
+        self.assertIn('Sign Up', self.render())
+        self.assertIn('Sign Up', self.cache.get(self.key))
+        self.cache.set(self.key, 'cached nav')
+        self.assertIn('cached nav', self.render())
+
+    def test_authenticated_nav_is_never_cached(self):
+        ada = CustomUser.objects.create_user(email='ada@example.com', username='ada', password='Secret-pass1!')
+        grace = CustomUser.objects.create_user(email='grace@example.com', username='grace', password='Secret-pass1!')
+        page = self.render(ada)
+        self.assertIn('>ada</a>', page)
+        self.assertIsNone(self.cache.get(self.key))
+        self.cache.set(self.key, 'cached nav')
+        page = self.render(grace)
+        self.assertIn('>grace</a>', page)
+        self.assertNotIn('ada', page)
+        self.assertNotIn('cached nav', page)
+        self.assertNotIn('grace', self.render())
+
+
+class AdminChangelistTests(TestCase):
+    """
+    The user changelist renders with the estimated row count of LargeTablePaginator.
+    """
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(email='admin@example.com', password='Secret-pass1!', username='admin')
+        for name in ('ada', 'grace'):
+            CustomUser.objects.create_user(email=f'{name}@example.com', username=name, password='Secret-pass1!')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        # Created after the statistics were gathered, so only an exact count includes it.
+        CustomUser.objects.create_user(email='hopper@example.com', username='hopper', password='Secret-pass1!')
+        self.client.force_login(self.admin)
+
+    @mock.patch.object(LargeTablePaginator, 'exact_count_threshold', 1)
+    def test_changelist_uses_the_estimate(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:accounts_customuser_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertNotIn('COUNT(', ' '.join(query['sql'] for query in queries if 'accounts_customuser' in query['sql']))
+        self.assertContains(response, 'hopper@example.com')
+
+    def test_filtered_changelist_counts(self):
+        response = self.client.get(reverse('admin:accounts_customuser_changelist'), {'q': 'Gra'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        self.assertContains(response, 'grace@example.com')
+        response = self.client.get(reverse('admin:accounts_customuser_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 4)
+
+
+class AdminActionTests(TestCase):
+    """
+    The activate/deactivate actions update the selected users by batches and drop their cached state.
+    """
+
+    def setUp(self):
+        admin = CustomUser.objects.create_superuser(email='admin@example.com', password='Secret-pass1!', username='admin')
+        self.users = [
+            CustomUser.objects.create_user(email=f'{name}@example.com', username=name, password='Secret-pass1!')
+            for name in ('ada', 'grace', 'hopper')
+        ]
+        self.client.force_login(admin)
+        email_cache.clear()
+        self.addCleanup(email_cache.clear)
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir.name}
+        self.enterContext(self.settings(CACHES={**settings.CACHES, 'shared': shared}, ACCOUNTS_USER_CACHE_ALIAS='shared'))
+
+    def run_action(self, action):
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin:accounts_customuser_changelist'), {
+                'action': action, '_selected_action': [user.pk for user in self.users],
+            })
+        self.assertEqual(response.status_code, 302)
+        return [query['sql'] for query in queries if query['sql'].startswith('UPDATE "accounts_customuser"')]
+
+    @mock.patch.object(CustomUserAdmin, 'set_active_batch_size', 2)
+    def test_deactivate_drops_cached_state_by_batches(self):
+        for user in self.users:
+            set_user_snapshot(user)
+            self.assertTrue(email_exists(user.email))
+        updates = self.run_action('deactivate_users')
+        self.assertEqual(len(updates), 2)
+        self.assertFalse(CustomUser.objects.filter(pk__in=[user.pk for user in self.users], is_active=True).exists())
+        for user in self.users:
+            self.assertIsNone(get_user_snapshot(user.pk))
+            self.assertNotIn(user.email, email_cache)
+
+    def test_activate_without_snapshots_is_a_single_update(self):
+        CustomUser.objects.filter(pk=self.users[0].pk).update(is_active=False)
+        with self.settings(ACCOUNTS_USER_CACHE_ALIAS=None):
+            updates = self.run_action('activate_users')
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(CustomUser.objects.filter(is_active=True).count(), 4)
+
+
+def picture(name='ada.png', size=(600, 400), color='red'):
+    image = BytesIO()
+    Image.new('RGB', size, color).save(image, 'PNG')
+    return SimpleUploadedFile(name, image.getvalue(), content_type='image/png')
+
+
+@override_settings(ACCOUNTS_AVATAR_WORKERS=0, ACCOUNTS_RATELIMITS={})
+class AvatarTests(TestCase):
+    """
+    Avatars are stored under content-hashed names with their thumbnails, and a crashed
+    thumbnail pool is replaced instead of failing every upload.
+    """
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media.name))
+        get_thumbnail_executor.cache_clear()
+        self.addCleanup(get_thumbnail_executor.cache_clear)
+
+    def test_profile_edit_stores_the_avatar(self):
+        user = CustomUser.objects.create_user(email='ada@example.com', username='ada', password='Secret-pass1!')
+        self.client.force_login(user)
+        response = self.client.post(reverse('profile_edit'), {'bio': 'Mathematician', 'profile_pic': picture()})
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+        user.refresh_from_db()
+        self.assertRegex(user.avatar.name, r'^avatars/[0-9a-f]{32}\.png$')
+        self.assertEqual(user.avatar_urls, {size: f'/media/{thumbnail_name(user.avatar.name, size)}' for size in AVATAR_SIZES})
+        with Image.open(default_storage.path(thumbnail_name(user.avatar.name, 64))) as thumbnail:
+            self.assertEqual(thumbnail.size, (64, 43))
+        self.assertEqual(store_avatar(picture('copy.png')), user.avatar.name)
+
+    def test_invalid_upload(self):
+        with self.assertRaises(ValidationError):
+            store_avatar(SimpleUploadedFile('ada.png', b'not a picture', content_type='image/png'))
+        with self.settings(ACCOUNTS_AVATAR_MAX_PIXELS=1000), self.assertRaises(ValidationError):
+            store_avatar(picture())
+
+    @override_settings(ACCOUNTS_AVATAR_WORKERS=1)
+    def test_broken_pool_is_replaced(self):
+        broken = mock.Mock(**{'submit.side_effect': BrokenProcessPool})
+        with mock.patch('accounts.avatars.ProcessPoolExecutor', side_effect=[broken, mock.sentinel.executor]):
+            name = store_avatar(picture())
+            self.assertIs(get_thumbnail_executor(), mock.sentinel.executor)
+        broken.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        self.assertTrue(all(default_storage.exists(thumbnail_name(name, size)) for size in AVATAR_SIZES))
+
+    @override_settings(ACCOUNTS_AVATAR_WORKERS=1)
+    def test_failed_jobs_are_logged(self):
+        future = Future()
+        executor = mock.Mock(**{'submit.return_value': future})
+        with mock.patch('accounts.avatars.ProcessPoolExecutor', return_value=executor):
+            store_avatar(picture())
+        with self.assertLogs('accounts.avatars', 'ERROR'):
+            future.set_exception(OSError('disk full'))
+
+
+@override_settings(ACCOUNTS_RATELIMITS={})
+class PasswordHasherTests(TestCase):
+    """
+    Outdated password hashes are upgraded on login and reported by password_hash_report.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(
+            email='ada@example.com', username='ada', password=make_password('Secret-pass1!', hasher='pbkdf2_sha1'),
+        )
+
+    def test_outdated_hash_is_upgraded_on_login(self):
+        response = self.client.post(reverse('login_step_2'), {'email': 'ada@example.com', 'password': 'Secret-pass1!'})
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.user.refresh_from_db()
+        self.assertEqual(identify_hasher(self.user.password).algorithm, 'pbkdf2_sha256')
+        self.assertTrue(check_password('Secret-pass1!', self.user.password))
+
+    def test_hash_report(self):
+        CustomUser.objects.create(email='grace@example.com', username='grace', password=make_password('Secret-pass1!'))
+        CustomUser.objects.create(email='hopper@example.com', username='hopper', password=make_password(None))
+        out = StringIO()
+        call_command('password_hash_report', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'Preferred hasher: pbkdf2_sha256 (PBKDF2PasswordHasher)')
+        report = {line.split()[0]: line for line in lines[2:-1]}
+        self.assertEqual(sorted(report), ['pbkdf2_sha1', 'pbkdf2_sha256', 'unusable'])
+        self.assertTrue(report['pbkdf2_sha1'].endswith('upgrade on login'))
+        self.assertTrue(report['pbkdf2_sha256'].endswith('current'))
+        self.assertEqual(lines[-1], '3 user(s)')
+
+
+class PasswordPolicyTests(SimpleTestCase):
+    """
+    PasswordPolicy reports every rule a password breaks, each with its own code.
+    """
+
+    def codes(self, password, user=None):
+        return [error.code for error in PasswordPolicy().errors(password, user)]
+
+    def test_acceptable_password(self):
+        self.assertEqual(self.codes('Secret-pass1!'), [])
+        PasswordPolicy().validate('Secret-pass1!')
+
+    def test_each_rule(self):
+        self.assertEqual(self.codes('Se-c1!'), ['password_too_short'])
+        self.assertEqual(self.codes('SECRET-PASS1!'), ['password_no_lower'])
+        self.assertEqual(self.codes('secret-pass1!'), ['password_no_upper'])
+        self.assertEqual(self.codes('SecretPass12'), ['password_no_special'])
+        self.assertEqual(self.codes('Password1!'), ['password_too_common'])
+        user = CustomUser(username='lovelace', email='ada.lovelace@example.com')
+        self.assertEqual(self.codes('Lovelace!', user), ['password_too_similar'])
+
+    def test_every_broken_rule_is_reported(self):
+        self.assertEqual(self.codes('12345'), [
+            'password_too_short', 'password_no_lower', 'password_no_upper', 'password_no_special',
+            'password_entirely_numeric', 'password_too_common',
+        ])
+        with self.assertRaises(ValidationError) as raised:
+            PasswordPolicy().validate('12345')
+        self.assertEqual(len(raised.exception.messages), 6)
+
+    def test_startup_loads_the_list_the_policy_uses(self):
+        _load_common_passwords.cache_clear()
+        apps.get_app_config('accounts').ready()
+        PasswordPolicy().validate('Secret-pass1!')
+        PasswordPolicy(password_list_path=str(DEFAULT_PASSWORD_LIST_PATH)).validate('Secret-pass1!')
+        info = _load_common_passwords.cache_info()
+        self.assertEqual((info.misses, info.currsize), (1, 1))
+
+
+class ImportUsersTests(TestCase):
+    """
+    import_users hashes raw passwords, keeps already encoded ones, and matches existing users
+    regardless of the case of their email.
+    """
+
+    def import_users(self, *rows, **options):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+            f.writelines(json.dumps(row) + '\n' for row in rows)
+        self.addCleanup(os.remove, f.name)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_users', f.name, workers=0, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_passwords(self):
+        unusable = make_password(None)
+        encoded = make_password('Grace-pass1!')
+        self.import_users(
+            {'email': 'ada@example.com', 'password': '!Secret-pass1'},
+            {'email': 'grace@example.com', 'password': encoded},
+            {'email': 'hopper@example.com', 'password': unusable},
+        )
+        passwords = dict(CustomUser.objects.values_list('email', 'password'))
+        self.assertTrue(check_password('!Secret-pass1', passwords['ada@example.com']))
+        self.assertEqual(passwords['grace@example.com'], encoded)
+        self.assertEqual(passwords['hopper@example.com'], unusable)
+
+    def test_update_matches_emails_case_insensitively(self):
+        user = CustomUser.objects.create_user(email='Ada@example.com', username='ada', password='Secret-pass1!')
+        self.import_users({'email': 'ADA@example.com', 'bio': 'Mathematician'}, {'email': 'grace@example.com'}, update=True)
+        user.refresh_from_db()
+        self.assertEqual((user.email, user.bio, user.version), ('Ada@example.com', 'Mathematician', 2))
+        self.assertEqual(CustomUser.objects.count(), 2)
+
+    def test_rows_with_too_long_values_are_rejected(self):
+        long_email = 'a' * 150 + '@example.com'
+        stdout, stderr = self.import_users(
+            {'email': 'ada@example.com'},
+            {'email': long_email},
+            {'email': 'grace@example.com', 'username': 'g' * 151},
+            {'username': 'hopper'},
+            {'email': 'hopper@example.com'},
+            batch_size=2,
+        )
+        self.assertIn('5 row(s): 2 created, 0 updated, 0 skipped, 3 rejected', stdout)
+        self.assertIn(f'username is longer than 150 characters: {long_email}', stderr)
+        self.assertEqual(sorted(CustomUser.objects.values_list('email', flat=True)), ['ada@example.com', 'hopper@example.com'])
+
+    def test_lower_lookup_is_scoped(self):
+        self.assertIsNotNone(CustomUser._meta.get_field('email').get_transform('lower'))
+        self.assertIsNone(CustomUser._meta.get_field('location').get_transform('lower'))
+
+
+class PurgeSessionsTests(TestCase):
+    """
+    purge_sessions deletes only expired database sessions, by batches, and leaves other engines alone.
+    """
+
+    def setUp(self):
+        now = timezone.now()
+        for number in range(5):
+            Session.objects.create(session_key=f'expired{number}', session_data='', expire_date=now - timedelta(days=1))
+        for number in range(2):
+            Session.objects.create(session_key=f'live{number}', session_data='', expire_date=now + timedelta(days=1))
+
+    def purge(self, **options):
+        stdout = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('purge_sessions', stdout=stdout, **options)
+        deletes = [query for query in queries if query['sql'].startswith('DELETE FROM "django_session"')]
+        return stdout.getvalue(), deletes
+
+    def test_expired_sessions_are_deleted_by_batches(self):
+        output, deletes = self.purge(batch_size=2)
+        self.assertIn('Removed 5 expired session(s).', output)
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(sorted(Session.objects.values_list('pk', flat=True)), ['live0', 'live1'])
+
+    def test_other_session_engines_are_left_alone(self):
+        for engine in ('django.contrib.sessions.backends.cache', 'django.contrib.sessions.backends.signed_cookies'):
+            with self.subTest(engine=engine), self.settings(SESSION_ENGINE=engine):
+                output, deletes = self.purge()
+                self.assertIn('nothing to purge', output)
+                self.assertEqual(deletes, [])
+                self.assertEqual(Session.objects.count(), 7)
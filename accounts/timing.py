@@ -0,0 +1,144 @@
+"""
+Per-request timing of the accounts views: total latency, SQL queries, password hashing and
+template rendering, collected only for sampled requests (see TimingMiddleware).
+
+The timings of the request being handled live in a context variable, so code anywhere in the
+request (the hashing service, the template backend, the database execute wrapper) adds to them
+without being handed the request, and does nothing but one lookup when the request is not sampled.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import CountRecorder, LatencyRecorder
+
+current_timings = ContextVar('accounts_request_timings', default=None)
+
+# Rolling histograms per URL name, filled by TimingMiddleware and read by the metrics view.
+HISTOGRAM_SIZE = 1024
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+# Server-Timing metric names and descriptions, in header order.
+PHASES = {'db': 'SQL', 'hash': 'Password hashing', 'template': 'Template rendering'}
+
+
+class RequestTimings:
+    """
+    The seconds spent per phase and the number of SQL queries of one request.
+    """
+
+    __slots__ = ('phases', 'queries')
+
+    def __init__(self):
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+
+    def server_timing(self, total):
+        """
+        Returns the value of the Server-Timing header, durations in milliseconds.
+        """
+        metrics = [
+            f'{name};dur={seconds * 1000:.2f};desc="{PHASES[name]}"'
+            for name, seconds in self.phases.items() if seconds
+        ]
+        if self.queries:
+            metrics[0:0] = [f'queries;desc="{self.queries} SQL queries"']
+        metrics.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(metrics)
+
+
+@contextmanager
+def timed(phase):
+    """
+    Adds the time spent in the with-block to `phase` of the current request, if it is sampled.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.phases[phase] += time.perf_counter() - start
+
+
+def query_timer(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting the queries of sampled requests and the time they take.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.phases['db'] += time.perf_counter() - start
+        timings.queries += 1
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    connection_created receiver adding query_timer to every new database connection.
+    """
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+def _new_recorders():
+    recorders = {name: LatencyRecorder(HISTOGRAM_SIZE) for name in ('total', *PHASES)}
+    recorders['queries'] = CountRecorder(HISTOGRAM_SIZE)
+    return recorders
+
+
+def record(view_name, total, timings):
+    """
+    Adds a sampled request's timings to the rolling histograms of its view.
+    """
+    recorders = _histograms.get(view_name)
+    if recorders is None:
+        with _histograms_lock:
+            recorders = _histograms.setdefault(view_name, _new_recorders())
+    recorders['total'].record(total)
+    for name, seconds in timings.phases.items():
+        recorders[name].record(seconds)
+    recorders['queries'].record(timings.queries)
+
+
+def histograms():
+    """
+    Returns the snapshot of every recorded view: latency percentiles in milliseconds per phase
+    and the distribution of SQL queries per request.
+    """
+    with _histograms_lock:
+        views = sorted(_histograms.items())
+    return {view_name: {name: recorder.snapshot() for name, recorder in recorders.items()} for view_name, recorders in views}
+
+
+def reset():
+    with _histograms_lock:
+        _histograms.clear()
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, with the rendering time of sampled requests added to their timings.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from .views import (logout_view, 
                     login_step_1, 
@@ -6,14 +7,50 @@ from .views import (logout_view,
                     profile, 
                     profile_edit, 
                     change_password,
+                    alogin_step_1,
+                    alogin_step_2,
+                    asignup,
+                    aprofile,
+                    aprofile_edit,
+                    achange_password,
+                    metrics_view,
+                    user_lookup,
+                    password_reset,
+                    password_reset_otp,
+                    resend_otp,
+                    password_reset_complete,
                     )
 
-urlpatterns = [
-    path('login/', login_step_1, name='login'),
-    path('login-step-2/', login_step_2, name='login_step_2'),
-    path('signup/', signup, name='signup'),
-    path('profile/', profile, name='profile'),
-    path('profile-edit/', profile_edit, name='profile_edit'),
-    path('change-password/', change_password, name='change_password'),
-    path('logout/', logout_view, name='logout'),
-]
\ No newline at end of file
+
+def account_urlpatterns(async_views=()):
+    """
+    Builds the accounts URL patterns.
+
+    Parameters:
+        async_views (Iterable[str]): URL names served by the async (ASGI-native) view
+            instead of the sync one, e.g. {'login', 'profile'}.
+
+    Returns:
+        list: The URL patterns.
+    """
+    def view(name, sync_view, async_view):
+        return async_view if name in async_views else sync_view
+
+    return [
+        path('login/', view('login', login_step_1, alogin_step_1), name='login'),
+        path('login-step-2/', view('login_step_2', login_step_2, alogin_step_2), name='login_step_2'),
+        path('signup/', view('signup', signup, asignup), name='signup'),
+        path('profile/', view('profile', profile, aprofile), name='profile'),
+        path('profile-edit/', view('profile_edit', profile_edit, aprofile_edit), name='profile_edit'),
+        path('change-password/', view('change_password', change_password, achange_password), name='change_password'),
+        path('logout/', logout_view, name='logout'),
+        path('password-reset/', password_reset, name='password_reset'),
+        path('password-reset/otp/', password_reset_otp, name='password_reset_otp'),
+        path('password-reset/resend/', resend_otp, name='resend_otp'),
+        path('password-reset/complete/', password_reset_complete, name='password_reset_complete'),
+        path('metrics/', metrics_view, name='metrics'),
+        path('api/users/', user_lookup, name='user_lookup'),
+    ]
+
+
+urlpatterns = account_urlpatterns(getattr(settings, 'ACCOUNTS_ASYNC_VIEWS', ()))
@@ -0,0 +1,103 @@
+import csv
+import json
+from datetime import date, datetime
+from itertools import islice
+
+# Columns read by import_users and written by export_users, in file order.
+USER_FIELDS = (
+    'email', 'username', 'password', 'first_name', 'last_name', 'bio', 'location',
+    'date_of_birth', 'is_active', 'is_staff', 'date_joined',
+)
+
+FORMATS = ('csv', 'jsonl')
+
+
+def guess_format(path, default='csv'):
+    """
+    Returns 'jsonl' for .jsonl/.ndjson paths, 'csv' for .csv paths and `default` otherwise.
+    """
+    path = str(path).lower()
+    if path.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if path.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def read_rows(file, format):
+    """
+    Lazily yields one dict per user from a CSV (with a header line) or JSONL file.
+
+    Parameters:
+        file (TextIO): The open file to read.
+        format (str): 'csv' or 'jsonl'.
+    """
+    if format == 'csv':
+        yield from csv.DictReader(file)
+    else:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def chunked(iterable, size):
+    """
+    Yields lists of up to `size` items from an iterable without materializing it.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _serialize(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+class RowWriter:
+    """
+    Writes user rows (tuples ordered like `fields`) to a file as CSV with a header line, or as JSONL.
+
+    Attributes:
+        fields (tuple): The column names.
+        format (str): 'csv' or 'jsonl'.
+    """
+
+    def __init__(self, file, format, fields=USER_FIELDS):
+        self.file = file
+        self.format = format
+        self.fields = fields
+        if format == 'csv':
+            self._csv = csv.writer(file)
+            self._csv.writerow(fields)
+
+    def write(self, row):
+        values = [_serialize(value) for value in row]
+        if self.format == 'csv':
+            self._csv.writerow(values)
+        else:
+            self.file.write(json.dumps(dict(zip(self.fields, values))) + '\n')
+
+
+class _LineBuffer(list):
+    def write(self, value):
+        self.append(value)
+
+
+def iter_lines(rows, format, fields=USER_FIELDS):
+    """
+    Yields the CSV or JSONL text of user rows piece by piece, e.g. for a StreamingHttpResponse.
+
+    Parameters:
+        rows (Iterable[tuple]): The rows, ordered like `fields`.
+        format (str): 'csv' or 'jsonl'.
+        fields (tuple): The column names.
+    """
+    buffer = _LineBuffer()
+    writer = RowWriter(buffer, format, fields)
+    for row in rows:
+        writer.write(row)
+        yield from buffer
+        buffer.clear()
+    yield from buffer
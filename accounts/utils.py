@@ -1,7 +1,9 @@
-import random
-import re
+import secrets
+from django.conf import settings
+from django.contrib.auth import password_validation
 from django.core.mail import EmailMultiAlternatives
-from django.forms import ValidationError
+from django.template.loader import render_to_string
+from .mail import dispatcher
 
 
 
@@ -10,25 +12,58 @@ def otp_generation():
     Generate a 6-digit OTP (One-Time Password).
 
     This function generates a random 6-digit number which can be used as an OTP
-    for authentication purposes.
+    for authentication purposes. It is drawn from the operating system's CSPRNG
+    (the secrets module), so issued codes cannot be predicted from earlier ones.
 
     Returns:
         int: A 6-digit random integer between 100000 and 999999.
     """
-    return random.randint(100000, 999999)
-
-
-def validate_password(value):
-    if len(value) < 8:
-        raise ValidationError(
-            "Password must be at least 8 characters long")
-    if not any(char.islower() for char in value):
-        raise ValidationError(
-            "Password must contain at least one lowercase letter")
-    if not any(char.isupper() for char in value):
-        raise ValidationError(
-            "Password must contain at least one uppercase letter")
-    if not re.search(r'[!@#$%^&*(),.?":{}|<>]', value):
-        raise ValidationError(
-            "Password must contain at least one special character")
-    return True
\ No newline at end of file
+    return 100000 + secrets.randbelow(900000)
+
+
+def send_otp_email(user, otp):
+    """
+    Queues an email containing an OTP for the given user.
+
+    The message is handed to the background email dispatcher, so the calling
+    view returns without waiting for the mail server (unless the dispatcher's
+    queue is full, in which case it is sent before returning).
+
+    Parameters:
+        user (CustomUser): The user the OTP was issued for.
+        otp (str): The OTP to send.
+    """
+    context = {
+        'user': user,
+        'otp': otp,
+        'minutes': getattr(settings, 'ACCOUNTS_OTP_TTL', 600) // 60,
+    }
+    message = EmailMultiAlternatives(
+        subject='Your One-Time Password',
+        body=render_to_string('accounts/email/otp.txt', context),
+        to=[user.email],
+    )
+    message.attach_alternative(render_to_string('accounts/email/otp.html', context), 'text/html')
+    dispatcher.send(message)
+
+
+def validate_password(value, user=None):
+    """
+    Validate a password against the site's password policy.
+
+    Runs AUTH_PASSWORD_VALIDATORS, i.e. accounts.validators.PasswordPolicy, which checks every
+    rule in a single pass and reports all of the broken ones together.
+
+    Args:
+        value (str): The password to validate.
+        user (CustomUser, optional): The user the password is for, used to reject passwords
+            similar to the username or email.
+
+    Returns:
+        bool: True if the password is acceptable.
+
+    Raises:
+        ValidationError: Listing every broken rule (see ValidationError.messages).
+    """
+    password_validation.validate_password(value, user)
+    return True
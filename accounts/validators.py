@@ -0,0 +1,127 @@
+import gzip
+from functools import lru_cache
+from pathlib import Path
+
+import django.contrib.auth
+from django.contrib.auth.password_validation import UserAttributeSimilarityValidator
+from django.core.exceptions import ValidationError
+
+SPECIAL_CHARACTERS = frozenset('!@#$%^&*(),.?":{}|<>')
+
+DEFAULT_PASSWORD_LIST_PATH = Path(django.contrib.auth.__file__).resolve().parent / 'common-passwords.txt.gz'
+
+
+def common_passwords(path=DEFAULT_PASSWORD_LIST_PATH):
+    """
+    Loads a list of common passwords (one per line, optionally gzipped) into a frozenset.
+
+    The list is read and decompressed once per process and file; AccountsConfig.ready()
+    loads the default list at startup so no request pays for it. The path is resolved
+    before the cached load, so every spelling of the same file shares one cache entry.
+
+    Parameters:
+        path (Path | str): The password list to load.
+
+    Returns:
+        frozenset: The lowercased common passwords.
+    """
+    return _load_common_passwords(Path(path).resolve())
+
+
+@lru_cache(maxsize=None)
+def _load_common_passwords(path):
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return frozenset(line.strip() for line in f)
+    except OSError:
+        with open(path, encoding='utf-8') as f:
+            return frozenset(line.strip() for line in f)
+
+
+class PasswordPolicy:
+    """
+    PasswordPolicy evaluates every password rule of the site in a single pass over the password
+    and reports all failures at once, instead of stopping at the first one.
+
+    It replaces the separate MinimumLength, Common, Numeric and UserAttributeSimilarity validators
+    and adds the character class rules (lowercase, uppercase, special character), so it is used as
+    the only entry of AUTH_PASSWORD_VALIDATORS and from accounts.utils.validate_password.
+
+    Attributes:
+        min_length (int): The minimum number of characters.
+        password_list_path (Path | str): The list of common passwords to reject.
+        similarity (UserAttributeSimilarityValidator): Checks the password against the user's attributes.
+    """
+
+    def __init__(self, min_length=8, password_list_path=DEFAULT_PASSWORD_LIST_PATH,
+                 user_attributes=UserAttributeSimilarityValidator.DEFAULT_USER_ATTRIBUTES, max_similarity=0.7):
+        self.min_length = min_length
+        self.password_list_path = password_list_path
+        self.similarity = UserAttributeSimilarityValidator(user_attributes, max_similarity)
+
+    def errors(self, password, user=None):
+        """
+        Returns every rule the password breaks.
+
+        Parameters:
+            password (str): The password to check.
+            user (CustomUser): The user the password is for, used for the similarity rule (optional).
+
+        Returns:
+            list: A ValidationError per broken rule, empty if the password is acceptable.
+        """
+        has_lower = has_upper = has_special = False
+        numeric = True
+        for char in password:
+            if char.islower():
+                has_lower = True
+            elif char.isupper():
+                has_upper = True
+            elif char in SPECIAL_CHARACTERS:
+                has_special = True
+            if numeric and not char.isdigit():
+                numeric = False
+
+        errors = []
+        if len(password) < self.min_length:
+            errors.append(ValidationError(
+                'Password must be at least %(min_length)d characters long',
+                code='password_too_short', params={'min_length': self.min_length},
+            ))
+        if not has_lower:
+            errors.append(ValidationError(
+                'Password must contain at least one lowercase letter', code='password_no_lower',
+            ))
+        if not has_upper:
+            errors.append(ValidationError(
+                'Password must contain at least one uppercase letter', code='password_no_upper',
+            ))
+        if not has_special:
+            errors.append(ValidationError(
+                'Password must contain at least one special character', code='password_no_special',
+            ))
+        if password and numeric:
+            errors.append(ValidationError('Password cannot be entirely numeric', code='password_entirely_numeric'))
+        if password.lower().strip() in common_passwords(self.password_list_path):
+            errors.append(ValidationError('This password is too common', code='password_too_common'))
+        if user is not None:
+            try:
+                self.similarity.validate(password, user)
+            except ValidationError as error:
+                errors.append(error)
+        return errors
+
+    def validate(self, password, user=None):
+        """
+        Raises a ValidationError listing every broken rule, as expected from a Django password validator.
+        """
+        errors = self.errors(password, user)
+        if errors:
+            raise ValidationError(errors)
+
+    def get_help_text(self):
+        return (
+            f'Your password must contain at least {self.min_length} characters, including a lowercase letter, '
+            'an uppercase letter and a special character, and can’t be entirely numeric, commonly used '
+            'or too similar to your other personal information.'
+        )
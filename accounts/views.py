@@ -1,16 +1,40 @@
+import hashlib
+import json
+import time
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.forms import ValidationError
 from django.shortcuts import  render,redirect
-from django.contrib.auth import login, logout, authenticate
+from django.contrib.auth import (login, logout, authenticate, alogin, aauthenticate,
+                                 aupdate_session_auth_hash, update_session_auth_hash)
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+from django.db import IntegrityError
 from .models import CustomUser
 from django.contrib import messages
-from .utils import validate_password
+from .utils import send_otp_email, validate_password
+from .cache import aemail_exists, email_exists, normalize_email
+from .avatars import store_avatar
+from .hashing import hashing_service
+from .ratelimit import get_rate_limiter, ratelimit
+from .decorators import api_auth_required, cache_anonymous_page
+from .events import login_events
+from .mail import dispatcher
+from .timing import histograms
 from django.contrib.auth.decorators import login_required
 # Create your views here.
 
 
+@cache_anonymous_page
 def home_view(request):
     """
     Renders the home page with a welcome message.
+    Anonymous visitors get a cached copy that browsers and proxies may cache as well (see cache_anonymous_page).
 
     Parameters:
     request (HttpRequest): The HTTP request object.
@@ -21,11 +45,13 @@ def home_view(request):
     context = {'message': 'Welcome to the home page!'}
     return render(request, 'home.html', context)
 
+@ratelimit('login')
 def login_step_1(request):
     """
     View function for the first step of the login process.
     If the request method is POST, it retrieves the email from the request POST data.
-    Attempts to retrieve a CustomUser instance based on the provided email.
+    Checks whether an account exists for the normalized email through the email existence cache,
+    which falls back to a single EXISTS query, so no user row is loaded at this step.
     If the user exists, renders the 'accounts/password.html' template with the email context.
     If the user does not exist, displays an error message and redirects to the 'login' view.
     If the request method is not POST, renders the 'accounts/login.html' template.
@@ -37,15 +63,14 @@ def login_step_1(request):
         HttpResponse: The HTTP response object that either renders a template or redirects the user.
     """
     if request.method == 'POST':
-        email = request.POST.get('email')
-        try:
-            user = CustomUser.objects.get(email=email)
+        email = normalize_email(request.POST.get('email'))
+        if email_exists(email):
             return render(request, 'accounts/password.html', {'email': email})
-        except CustomUser.DoesNotExist:
-            messages.error(request, 'Account does not exist.')
-            return redirect('login')
+        messages.error(request, 'Account does not exist.')
+        return redirect('login')
     return render(request, 'accounts/login.html')
 
+@ratelimit('login_step_2')
 def login_step_2(request):
     """
     View function for the second step of the login process.
@@ -82,9 +107,10 @@ def signup(request):
     Handles the user signup process.
 
     If the request method is POST, it retrieves the username, email, password, and confirm_password from the request POST data.
-    Validates the password and checks if the password and confirm_password match.
-    Checks if the username or email already exists in the database.
-    If all validations pass, creates a new CustomUser instance, sets the password, saves the user, logs in the user, and redirects to the home page.
+    Checks if the password and confirm_password match and validates the password, reporting every broken rule.
+    If all validations pass, creates a new CustomUser instance (hashing the password once), logs in the user, and redirects to the home page.
+    Duplicate usernames and emails are left to the unique constraints: the insert is the only query, and a single
+    lookup runs when it fails to report whether the username or the email is taken, which also holds for two concurrent signups.
     If any validation fails, displays an error message and redirects to the signup view.
     If the request method is not POST, renders the signup template.
 
@@ -96,26 +122,29 @@ def signup(request):
     """
     if request.method=='POST':
         username = request.POST.get('username')
-        email = request.POST.get('email')
+        email = normalize_email(request.POST.get('email'))
         password = request.POST.get('password')
         confirm_password = request.POST.get('confirm_password')
         if password != confirm_password:
             messages.error(request, 'Passwords do not match')
             return redirect('signup')
         try:
-            validate_password(password)
+            validate_password(password, CustomUser(username=username, email=email))
         except ValidationError as e:
-            messages.error(request, str(e))
-            return redirect('signup')
-        if CustomUser.objects.filter(username=username).exists():
-            messages.error(request, 'Username already exists')
+            for error in e.messages:
+                messages.error(request, error)
             return redirect('signup')
-        if CustomUser.objects.filter(email=email).exists():
-            messages.error(request, 'Email already exists, Please login')
-            return redirect('login')
-        user = CustomUser.objects.create_user(username=username, email=email, password=password)
-        user.set_password(password)
-        user.save()
+        try:
+            user = CustomUser.objects.create_user(username=username, email=email, password=password)
+        except IntegrityError:
+            field = CustomUser.objects.conflicting_field(username, email)
+            if field == 'username':
+                messages.error(request, 'Username already exists')
+                return redirect('signup')
+            if field == 'email':
+                messages.error(request, 'Email already exists, Please login')
+                return redirect('login')
+            raise
         login(request, user)
         return redirect('home')
     else:
@@ -144,7 +173,10 @@ def profile_edit(request):
     This function is decorated with @login_required to ensure that only authenticated users can access this view.
     If the request method is GET, it retrieves the authenticated user's information and renders the 'accounts/edit_profile.html' template with the user's information.
     If the request method is POST, it retrieves the updated bio, location, and date_of_birth from the request POST data.
-    Updates the authenticated user's information with the new values, saves the changes, and displays a success message.
+    An uploaded profile picture is validated and stored under a content-hashed name, and its thumbnails are
+    rendered in the background; an invalid picture displays an error and nothing is saved.
+    Updates the authenticated user's information with the new values and saves only the columns that changed
+    (nothing is written if none did), then displays a success message.
     Finally, redirects the user to the 'profile' view.
 
     Parameters:
@@ -158,9 +190,16 @@ def profile_edit(request):
         return render(request, 'accounts/edit_profile.html', {'user': user})
     elif request.method == 'POST':
         bio = request.POST.get('bio')
-        location = request.POST.get('location')
-        date_of_birth = request.POST.get('date_of_birth')
+        location = request.POST.get('location') or None
+        date_of_birth = request.POST.get('date_of_birth') or None
         user = request.user
+        if 'profile_pic' in request.FILES:
+            try:
+                user.avatar = store_avatar(request.FILES['profile_pic'])
+            except ValidationError as e:
+                for error in e.messages:
+                    messages.error(request, error)
+                return redirect('profile_edit')
         user.bio = bio
         user.location = location
         user.date_of_birth = date_of_birth
@@ -175,8 +214,9 @@ def change_password(request):
 
     This view function allows a logged-in user to change their password.
     It validates the old password, ensures the new passwords match, 
-    and validates the new password using the 'validate_password' function from 'utils.py'. 
-    If all validations pass, the user's password is updated and a success message is displayed. 
+    and validates the new password using the 'validate_password' function from 'utils.py', reporting every broken rule. 
+    If all validations pass, the user's password is updated, the session is kept valid and a success message is displayed. 
+    Hashing and verification run on the hashing service's worker pool.
     If any validation fails, appropriate error messages are shown.
 
     Parameters:
@@ -193,25 +233,188 @@ def change_password(request):
         new_password1 = request.POST.get('new_password1')
         new_password2 = request.POST.get('new_password2')
         user =  request.user
-        if not user.check_password(old_password):
+        if not hashing_service.check_password(old_password, user.password):
             messages.error(request, 'Check old password')
             return redirect('change_password')
         if new_password1 != new_password2:
             messages.error(request, 'Password mismatch')
             return redirect('change_password')
         try:
-            validate_password(new_password1)
+            validate_password(new_password1, user)
         except ValidationError as e:
-            messages.error(request, str(e))
+            for error in e.messages:
+                messages.error(request, error)
             return redirect('change_password')
-        user.set_password(new_password1)
+        user.password = hashing_service.make_password(new_password1)
+        user._password = new_password1
         user.save()
+        update_session_auth_hash(request, user)
         messages.success(request, 'Password changed successfully')
         return redirect('profile')
     else:
         return render(request, 'accounts/change_password.html')
 
 
+# Session key holding the state of a password reset: the user id the OTP was issued for (None if the
+# email has no active account), when it was last sent, the failed attempts and, once the OTP was verified,
+# the code of the 'password_reset_verified' OTP that allows setting the new password. The session only
+# drives the UI: failed attempts are also counted by the OTP backend, and the verification is an OTP
+# stored there too, so replaying an earlier session cookie neither resets the attempts nor repeats a reset.
+PASSWORD_RESET_SESSION_KEY = 'password_reset'
+
+
+def _reset_user(**filters):
+    return CustomUser.objects.filter(is_active=True, **filters).only('pk', 'email', 'username').first()
+
+
+def _send_reset_otp(state, user):
+    """
+    Issues a new reset OTP for the user and queues its email, and records in the reset state when it
+    was sent. For unknown emails (user is None) nothing is issued, but the state is updated the same way.
+    """
+    if user is not None:
+        send_otp_email(user, user.save_otp('password_reset'))
+    state['sent_at'] = time.time()
+
+
+def _can_resend(state):
+    cooldown = getattr(settings, 'ACCOUNTS_OTP_RESEND_COOLDOWN', 60)
+    return time.time() - state['sent_at'] >= cooldown
+
+
+def password_reset(request):
+    """
+    Renders the form asking for the email of the account whose password is to be reset.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object sent by the user.
+
+    Returns:
+        HttpResponse: The rendered 'accounts/password_reset.html' template.
+    """
+    return render(request, 'accounts/password_reset.html')
+
+
+@ratelimit('otp')
+def password_reset_otp(request):
+    """
+    Handles the OTP step of the password reset.
+
+    A POST with an email starts a reset: if an active account has that email, an OTP is issued and
+    emailed to it. The response is the same whether or not the account exists, so the form cannot be
+    used to find out which emails are registered. The reset state is kept in the session.
+    A POST with an OTP verifies it with a single lookup of the OTP's unique key and a constant-time
+    comparison of its digest (see accounts.otp). After ACCOUNTS_OTP_MAX_ATTEMPTS wrong codes the OTP
+    backend discards the OTP and the reset has to be started again. A GET renders the OTP form, with
+    resending enabled once the cooldown passed.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object sent by the user.
+
+    Returns:
+        HttpResponse: The OTP form, or a redirect to the next step of the reset.
+    """
+    if request.method == 'POST' and 'email' in request.POST:
+        email = normalize_email(request.POST.get('email'))
+        user = _reset_user(email__lower=email.lower())
+        state = {'user': user and user.pk, 'sent_at': 0, 'attempts': 0, 'verified': None}
+        _send_reset_otp(state, user)
+        request.session[PASSWORD_RESET_SESSION_KEY] = state
+        messages.success(request, 'If an account exists for this email, an OTP has been sent to it.')
+        return redirect('password_reset_otp')
+
+    state = request.session.get(PASSWORD_RESET_SESSION_KEY)
+    if state is None:
+        return redirect('password_reset')
+    if request.method == 'POST':
+        otp = (request.POST.get('otp') or '').strip()
+        user = CustomUser(pk=state['user']) if state['user'] is not None else None
+        if user is not None and user.valid_otp(otp, 'password_reset'):
+            state['verified'] = user.save_otp('password_reset_verified')
+            request.session[PASSWORD_RESET_SESSION_KEY] = state
+            return redirect('password_reset_complete')
+        state['attempts'] += 1
+        if state['attempts'] >= getattr(settings, 'ACCOUNTS_OTP_MAX_ATTEMPTS', 5):
+            del request.session[PASSWORD_RESET_SESSION_KEY]
+            messages.error(request, 'Too many invalid OTPs, please request a new one.')
+            return redirect('password_reset')
+        request.session[PASSWORD_RESET_SESSION_KEY] = state
+        messages.error(request, 'Invalid or expired OTP')
+        return redirect('password_reset_otp')
+    return render(request, 'accounts/password_reset_otp.html', {'can_resend': _can_resend(state)})
+
+
+@ratelimit('otp')
+def resend_otp(request):
+    """
+    Sends a new OTP for the password reset in progress, at most once per ACCOUNTS_OTP_RESEND_COOLDOWN
+    seconds. The cooldown is checked against the time stored in the session, without any query.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object sent by the user.
+
+    Returns:
+        HttpResponseRedirect: Redirects to the OTP form, or to the start of the reset if none is in progress.
+    """
+    state = request.session.get(PASSWORD_RESET_SESSION_KEY)
+    if state is None:
+        return redirect('password_reset')
+    if request.method == 'POST':
+        if _can_resend(state):
+            _send_reset_otp(state, state['user'] and _reset_user(pk=state['user']))
+            request.session[PASSWORD_RESET_SESSION_KEY] = state
+            messages.success(request, 'A new OTP has been sent.')
+        else:
+            messages.error(request, 'Please wait before requesting another OTP.')
+    return redirect('password_reset_otp')
+
+
+def password_reset_complete(request):
+    """
+    Sets the new password once the reset OTP has been verified.
+
+    The verification stored in the OTP backend is checked on every request and consumed when the
+    password is set, so it allows a single reset. The new passwords must match and pass the password
+    policy; the password is hashed on the hashing service's worker pool. Saving the user drops its
+    cached snapshot, and the new password hash logs out the user's existing sessions. The reset state is then removed from the session.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object sent by the user.
+
+    Returns:
+        HttpResponse: The new password form, or a redirect to the login page once the password is set.
+    """
+    state = request.session.get(PASSWORD_RESET_SESSION_KEY)
+    if state is None or not state['verified'] or not CustomUser(pk=state['user']).valid_otp(
+            state['verified'], 'password_reset_verified', consume=False):
+        return redirect('password_reset')
+    if request.method == 'POST':
+        new_password1 = request.POST.get('new_password1')
+        new_password2 = request.POST.get('new_password2')
+        if new_password1 != new_password2:
+            messages.error(request, 'Password mismatch')
+            return redirect('password_reset_complete')
+        user = CustomUser.objects.filter(pk=state['user']).first()
+        if user is None:
+            del request.session[PASSWORD_RESET_SESSION_KEY]
+            return redirect('password_reset')
+        try:
+            validate_password(new_password1, user)
+        except ValidationError as e:
+            for error in e.messages:
+                messages.error(request, error)
+            return redirect('password_reset_complete')
+        if not user.valid_otp(state['verified'], 'password_reset_verified'):
+            return redirect('password_reset')
+        user.password = hashing_service.make_password(new_password1)
+        user._password = new_password1
+        user.save()
+        del request.session[PASSWORD_RESET_SESSION_KEY]
+        messages.success(request, 'Password reset successfully, please log in.')
+        return redirect('login')
+    return render(request, 'accounts/password_reset_confirm.html')
+
+
 def logout_view(request):
     """
     Logs out the user if the request method is POST and redirects to the home page.
@@ -224,4 +427,271 @@ def logout_view(request):
     """
     if request.method == 'POST':
         logout(request)
-    return redirect('home')
\ No newline at end of file
+    return redirect('home')
+
+
+@login_required(login_url='login')
+def metrics_view(request):
+    """
+    Returns the in-process metrics of this worker as JSON, for staff users only.
+
+    Includes the per-view request timings recorded by TimingMiddleware (latency, SQL, hashing and
+    template percentiles, queries per request) and the stats of the hashing pool, the email
+    dispatcher, the rate limiter and the login event buffer. Each worker process keeps its own numbers.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object sent by the user.
+
+    Returns:
+        JsonResponse: The metrics.
+
+    Raises:
+        PermissionDenied: If the user is not staff.
+    """
+    if not request.user.is_staff:
+        raise PermissionDenied
+    return JsonResponse({
+        'views': histograms(),
+        'hashing': hashing_service.stats(),
+        'email': dispatcher.stats(),
+        'ratelimit': get_rate_limiter().stats(),
+        'login_events': login_events.stats(),
+    })
+
+
+def _lookup_values(request):
+    """
+    Reads the batch of a user lookup from the 'ids' or 'emails' query parameter (comma-separated).
+
+    Returns:
+        tuple: The lookup field ('id' or 'email') and the list of values.
+
+    Raises:
+        ValidationError: If neither or both parameters are given, a value is invalid or the batch is too large.
+    """
+    ids, emails = request.GET.get('ids'), request.GET.get('emails')
+    if bool(ids) == bool(emails):
+        raise ValidationError('Pass either ids or emails.')
+    values = [value.strip() for value in (ids or emails).split(',') if value.strip()]
+    limit = getattr(settings, 'ACCOUNTS_USER_API_MAX_BATCH', 100)
+    if len(values) > limit:
+        raise ValidationError(f'At most {limit} users can be looked up at once.')
+    if ids:
+        if not all(value.isdigit() for value in values):
+            raise ValidationError('ids must be integers.')
+        return 'id', sorted({int(value) for value in values})
+    return 'email', sorted({value.lower() for value in values})
+
+
+def _stream_users(rows, field):
+    """
+    Serializes the looked-up users one at a time as {"users": {"<id or email>": {...}, ...}}.
+    """
+    yield '{"users": {'
+    for index, row in enumerate(rows):
+        key = json.dumps(str(row[field]).lower())
+        user = json.dumps({name: row[name] for name in ('id', *CustomUser.PUBLIC_FIELDS)})
+        yield f'{"," if index else ""}{key}: {user}'
+    yield '}}'
+
+
+@require_safe
+@api_auth_required
+def user_lookup(request):
+    """
+    Returns the public display fields (CustomUser.PUBLIC_FIELDS) of a batch of active users as JSON,
+    e.g. GET /api/users/?ids=1,2,3 or GET /api/users/?emails=ada@example.com,grace@example.com.
+    Users that do not exist or are inactive are left out.
+
+    The batch is resolved with one values() query, through the primary key or the LOWER(email) index.
+    The ETag is derived from the ids and versions of the users found, so a repeated poll with a
+    matching If-None-Match is answered with '304 Not Modified' before anything is serialized;
+    otherwise the body is streamed. Callers authenticate with an API token or as staff
+    (see api_auth_required).
+
+    Parameters:
+        request (HttpRequest): The HTTP request object sent by the caller.
+
+    Returns:
+        StreamingHttpResponse: The users, keyed by the id or lowercased email they were looked up by.
+        A 304 response if the ETag matches, or a 400 JSON error for an invalid batch.
+    """
+    try:
+        field, values = _lookup_values(request)
+    except ValidationError as e:
+        return JsonResponse({'error': e.messages[0]}, status=400)
+    lookup = 'pk__in' if field == 'id' else 'email__lower__in'
+    rows = list(
+        CustomUser.objects.filter(is_active=True, **{lookup: values})
+        .order_by('pk')
+        .values('id', 'email', 'version', *CustomUser.PUBLIC_FIELDS)
+    )
+    versions = ','.join(f'{row["id"]}:{row["version"]}' for row in rows)
+    etag = quote_etag(hashlib.blake2b(versions.encode(), digest_size=16).hexdigest())
+
+    response = StreamingHttpResponse(_stream_users(rows, field), content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization', 'Cookie'])
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+# Async (ASGI-native) views.
+# They mirror the sync views above but use the async ORM and auth APIs, so under ASGI
+# the database work no longer needs a thread hop per request. Templates are still
+# rendered through sync_to_async, because messages and sessions have no async API.
+# Which URLs use them is controlled by the ACCOUNTS_ASYNC_VIEWS setting (see urls.py).
+
+arender = sync_to_async(render)
+
+
+def async_login_required(view):
+    """
+    Async counterpart of @login_required(login_url='login') for async views.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), 'login')
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@ratelimit('login')
+async def alogin_step_1(request):
+    """
+    Async version of login_step_1.
+    """
+    if request.method == 'POST':
+        email = normalize_email(request.POST.get('email'))
+        if await aemail_exists(email):
+            return await arender(request, 'accounts/password.html', {'email': email})
+        messages.error(request, 'Account does not exist.')
+        return redirect('login')
+    return await arender(request, 'accounts/login.html')
+
+
+@ratelimit('login_step_2')
+async def alogin_step_2(request):
+    """
+    Async version of login_step_2.
+    """
+    if request.method == 'POST':
+        email = request.POST.get('email')
+        password = request.POST.get('password')
+        if not password:
+            messages.error(request, 'Password field is missing.')
+            return redirect('login')
+        user = await aauthenticate(request, email=email, password=password)
+        if user is not None:
+            await alogin(request, user)
+            return redirect('home')
+        else:
+            messages.error(request, 'Invalid password')
+            return redirect('login_step_2')
+    return redirect('login')
+
+
+async def asignup(request):
+    """
+    Async version of signup.
+    """
+    if request.method=='POST':
+        username = request.POST.get('username')
+        email = normalize_email(request.POST.get('email'))
+        password = request.POST.get('password')
+        confirm_password = request.POST.get('confirm_password')
+        if password != confirm_password:
+            messages.error(request, 'Passwords do not match')
+            return redirect('signup')
+        try:
+            validate_password(password, CustomUser(username=username, email=email))
+        except ValidationError as e:
+            for error in e.messages:
+                messages.error(request, error)
+            return redirect('signup')
+        try:
+            user = await CustomUser.objects.acreate_user(username=username, email=email, password=password)
+        except IntegrityError:
+            field = await CustomUser.objects.aconflicting_field(username, email)
+            if field == 'username':
+                messages.error(request, 'Username already exists')
+                return redirect('signup')
+            if field == 'email':
+                messages.error(request, 'Email already exists, Please login')
+                return redirect('login')
+            raise
+        await alogin(request, user)
+        return redirect('home')
+    else:
+        return await arender(request, 'accounts/signup.html')
+
+
+async def aprofile(request):
+    """
+    Async version of profile.
+    """
+    user = await request.auser()
+    return await arender(request, 'accounts/profile.html', {'user': user})
+
+
+@async_login_required
+async def aprofile_edit(request):
+    """
+    Async version of profile_edit.
+    """
+    user = await request.auser()
+    if request.method == 'GET':
+        return await arender(request, 'accounts/edit_profile.html', {'user': user})
+    elif request.method == 'POST':
+        if 'profile_pic' in request.FILES:
+            try:
+                user.avatar = await sync_to_async(store_avatar)(request.FILES['profile_pic'])
+            except ValidationError as e:
+                for error in e.messages:
+                    messages.error(request, error)
+                return redirect('profile_edit')
+        user.bio = request.POST.get('bio')
+        user.location = request.POST.get('location') or None
+        user.date_of_birth = request.POST.get('date_of_birth') or None
+        await user.asave()
+        messages.success(request, 'Profile updated successfully.')
+        return redirect('profile')
+
+
+@async_login_required
+async def achange_password(request):
+    """
+    Async version of change_password.
+
+    The hashing service is called from a worker thread so it does not block the event loop.
+    """
+    if request.method == 'POST':
+        old_password = request.POST.get('old_password')
+        new_password1 = request.POST.get('new_password1')
+        new_password2 = request.POST.get('new_password2')
+        user = await request.auser()
+        if not await sync_to_async(hashing_service.check_password, thread_sensitive=False)(old_password, user.password):
+            messages.error(request, 'Check old password')
+            return redirect('change_password')
+        if new_password1 != new_password2:
+            messages.error(request, 'Password mismatch')
+            return redirect('change_password')
+        try:
+            validate_password(new_password1, user)
+        except ValidationError as e:
+            for error in e.messages:
+                messages.error(request, error)
+            return redirect('change_password')
+        user.password = await sync_to_async(hashing_service.make_password, thread_sensitive=False)(new_password1)
+        user._password = new_password1
+        await user.asave()
+        # update_session_auth_hash() compares against request.user, whose lazy lookup would
+        # already fail the new session hash; point it at the user loaded by auser().
+        request.user = user
+        await aupdate_session_auth_hash(request, user)
+        messages.success(request, 'Password changed successfully')
+        return redirect('profile')
+    else:
+        return await arender(request, 'accounts/change_password.html')
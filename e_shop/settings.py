@@ -13,9 +13,15 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+from dotenv import load_dotenv
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Environment variables may also be set in a .env file next to manage.py (see .env.example).
+load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
@@ -44,23 +50,33 @@ INSTALLED_APPS = [
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
+AUTHENTICATION_BACKENDS = ['accounts.backends.EmailBackend']
+
 MIDDLEWARE = [
+    'accounts.middleware.TimingMiddleware',
+    'accounts.middleware.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.HashingBackpressureMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'e_shop.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The Django backend, with template rendering time included in request timings (accounts.timing).
+        'BACKEND': 'accounts.timing.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -68,6 +84,9 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Templates are read and compiled once per process. With DEBUG the runserver
+            # autoreloader clears this cache whenever a template file changes.
+            'loaders': [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
         },
     },
 ]
@@ -78,33 +97,202 @@ WSGI_APPLICATION = 'e_shop.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
+# DATABASE_PROFILE selects the database:
+# - 'sqlite' (default): a local file, tuned by SQLITE_PRAGMAS when each connection opens
+#   (WAL journaling so readers do not block the writer, and memory-mapped reads). The driver's
+#   timeout option is the busy timeout, waited out instead of immediate 'database is locked' errors.
+# - 'postgres': persistent connections (CONN_MAX_AGE) with health checks, so each worker
+#   keeps a small pool of open connections. Requires psycopg. When DATABASE_PGBOUNCER is set,
+#   connections go through PgBouncer in transaction pooling mode.
+# Compare both with `manage.py benchmark signup`.
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+
+if DATABASE_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'e_shop'),
+            'USER': os.environ.get('POSTGRES_USER', 'e_shop'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': bool(os.environ.get('DATABASE_PGBOUNCER')),
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DATABASE_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'timeout': 5,
+            },
+            'TEST': {
+                # Benchmarks need a file: WAL and locking do not apply to in-memory databases.
+                'NAME': os.environ.get('SQLITE_TEST_PATH'),
+            },
+        }
+    }
+
+# Read replicas
+# Reads are spread over the replicas and writes go to 'default' (see accounts.db.ReplicaRouter);
+# a client that just wrote keeps reading from 'default' for ACCOUNTS_REPLICA_PIN_SECONDS.
+# List replica hosts in POSTGRES_REPLICA_HOSTS, or, to try it locally, SQLite files standing in for
+# replicas in SQLITE_REPLICA_PATHS, refreshed from the primary with `manage.py sync_sqlite_replicas`.
+# Tests run every replica as a mirror of the test database.
+
+if DATABASE_PROFILE == 'postgres':
+    replica_settings = [{'HOST': host} for host in os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',') if host]
+else:
+    replica_settings = [{'NAME': path} for path in os.environ.get('SQLITE_REPLICA_PATHS', '').split(',') if path]
+for number, overrides in enumerate(replica_settings, start=1):
+    DATABASES[f'replica{number}'] = {**DATABASES['default'], **overrides, 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['accounts.db.ReplicaRouter']
+
+ACCOUNTS_REPLICA_PIN_COOKIE = 'primary_pin'
+ACCOUNTS_REPLICA_PIN_SECONDS = 10
+
+# journal_mode is stored in the database file and only set when it differs (see accounts.db.configure_sqlite);
+# the others apply to each connection. Compare the rollback journal with WAL on a file database with
+# `manage.py benchmark signup --sqlite-path /tmp/e_shop_bench.sqlite3`.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,
+    'temp_store': 'memory',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The local-memory cache is per process; use a shared cache (Redis, Memcached) when running
+# several workers, so that invalidations reach every process.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'e_shop',
+    },
+    # Used by the {% cache %} fragments of the templates.
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'e_shop-template-fragments',
+    },
+    # Read-through cache of the cached_db and cache session engines. Those engines need a cache
+    # shared by the workers, so they refuse the local-memory default; set SESSION_CACHE=file.
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SESSION_CACHE_PATH', BASE_DIR / 'session_cache'),
+    } if os.environ.get('SESSION_CACHE') == 'file' else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'e_shop-sessions',
+    },
+}
+
+# Data that must be invalidated in every worker at once (see ACCOUNTS_USER_CACHE_ALIAS) needs a cache
+# shared by all of them: set SHARED_CACHE_URL to a Redis URL (requires the redis package), or
+# SHARED_CACHE=file for a file-based cache shared by the workers of one host.
+
+if os.environ.get('SHARED_CACHE_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['SHARED_CACHE_URL'],
+    }
+elif os.environ.get('SHARED_CACHE') == 'file':
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SHARED_CACHE_PATH', BASE_DIR / 'shared_cache'),
     }
+
+
+# Sessions and messages
+# https://docs.djangoproject.com/en/5.0/topics/http/sessions/#configuring-the-session-engine
+# SESSION_STRATEGY selects the session engine:
+#   db             - every request with a session reads it from the database (default).
+#   cached_db      - reads are served from the 'sessions' cache, writes go to both.
+#   cache          - sessions live only in the 'sessions' cache and are lost when it is evicted or cleared.
+# cached_db and cache require a 'sessions' cache shared by every worker (SESSION_CACHE=file): with a
+# per-process local-memory cache, a logout in one worker would leave the session alive in the others.
+#   signed_cookies - sessions are kept client-side and never touch the database; they cannot be
+#                    revoked server-side, so a logged-out cookie stays valid until it expires.
+# Expired database sessions are purged with `manage.py purge_sessions`.
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
 }
 
+SESSION_STRATEGY = os.environ.get('SESSION_STRATEGY', 'db')
+
+SESSION_ENGINE = SESSION_ENGINES[SESSION_STRATEGY]
+
+SESSION_CACHE_ALIAS = 'sessions'
+
+if SESSION_STRATEGY in ('cached_db', 'cache') and CACHES[SESSION_CACHE_ALIAS]['BACKEND'].endswith('.LocMemCache'):
+    raise ImproperlyConfigured(
+        f'SESSION_STRATEGY={SESSION_STRATEGY} needs a session cache shared by the workers; set SESSION_CACHE=file.'
+    )
+
+# Flash messages (messages.error() before a redirect) are carried in a cookie, so the anonymous
+# login and signup steps never load or save a session just to show an error.
+
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
+# A single accounts.validators.PasswordPolicy replaces Django's four default validators:
+# it checks length, character classes, numeric-only, common passwords and similarity in one pass.
 
 AUTH_PASSWORD_VALIDATORS = [
     {
-        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+        'NAME': 'accounts.validators.PasswordPolicy',
+        'OPTIONS': {
+            'min_length': 8,
+        },
     },
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.0/topics/auth/passwords/
+# The first hasher of the selected profile hashes new passwords; the others only verify
+# existing hashes, which are upgraded to the preferred hasher on the next successful login.
+# `manage.py password_hash_report` shows which hashers and costs are stored in the user table.
+
+PASSWORD_HASHER_PROFILES = {
+    'interactive': [
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'accounts.hashers.HighSecurityScryptPasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    ],
+    'high-security': [
+        'accounts.hashers.HighSecurityScryptPasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    ],
+}
+
+PASSWORD_HASHER_PROFILE = os.environ.get('PASSWORD_HASHER_PROFILE', 'interactive')
+
+PASSWORD_HASHERS = PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -124,6 +312,32 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 
+# Outside of DEBUG, collectstatic fingerprints every file (style2.css -> style2.<hash>.css) and
+# writes precompressed .gz (and .br, with the optional brotli package) copies next to them.
+# Fingerprinted files never change, so the server in front of STATIC_ROOT can send them with
+# 'Cache-Control: public, max-age=31536000, immutable' and serve the precompressed copies.
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'e_shop.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+
+# Uploaded files (profile pictures)
+# https://docs.djangoproject.com/en/5.0/topics/files/
+# Uploads are always streamed to a temporary file instead of being buffered in memory.
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', BASE_DIR / 'media')
+
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -131,4 +345,99 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 LOGIN_REDIRECT_URL = 'home'
-LOGOUT_REDIRECT_URL = 'home'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'home'
+
+
+# Accounts
+# Bounded LRU of emails known to exist, used by the first login step.
+
+ACCOUNTS_EMAIL_CACHE_SIZE = 10000
+ACCOUNTS_EMAIL_CACHE_TTL = 300
+
+# One-Time Passwords are kept out of the user table; see accounts.otp for the available backends.
+# Only an HMAC of each OTP is stored. Expired OTPs are removed with `manage.py sweep_otps`.
+# A password reset allows one resend per cooldown (in seconds) and a few wrong codes before it
+# has to be started again.
+
+ACCOUNTS_OTP_BACKEND = 'accounts.otp.DatabaseOTPBackend'
+ACCOUNTS_OTP_TTL = 600
+ACCOUNTS_OTP_RESEND_COOLDOWN = 60
+ACCOUNTS_OTP_MAX_ATTEMPTS = 5
+
+# Outgoing email is sent from a background thread in batches; see accounts.mail.
+# During development messages are written to files instead of being sent.
+
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend' if DEBUG else 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
+
+ACCOUNTS_EMAIL_ASYNC = True
+ACCOUNTS_EMAIL_BATCH_SIZE = 50
+ACCOUNTS_EMAIL_MAX_RETRIES = 3
+ACCOUNTS_EMAIL_RETRY_BACKOFF = 1.0
+
+# Logins and failed login attempts are buffered and written in batches, together with last_login
+# (one UPDATE row per user per batch); see accounts.events. A batch is written once it holds
+# BATCH_SIZE events or its oldest event is FLUSH_INTERVAL seconds old, by a login or at the end of
+# any request. Failed writes are retried keeping at most MAX_BUFFER events per worker.
+
+ACCOUNTS_LOGIN_EVENTS_BATCH_SIZE = 500
+ACCOUNTS_LOGIN_EVENTS_FLUSH_INTERVAL = 5.0
+ACCOUNTS_LOGIN_EVENTS_MAX_BUFFER = 10000
+
+# URL names served by the async (ASGI-native) variant of their view, e.g. {'login', 'login_step_2'}.
+# Only worth enabling when running under ASGI (e_shop.asgi); see `manage.py benchmark asgi`.
+
+ACCOUNTS_ASYNC_VIEWS = set()
+
+# Password hashing runs on a bounded process pool; see accounts.hashing.
+# ACCOUNTS_HASHING_WORKERS = 0 hashes inline, None uses one worker per CPU.
+# Requests beyond ACCOUNTS_HASHING_MAX_PENDING get a 503 with Retry-After.
+
+ACCOUNTS_HASHING_WORKERS = None
+ACCOUNTS_HASHING_MAX_PENDING = None
+ACCOUNTS_HASHING_RETRY_AFTER = 1
+
+# Authenticated requests load the user from a cached snapshot instead of the users table.
+# Snapshots are invalidated on every write, so they need the shared cache: without one (or with a
+# local-memory cache) they are disabled and each authenticated request reads the user row.
+
+ACCOUNTS_USER_CACHE_ALIAS = 'shared' if 'shared' in CACHES else None
+ACCOUNTS_USER_CACHE_TIMEOUT = 300
+
+# A sample of requests is timed (SQL, hashing, templates) into per-view histograms that staff can
+# read at /metrics/. ACCOUNTS_SERVER_TIMING also sends the numbers in a Server-Timing header,
+# which reveals internal timings to clients and is therefore limited to development.
+
+ACCOUNTS_TIMING_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+ACCOUNTS_SERVER_TIMING = DEBUG
+
+# Profile pictures are stored under content-hashed names and resized on a process pool; see
+# accounts.avatars. ACCOUNTS_AVATAR_WORKERS = 0 renders the thumbnails inline.
+
+ACCOUNTS_AVATAR_WORKERS = 1
+ACCOUNTS_AVATAR_MAX_SIZE = 5 * 1024 * 1024
+ACCOUNTS_AVATAR_MAX_PIXELS = 40_000_000
+
+# Anonymous GET requests to pages decorated with @cache_anonymous_page (the home page) are served
+# from a rendered copy with ETag/Last-Modified and 'Cache-Control: public, max-age=<timeout>'.
+
+ACCOUNTS_PAGE_CACHE_ALIAS = 'default'
+ACCOUNTS_PAGE_CACHE_TIMEOUT = 300
+
+# Other services read user display data from /api/users/ with 'Authorization: Bearer <token>'
+# (staff users can use their session). Tokens are comma-separated in ACCOUNTS_API_TOKENS.
+
+ACCOUNTS_API_TOKENS = [token for token in os.environ.get('ACCOUNTS_API_TOKENS', '').split(',') if token]
+ACCOUNTS_USER_API_MAX_BATCH = 100
+
+# Login and OTP attempts are rate limited with sliding-window counters; see accounts.ratelimit.
+# Each scope maps a key ('ip' or 'email') to (requests, seconds). Use
+# 'accounts.ratelimit.CacheRateLimitStore' to share the counters between worker processes.
+
+ACCOUNTS_RATELIMIT_STORE = 'accounts.ratelimit.LocMemRateLimitStore'
+ACCOUNTS_RATELIMIT_CACHE_ALIAS = 'default'
+ACCOUNTS_RATELIMITS = {
+    'login': {'ip': (30, 60), 'email': (10, 60)},
+    'login_step_2': {'ip': (20, 60), 'email': (5, 60)},
+    'otp': {'ip': (10, 600), 'email': (3, 600)},
+}
@@ -0,0 +1,58 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes a gzip (and, when the optional `brotli` package is
+    installed, a brotli) copy next to every fingerprinted text file during collectstatic.
+
+    The web server or CDN can then serve `style2.<hash>.css.gz` / `.br` directly instead of compressing
+    on each request, and cache the fingerprinted names forever since their content never changes.
+    """
+
+    compress_extensions = ('.css', '.js', '.svg', '.json', '.txt', '.xml', '.html', '.map')
+    # Below this size the compressed copy saves less than the headers it costs.
+    compress_min_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in sorted(set(self.hashed_files.values())):
+            if not hashed_name.endswith(self.compress_extensions):
+                continue
+            with self.open(hashed_name) as file:
+                content = file.read()
+            if len(content) < self.compress_min_size:
+                continue
+            for compressed_name in self.compress(hashed_name, content):
+                yield hashed_name, compressed_name, True
+
+    def compress(self, name, content):
+        """
+        Saves the compressed copies of a file that are smaller than the original.
+
+        Returns:
+            list: The names of the files written.
+        """
+        compressed = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed['.br'] = brotli.compress(content)
+        written = []
+        for extension, data in compressed.items():
+            if len(data) >= len(content):
+                continue
+            compressed_name = name + extension
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(data))
+            written.append(compressed_name)
+        return written
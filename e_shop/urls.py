@@ -14,6 +14,8 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from accounts.views import home_view
@@ -23,3 +25,6 @@ urlpatterns = [
     path('', include('accounts.urls')),
     path('', home_view, name="home"),
 ]
+
+# Profile pictures are served by the web server in production; static() only adds a route with DEBUG.
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)